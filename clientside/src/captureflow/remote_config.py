@@ -0,0 +1,175 @@
+"""Tracing configuration that can be changed at runtime by the CaptureFlow server."""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+
+VERBOSITY_FULL = "full"  # sys.settrace() based execution trace
+VERBOSITY_IO = "io"  # Only endpoint inputs / outputs, no sys.settrace()
+VERBOSITY_OFF = "off"
+VERBOSITY_LEVELS = (VERBOSITY_FULL, VERBOSITY_IO, VERBOSITY_OFF)
+
+DEFAULT_CACHE_DIR = tempfile.gettempdir()
+
+logger = logging.getLogger(__name__)
+
+
+def default_cache_path(repo_url: str) -> str:
+    """One cache file per repository, so services sharing a host never load each other's configuration."""
+    digest = hashlib.sha256(repo_url.encode()).hexdigest()[:16]
+    return os.path.join(DEFAULT_CACHE_DIR, f"captureflow_config_{digest}.json")
+
+
+@dataclass(frozen=True)
+class TracingConfig:
+    """
+    Immutable snapshot of tracing settings. A new instance replaces the old one on every update,
+    so a request reads one consistent configuration without any locking.
+    """
+
+    sampling_rate: float = 1.0
+    verbosity: str = VERBOSITY_FULL
+    endpoint_sampling_rates: Dict[str, float] = field(default_factory=dict)
+    endpoint_verbosity: Dict[str, str] = field(default_factory=dict)
+    # Substrings of file paths whose frames are never recorded
+    module_filters: Tuple[str, ...] = ()
+
+    def sampling_rate_for(self, endpoint: str) -> float:
+        return self.endpoint_sampling_rates.get(endpoint, self.sampling_rate)
+
+    def verbosity_for(self, endpoint: str) -> str:
+        return self.endpoint_verbosity.get(endpoint, self.verbosity)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TracingConfig":
+        config = cls(
+            sampling_rate=float(data.get("sampling_rate", 1.0)),
+            verbosity=data.get("verbosity", VERBOSITY_FULL),
+            endpoint_sampling_rates={k: float(v) for k, v in data.get("endpoint_sampling_rates", {}).items()},
+            endpoint_verbosity=dict(data.get("endpoint_verbosity", {})),
+            module_filters=tuple(data.get("module_filters", ())),
+        )
+        for verbosity in (config.verbosity, *config.endpoint_verbosity.values()):
+            if verbosity not in VERBOSITY_LEVELS:
+                raise ValueError(f"Unknown verbosity level: {verbosity}")
+        return config
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sampling_rate": self.sampling_rate,
+            "verbosity": self.verbosity,
+            "endpoint_sampling_rates": self.endpoint_sampling_rates,
+            "endpoint_verbosity": self.endpoint_verbosity,
+            "module_filters": list(self.module_filters),
+        }
+
+
+class RemoteConfigPoller:
+    """
+    Periodically fetches `TracingConfig` from the server and keeps a local copy for restarts.
+    `cache_path` defaults to a file derived from `repo_url`, None disables the cache.
+    """
+
+    def __init__(
+        self,
+        config_url: str,
+        repo_url: str,
+        poll_interval: float = 30.0,
+        cache_path: Optional[str] = "",
+    ):
+        self.config_url = config_url
+        self.repo_url = repo_url
+        self.poll_interval = poll_interval
+        self.cache_path = default_cache_path(repo_url) if cache_path == "" else cache_path
+        self.config = self._load_cached_config() or TracingConfig()
+
+        self._etag: Optional[str] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        if hasattr(os, "register_at_fork"):
+            # Pre-fork servers (gunicorn --preload) inherit a dead poller thread, start a fresh one in every worker
+            poller_ref = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: poller_ref() and poller_ref()._reinit_after_fork())
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="captureflow-config-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def _reinit_after_fork(self) -> None:
+        was_running = self._thread is not None and not self._stop_event.is_set()
+        self._stop_event = threading.Event()
+        self._thread = None
+        if was_running:
+            self.start()
+
+    def poll_once(self) -> bool:
+        """Fetch the configuration once. Returns True if a new configuration was applied."""
+        headers = {"If-None-Match": self._etag} if self._etag else {}
+        try:
+            response = requests.get(
+                self.config_url, params={"repository-url": self.repo_url}, headers=headers, timeout=5
+            )
+            if response.status_code == 304:
+                return False
+            if response.status_code != 200:
+                logger.error(f"CaptureFlow server responded with {response.status_code}: {response.text}")
+                return False
+            config = TracingConfig.from_dict(response.json())
+        except Exception as e:
+            logger.error(f"Exception during config fetch: {e}")
+            return False
+
+        self.config = config  # Single reference swap, readers see either the old or the new snapshot
+        self._etag = response.headers.get("ETag")
+        self._store_cached_config(config)
+        return True
+
+    def _run(self) -> None:
+        self.poll_once()
+        while not self._stop_event.wait(self.poll_interval):
+            self.poll_once()
+
+    def _load_cached_config(self) -> Optional[TracingConfig]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path) as f:
+                return TracingConfig.from_dict(json.load(f))
+        except Exception as e:
+            logger.info(f"Ignoring unreadable config cache {self.cache_path}: {e}")
+            return None
+
+    def _store_cached_config(self, config: TracingConfig) -> None:
+        if not self.cache_path:
+            return
+        tmp_path = None
+        try:
+            # A unique temporary file per writer, workers polling at the same time never share one
+            with tempfile.NamedTemporaryFile(
+                "w", dir=os.path.dirname(self.cache_path) or ".", prefix=".captureflow_config", delete=False
+            ) as f:
+                tmp_path = f.name
+                json.dump(config.to_dict(), f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.info(f"Failed to cache config at {self.cache_path}: {e}")
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
@@ -0,0 +1,200 @@
+"""Type-dispatch serializers that turn captured Python values into compact JSON strings."""
+
+import dataclasses
+import json
+import logging
+from typing import Any, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_CONTAINER_ITEMS = 50
+# Bounds for whole values: nesting below MAX_DEPTH and elements beyond MAX_TOTAL_ITEMS are summarised
+MAX_DEPTH = 8
+MAX_TOTAL_ITEMS = 1000
+MAX_STRING_LENGTH = 2048
+MAX_BYTES_PREVIEW = 256
+HEAD_ITEMS = 5
+
+# A handler converts a value into something `json.dumps` understands (nested unknown values are fine,
+# nested containers are summarised and capped by the registry).
+Handler = Callable[[Any], Any]
+
+
+def _truncate(text: str, limit: int = MAX_STRING_LENGTH) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}...<truncated {len(text) - limit} chars>"
+
+
+def _type_name(value: Any) -> str:
+    return f"{type(value).__module__}.{type(value).__qualname__}"
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _to_repr(value: Any) -> str:
+    return _truncate(str(value))
+
+
+def _sequence_to_jsonable(value) -> Any:
+    if len(value) > MAX_CONTAINER_ITEMS:
+        head = [item for item, _ in zip(value, range(HEAD_ITEMS))]
+        return {"summary": _type_name(value), "length": len(value), "head": head}
+    return value if isinstance(value, (list, tuple)) else list(value)
+
+
+def _mapping_to_jsonable(value: dict) -> Any:
+    if len(value) > MAX_CONTAINER_ITEMS:
+        head = {str(key): item for (key, item), _ in zip(value.items(), range(HEAD_ITEMS))}
+        return {"summary": _type_name(value), "length": len(value), "head": head}
+    return value
+
+
+def _bytes_to_jsonable(value) -> Any:
+    return {
+        "summary": _type_name(value),
+        "length": len(value),
+        "head": bytes(value[:MAX_BYTES_PREVIEW]).decode("utf-8", errors="replace"),
+    }
+
+
+def _pydantic_to_jsonable(value) -> Any:
+    if hasattr(value, "model_dump"):
+        return _mapping_to_jsonable(value.model_dump(mode="json"))
+    return _mapping_to_jsonable(value.dict())
+
+
+def _dataclass_to_jsonable(value) -> Any:
+    return _mapping_to_jsonable({field.name: getattr(value, field.name) for field in dataclasses.fields(value)})
+
+
+def _numpy_to_jsonable(value) -> Any:
+    if getattr(value, "ndim", 0) == 0:
+        return value.item()
+    if value.size > MAX_CONTAINER_ITEMS:
+        head = value.ravel()[:HEAD_ITEMS].tolist()
+        return {"summary": _type_name(value), "shape": list(value.shape), "dtype": str(value.dtype), "head": head}
+    return value.tolist()
+
+
+def _sqlalchemy_row_to_jsonable(value) -> Any:
+    return _mapping_to_jsonable(dict(value._mapping))
+
+
+def _sqlalchemy_model_to_jsonable(value) -> Any:
+    return _mapping_to_jsonable({column.key: getattr(value, column.key) for column in value.__table__.columns})
+
+
+def _container_summary(value: Any) -> Dict[str, Any]:
+    return {"summary": _type_name(value), "length": len(value)}
+
+
+def _json_key(key: Any) -> Any:
+    return key if key is None or isinstance(key, (str, int, float, bool)) else _to_repr(key)
+
+
+def _is_pydantic_model(type_: type) -> bool:
+    return hasattr(type_, "model_fields") or hasattr(type_, "__fields__")
+
+
+def _is_numpy_type(type_: type) -> bool:
+    return type_.__module__ == "numpy" and hasattr(type_, "tolist") and hasattr(type_, "dtype")
+
+
+def _is_sqlalchemy_row(type_: type) -> bool:
+    return type_.__module__.startswith("sqlalchemy.") and hasattr(type_, "_mapping")
+
+
+def _is_sqlalchemy_model(type_: type) -> bool:
+    return hasattr(type_, "__table__") and hasattr(type_, "_sa_class_manager")
+
+
+class SerializerRegistry:
+    """
+    Maps exact value types to handlers producing JSON-compatible data.
+
+    The handler for a type is resolved once (explicit registrations along the MRO first, then
+    duck-typed detectors for pydantic / dataclasses / numpy / SQLAlchemy, then `str()`) and cached,
+    so capturing a value is a dict lookup instead of a failed `json.dumps` followed by `str()`.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[type, Handler] = {
+            int: _identity,
+            float: _identity,
+            bool: _identity,
+            type(None): _identity,
+            str: _truncate,
+            list: _sequence_to_jsonable,
+            tuple: _sequence_to_jsonable,
+            set: _sequence_to_jsonable,
+            frozenset: _sequence_to_jsonable,
+            dict: _mapping_to_jsonable,
+            bytes: _bytes_to_jsonable,
+            bytearray: _bytes_to_jsonable,
+            memoryview: _bytes_to_jsonable,
+        }
+        self._detectors: List[Tuple[Callable[[type], bool], Handler]] = [
+            (_is_pydantic_model, _pydantic_to_jsonable),
+            (dataclasses.is_dataclass, _dataclass_to_jsonable),
+            (_is_numpy_type, _numpy_to_jsonable),
+            (_is_sqlalchemy_row, _sqlalchemy_row_to_jsonable),
+            (_is_sqlalchemy_model, _sqlalchemy_model_to_jsonable),
+        ]
+        self._cache: Dict[type, Handler] = {}
+
+    def register(self, type_: type, handler: Handler) -> None:
+        """Use `handler` for `type_` and its subclasses. It must return JSON-compatible data."""
+        self._handlers[type_] = handler
+        self._cache.clear()
+
+    def resolve(self, type_: type) -> Handler:
+        """Return the cached handler used for values of exactly `type_`."""
+        try:
+            return self._cache[type_]
+        except KeyError:
+            pass
+
+        handler = next((self._handlers[base] for base in type_.__mro__ if base in self._handlers), None)
+        if handler is None:
+            handler = next((handler for matches, handler in self._detectors if matches(type_)), _to_repr)
+
+        self._cache[type_] = handler
+        return handler
+
+    def serialize(self, value: Any) -> str:
+        """Serialize `value` to a string, falling back to `str()` when no JSON representation exists."""
+        try:
+            handler = self.resolve(type(value))
+            if handler is _to_repr:
+                return _to_repr(value)
+            budget = [MAX_TOTAL_ITEMS]
+            return json.dumps(self._cap_nested(handler(value), 0, budget))
+        except Exception:
+            try:
+                return _to_repr(value)
+            except Exception as e:
+                logger.info(f"Failed to convert variable to string. Type: {type(value)}, Error: {e}")
+                return "<unrepresentable object>"  # Very rare case, but can happen with e.g. MagicMocks
+
+    def _to_jsonable(self, value: Any, depth: int, budget: List[int]) -> Any:
+        handler = self.resolve(type(value))
+        if handler is _to_repr:
+            return _to_repr(value)
+        return self._cap_nested(handler(value), depth, budget)
+
+    def _cap_nested(self, data: Any, depth: int, budget: List[int]) -> Any:
+        """
+        Walk a handler's output and convert every element through its own handler, so containers at any depth are
+        summarised like top-level ones. `budget` holds the elements left for the whole value.
+        """
+        if not isinstance(data, (dict, list, tuple)):
+            return data
+        if depth >= MAX_DEPTH or budget[0] <= 0:
+            return _container_summary(data)
+        budget[0] -= len(data)
+        if isinstance(data, dict):
+            return {_json_key(key): self._to_jsonable(item, depth + 1, budget) for key, item in data.items()}
+        return [self._to_jsonable(item, depth + 1, budget) for item in data]
@@ -2,42 +2,85 @@
 
 import asyncio
 import inspect
+import itertools
 import json
 import linecache
 import logging
 import os
+import random
 import sys
 import traceback
 import uuid
 from datetime import datetime
 from functools import wraps
-from typing import Any, Callable, Dict
+from typing import Any, Callable, Dict, Optional, Tuple
 
 import httpx
 import requests
 
+from .remote_config import (
+    VERBOSITY_FULL,
+    VERBOSITY_OFF,
+    RemoteConfigPoller,
+    TracingConfig,
+)
+from .serializers import Handler, SerializerRegistry
+
 STDLIB_PATH = "/lib/python"
 LIBRARY_PATH = "/site-packages/"
 TEMP_FOLDER = "temp/"
+MAX_EXCEPTION_FRAMES = 20
+MAX_LOCALS_PER_FRAME = 25
 
 logger = logging.getLogger(__name__)
 
 
 class Tracer:
-    def __init__(self, repo_url: str, server_base_url: str = "http://127.0.0.1:8000"):
-        """Initialize the tracer with the repository URL and optionally the remote logging URL."""
+    def __init__(
+        self,
+        repo_url: str,
+        server_base_url: str = "http://127.0.0.1:8000",
+        config: Optional[TracingConfig] = None,
+        remote_config: bool = False,
+        config_poll_interval: float = 30.0,
+    ):
+        """
+        Initialize the tracer with the repository URL and optionally the remote logging URL.
+        With `remote_config` enabled, sampling / verbosity / module filters are polled from the server
+        and applied to subsequent requests without a restart.
+        """
         self.repo_url = repo_url
         self.trace_endpoint_url = f"{server_base_url.rstrip('/')}/api/v1/traces"
+        self.serializers = SerializerRegistry()
+
+        self._local_config = config or TracingConfig()
+        self._config_poller = None
+        if remote_config:
+            self._config_poller = RemoteConfigPoller(
+                f"{server_base_url.rstrip('/')}/api/v1/config", repo_url, poll_interval=config_poll_interval
+            )
+            self._config_poller.start()
+
+    @property
+    def config(self) -> TracingConfig:
+        return self._config_poller.config if self._config_poller else self._local_config
+
+    def register_serializer(self, type_: type, handler: Handler) -> None:
+        """Register a custom handler that converts values of `type_` into JSON-compatible data."""
+        self.serializers.register(type_, handler)
 
     def trace_endpoint(self, func: Callable) -> Callable:
         """Decorator to trace endpoint function calls."""
 
-        # TODO: Give option to specify log "verbosity"
-        #       Max verbosity                           => need "heavy" sys.settrace()
-        #           Subgoal: investigate sampling of requests (e.g. log every N-th request) to make it less "heavy"
-        #       Min verbosity (e.g. only exceptions)    => we could patch Flask/FastAPI methods and that would be better performance wise
+        # TODO: Min verbosity (e.g. only exceptions) => we could patch Flask/FastAPI methods and that would be better performance wise
         @wraps(func)
         async def wrapper(*args, **kwargs) -> Any:
+            # One config snapshot per invocation, remote updates apply from the next request on
+            config = self.config
+            verbosity = config.verbosity_for(func.__qualname__)
+            if verbosity == VERBOSITY_OFF or random.random() >= config.sampling_rate_for(func.__qualname__):
+                return await func(*args, **kwargs) if asyncio.iscoroutinefunction(func) else func(*args, **kwargs)
+
             try:
                 invocation_id = str(uuid.uuid4())
                 context = {
@@ -52,9 +95,14 @@ class Tracer:
                     "log_filename": f"{TEMP_FOLDER}{func.__name__}_trace_{invocation_id}.json",
                 }
 
-                sys.settrace(self._setup_trace(context))
+                if verbosity == VERBOSITY_FULL:
+                    sys.settrace(self._setup_trace(context, config.module_filters))
                 result = await func(*args, **kwargs) if asyncio.iscoroutinefunction(func) else func(*args, **kwargs)
                 context["output"] = {"result": self._serialize_variable(result)}
+            except Exception as exc:
+                sys.settrace(None)
+                self._capture_exception_locals(context, exc.__traceback__, config.module_filters)
+                raise
             finally:
                 sys.settrace(None)
                 await self._send_trace_log(context)
@@ -86,16 +134,7 @@ class Tracer:
             logger.error(f"Exception during logging: {e}")
 
     def _serialize_variable(self, value: Any) -> Dict[str, Any]:
-        try:
-            json_value = json.dumps(value)
-        except Exception as e:
-            try:
-                json_value = str(value)  # If the value cannot be serialized to JSON, use str() / repr()
-            except Exception as e:
-                json_value = "<unrepresentable object>"  # Very rare case, but can happen with e.g. MagicMocks
-                logger.info(f"Failed to convert variable to string. Type: {type(value)}, Error: {e}")
-
-        return {"python_type": str(type(value)), "json_serialized": json_value}
+        return {"python_type": str(type(value)), "json_serialized": self.serializers.serialize(value)}
 
     def _get_file_tag(self, file_path: str) -> str:
         """Determine the file tag based on the file path."""
@@ -105,10 +144,20 @@ class Tracer:
             return "LIBRARY"
         return "INTERNAL"
 
-    def _setup_trace(self, context: Dict[str, Any]) -> Callable:
+    @staticmethod
+    def _is_filtered(file_name: str, module_filters: Tuple[str, ...]) -> bool:
+        return any(module in file_name for module in module_filters)
+
+    def _setup_trace(self, context: Dict[str, Any], module_filters: Tuple[str, ...] = ()) -> Callable:
         """Setup the trace function."""
         context["call_stack"] = []
-        return lambda frame, event, arg: self._trace_function_calls(frame, event, arg, context)
+
+        def trace_calls(frame, event, arg):
+            if self._is_filtered(frame.f_code.co_filename, module_filters):
+                return None  # Filtered out by config, don't trace this frame at all
+            return self._trace_function_calls(frame, event, arg, context)
+
+        return trace_calls
 
     def _capture_arguments(self, frame) -> Dict[str, Any]:
         """
@@ -128,6 +177,47 @@ class Tracer:
 
         return {"args": serialized_args, "kwargs": serialized_kwargs}
 
+    def _capture_exception_locals(self, context: Dict[str, Any], tb, module_filters: Tuple[str, ...] = ()) -> None:
+        """
+        Attach a bounded snapshot of locals to the "exception" events of INTERNAL frames.
+        The traceback is walked once, when the exception leaves the endpoint, so the cost is only paid on failure.
+        """
+        exception_events = [event for event in context["execution_trace"] if event["event"] == "exception"]
+
+        traced_frames = []
+        tb = tb.tb_next  # Skip the wrapper frame itself
+        while tb is not None:
+            file_name = tb.tb_frame.f_code.co_filename
+            # Same filters as _setup_trace and _trace_function_calls, other frames have no events
+            if (
+                self._get_file_tag(file_name) == "INTERNAL"
+                and file_name.startswith("/")
+                and not self._is_filtered(file_name, module_filters)
+            ):
+                traced_frames.append(tb.tb_frame)
+            tb = tb.tb_next
+
+        # The exception reaches the innermost frame first, so the latest events belong to the outermost frames:
+        # the traceback is paired with the events in reverse. Pairing by position keeps recursive frames,
+        # which share file, function and line, apart.
+        event_index = len(exception_events) - 1
+        captured_frames = 0
+        for frame in traced_frames:
+            code = frame.f_code
+            while event_index >= 0 and (
+                exception_events[event_index]["file"],
+                exception_events[event_index]["function"],
+            ) != (code.co_filename, code.co_name):
+                event_index -= 1
+            if event_index < 0 or captured_frames >= MAX_EXCEPTION_FRAMES:
+                break
+            exception_events[event_index]["exception_info"]["locals"] = {
+                name: self._serialize_variable(value)
+                for name, value in itertools.islice(frame.f_locals.items(), MAX_LOCALS_PER_FRAME)
+            }
+            captured_frames += 1
+            event_index -= 1
+
     def _trace_function_calls(self, frame, event, arg, context: Dict[str, Any]) -> Callable:
         """Trace function calls and capture relevant data."""
         code = frame.f_code
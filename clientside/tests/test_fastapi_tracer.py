@@ -5,6 +5,7 @@ import pytest
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
+from src.captureflow.remote_config import TracingConfig
 from src.captureflow.tracer import Tracer
 
 app = FastAPI()
@@ -74,3 +75,71 @@ async def test_trace_endpoint_with_exception():
         exception_event = exception_events[0]
         assert "ZeroDivisionError" in exception_event["exception_info"]["type"], "Expected ZeroDivisionError"
         assert "division by zero" in exception_event["exception_info"]["value"], "Expected 'division by zero' message"
+
+        # Locals of the failing frame are snapshotted from the traceback
+        divide_events = [e for e in exception_events if e["function"] == "divide"]
+        assert divide_events, "Exception event for the endpoint frame not found"
+        exception_locals = divide_events[-1]["exception_info"]["locals"]
+        assert exception_locals["x"]["json_serialized"] == json.dumps(10)
+        assert exception_locals["y"]["json_serialized"] == json.dumps(0)
+
+
+def countdown(n: int):
+    if n == 0:
+        raise ValueError("done")
+    return countdown(n - 1)
+
+
+@app.get("/countdown/{n}")
+@tracer.trace_endpoint
+async def countdown_endpoint(n: int):
+    return countdown(n)
+
+
+@pytest.mark.asyncio
+async def test_recursive_frames_keep_their_own_locals():
+    with patch("src.captureflow.tracer.Tracer._send_trace_log") as mock_log:
+        with TestClient(app, raise_server_exceptions=False) as client:
+            assert client.get("/countdown/3").status_code == 500
+
+        log_data = mock_log.call_args[0][0]
+        countdown_events = [
+            e for e in log_data["execution_trace"] if e["event"] == "exception" and e["function"] == "countdown"
+        ]
+        # Innermost frame first, each with its own n
+        assert [e["exception_info"]["locals"]["n"]["json_serialized"] for e in countdown_events] == ["0", "1", "2", "3"]
+
+
+# A helper from a module excluded by `module_filters`, its frames are never traced
+vendored = {}
+exec(compile("def call(func, x):\n    return func(x)\n", "/vendored/helpers.py", "exec"), vendored)
+
+filtered_tracer = Tracer(
+    repo_url="https://github.com/DummyUser/DummyRepo",
+    server_base_url="http://127.0.0.1:8000",
+    config=TracingConfig(module_filters=("/vendored/",)),
+)
+
+
+def fail_with_secret(x: int):
+    secret = "s3cr3t"
+    raise ValueError(secret)
+
+
+@app.get("/filtered/{x}")
+@filtered_tracer.trace_endpoint
+async def filtered_endpoint(x: int):
+    return vendored["call"](fail_with_secret, x)
+
+
+@pytest.mark.asyncio
+async def test_exception_locals_skip_filtered_frames():
+    with patch("src.captureflow.tracer.Tracer._send_trace_log") as mock_log:
+        with TestClient(app, raise_server_exceptions=False) as client:
+            assert client.get("/filtered/7").status_code == 500
+
+        log_data = mock_log.call_args[0][0]
+        exception_events = [e for e in log_data["execution_trace"] if e["event"] == "exception"]
+        assert all(e["file"] != "/vendored/helpers.py" for e in exception_events)
+        (failing_event,) = [e for e in exception_events if e["function"] == "fail_with_secret"]
+        assert sorted(failing_event["exception_info"]["locals"]) == ["secret", "x"]
@@ -0,0 +1,104 @@
+import os
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.captureflow import remote_config
+from src.captureflow.remote_config import RemoteConfigPoller, TracingConfig
+from src.captureflow.tracer import Tracer
+
+
+def make_response(status_code, payload=None, etag=None):
+    response = MagicMock(status_code=status_code, headers={"ETag": etag} if etag else {})
+    response.json.return_value = payload
+    return response
+
+
+def test_poller_applies_and_caches_config(tmp_path):
+    cache_path = tmp_path / "config.json"
+    poller = RemoteConfigPoller("http://server/api/v1/config", "repo", cache_path=str(cache_path))
+    assert poller.config == TracingConfig()
+
+    payload = {"sampling_rate": 0.5, "endpoint_sampling_rates": {"add": 0.0}, "module_filters": ["/vendored/"]}
+    with patch("src.captureflow.remote_config.requests.get", return_value=make_response(200, payload, '"v1"')):
+        assert poller.poll_once()
+
+    assert poller.config.sampling_rate_for("add") == 0.0
+    assert poller.config.sampling_rate_for("other") == 0.5
+    assert poller.config.module_filters == ("/vendored/",)
+
+    # ETag is sent back and a 304 keeps the current config
+    with patch("src.captureflow.remote_config.requests.get", return_value=make_response(304)) as mock_get:
+        assert not poller.poll_once()
+    assert mock_get.call_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+
+    # A restarted process starts from the cached config
+    restarted = RemoteConfigPoller("http://server/api/v1/config", "repo", cache_path=str(cache_path))
+    assert restarted.config == poller.config
+
+
+def test_default_cache_is_per_repository(tmp_path, monkeypatch):
+    monkeypatch.setattr(remote_config, "DEFAULT_CACHE_DIR", str(tmp_path))
+    first = RemoteConfigPoller("http://server/api/v1/config", "https://github.com/org/first")
+    second = RemoteConfigPoller("http://server/api/v1/config", "https://github.com/org/second")
+    assert first.cache_path != second.cache_path
+
+    with patch("src.captureflow.remote_config.requests.get", return_value=make_response(200, {"sampling_rate": 0.1})):
+        assert first.poll_once()
+
+    assert RemoteConfigPoller("http://server/api/v1/config", "https://github.com/org/second").config == TracingConfig()
+    assert RemoteConfigPoller("http://server/api/v1/config", "https://github.com/org/first").config.sampling_rate == 0.1
+    # Only the cache file itself is left behind, no temporary files
+    assert os.listdir(tmp_path) == [os.path.basename(first.cache_path)]
+
+
+def test_invalid_config_is_ignored(tmp_path):
+    poller = RemoteConfigPoller("http://server/api/v1/config", "repo", cache_path=str(tmp_path / "config.json"))
+
+    with patch("src.captureflow.remote_config.requests.get", return_value=make_response(200, {"verbosity": "loud"})):
+        assert not poller.poll_once()
+    assert poller.config == TracingConfig()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="fork() is not available")
+def test_poller_thread_is_restarted_in_forked_child(tmp_path):
+    poller = RemoteConfigPoller("http://server/api/v1/config", "repo", poll_interval=3600, cache_path=None)
+    with patch.object(RemoteConfigPoller, "poll_once"):
+        poller.start()
+        parent_thread = poller._thread
+
+        pid = os.fork()
+        if pid == 0:
+            restarted = poller._thread is not parent_thread and poller._thread.is_alive()
+            os._exit(0 if restarted else 1)
+
+        _, status = os.waitpid(pid, 0)
+        poller.stop()
+
+    assert os.WEXITSTATUS(status) == 0
+
+
+tracer = Tracer(
+    repo_url="https://github.com/DummyUser/DummyRepo",
+    config=TracingConfig(endpoint_sampling_rates={"skipped": 0.0}),
+)
+app = FastAPI()
+
+
+@app.get("/skipped")
+@tracer.trace_endpoint
+async def skipped():
+    return {"result": "ok"}
+
+
+@pytest.mark.asyncio
+async def test_unsampled_endpoint_is_not_traced():
+    with patch("src.captureflow.tracer.Tracer._send_trace_log") as mock_log:
+        with TestClient(app) as client:
+            response = client.get("/skipped")
+            assert response.status_code == 200
+            assert response.json() == {"result": "ok"}
+
+        mock_log.assert_not_called()
@@ -0,0 +1,88 @@
+import json
+from dataclasses import dataclass
+
+from pydantic import BaseModel
+
+from src.captureflow.serializers import (
+    MAX_CONTAINER_ITEMS,
+    MAX_TOTAL_ITEMS,
+    SerializerRegistry,
+)
+
+
+@dataclass
+class Point:
+    x: int
+    y: int
+
+
+class User(BaseModel):
+    name: str
+    tags: list
+
+
+class Opaque:
+    def __str__(self):
+        return "<opaque>"
+
+
+def test_builtin_values_match_json_dumps():
+    registry = SerializerRegistry()
+
+    assert registry.serialize(2) == json.dumps(2)
+    assert registry.serialize({"result": 5}) == json.dumps({"result": 5})
+    assert registry.serialize([1, "a", None]) == json.dumps([1, "a", None])
+    assert registry.serialize(Opaque()) == "<opaque>"
+
+
+def test_structured_types_are_serialized_without_repr():
+    registry = SerializerRegistry()
+
+    assert json.loads(registry.serialize(Point(1, 2))) == {"x": 1, "y": 2}
+    assert json.loads(registry.serialize(User(name="bob", tags=["a"]))) == {"name": "bob", "tags": ["a"]}
+    assert json.loads(registry.serialize({"point": Point(3, 4)})) == {"point": {"x": 3, "y": 4}}
+
+    summary = json.loads(registry.serialize(b"\x00" * 10_000))
+    assert summary["length"] == 10_000
+    assert summary["summary"] == "builtins.bytes"
+
+
+def test_large_containers_are_summarised():
+    registry = SerializerRegistry()
+
+    summary = json.loads(registry.serialize(list(range(MAX_CONTAINER_ITEMS * 10))))
+    assert summary["length"] == MAX_CONTAINER_ITEMS * 10
+    assert summary["head"] == [0, 1, 2, 3, 4]
+
+
+def test_strategy_is_resolved_once_per_type_and_can_be_overridden():
+    registry = SerializerRegistry()
+
+    handler = registry.resolve(Point)
+    assert registry.resolve(Point) is handler
+
+    registry.register(Point, lambda point: f"{point.x}:{point.y}")
+    assert registry.resolve(Point) is not handler
+    assert registry.serialize(Point(1, 2)) == json.dumps("1:2")
+
+
+def test_nested_containers_are_summarised():
+    registry = SerializerRegistry()
+
+    serialized = registry.serialize({"rows": list(range(10**6)), "meta": {"point": Point(1, 2)}})
+    assert len(serialized) < 1000
+    data = json.loads(serialized)
+    assert data["rows"]["length"] == 10**6
+    assert data["rows"]["head"] == [0, 1, 2, 3, 4]
+    assert data["meta"] == {"point": {"x": 1, "y": 2}}
+
+
+def test_deep_and_cyclic_values_are_bounded():
+    registry = SerializerRegistry()
+
+    nested = []
+    nested.append(nested)
+    assert "summary" in registry.serialize(nested)
+
+    wide = [[list(range(MAX_CONTAINER_ITEMS))] * MAX_CONTAINER_ITEMS] * MAX_CONTAINER_ITEMS
+    assert len(registry.serialize(wide)) < MAX_TOTAL_ITEMS * 10
@@ -0,0 +1,167 @@
+"""
+Instrumentation overhead benchmarks, run from clientside_v2:
+
+    python -m benchmarks [--iterations 2000] [--scenarios fastapi,redis] [--json results.json]
+
+Every scenario runs twice, each time in a fresh interpreter: uninstrumented, then with the CaptureFlow distro
+configured exactly like `opentelemetry-instrument` would. Spans go to the file exporter in a temporary directory and
+metrics stay off as by default, so nothing but the scenarios' in-process stand-ins is needed and nothing is retried
+against an absent collector at exit.
+
+Reported per operation: wall time in µs (median of the repeats), peak traced memory while it runs and memory still
+held afterwards, both from tracemalloc in a separate pass so tracing doesn't skew the timings.
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import List
+
+from benchmarks.scenarios import SCENARIOS
+
+MODES = ("baseline", "captureflow")
+WARMUP_ITERATIONS = 100
+REPEATS = 5
+
+
+def _configure_captureflow(export_dir: str) -> None:
+    os.environ.update(
+        {
+            "CF_TRACES_EXPORTER": "file",
+            "CF_FILE_EXPORT_DIR": export_dir,
+            "CF_METRICS": "false",
+        }
+    )
+    from captureflow.distro import CaptureFlowDistro
+
+    CaptureFlowDistro()._configure()
+
+
+def measure(name: str, instrumented: bool, iterations: int) -> dict:
+    operation, teardown = SCENARIOS[name](instrumented)
+    try:
+        for _ in range(WARMUP_ITERATIONS):
+            operation()
+
+        timings = []
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                operation()
+            timings.append((time.perf_counter() - start) / iterations * 1e6)
+
+        allocation_iterations = max(1, iterations // 10)
+        gc.collect()
+        tracemalloc.start()
+        peaks = []
+        baseline, _ = tracemalloc.get_traced_memory()
+        for _ in range(allocation_iterations):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            operation()
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+    finally:
+        if teardown is not None:
+            teardown()
+
+    return {
+        "scenario": name,
+        "mode": MODES[instrumented],
+        "us_per_op": statistics.median(timings),
+        "peak_bytes_per_op": statistics.mean(peaks),
+        "retained_bytes_per_op": retained / allocation_iterations,
+    }
+
+
+def run_mode(mode: str, scenarios: List[str], iterations: int) -> None:
+    """Child process entry point, prints one JSON result per line."""
+    instrumented = mode == "captureflow"
+    with tempfile.TemporaryDirectory() as export_dir:
+        if instrumented:
+            _configure_captureflow(export_dir)
+        for name in scenarios:
+            print(json.dumps(measure(name, instrumented, iterations)), flush=True)
+        if instrumented:
+            # Close the current span file while its directory still exists
+            from opentelemetry.trace import get_tracer_provider
+
+            get_tracer_provider().shutdown()
+
+
+def run(scenarios: List[str], iterations: int) -> List[dict]:
+    results = []
+    for mode in MODES:
+        command = [sys.executable, "-m", "benchmarks", "--mode", mode]
+        command += ["--scenarios", ",".join(scenarios), "--iterations", str(iterations)]
+        output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+        results += [json.loads(line) for line in output.splitlines() if line.startswith("{")]
+    return results
+
+
+def format_table(results: List[dict]) -> str:
+    by_key = {(result["scenario"], result["mode"]): result for result in results}
+    rows = [
+        ("scenario", "base µs/op", "cf µs/op", "overhead", "base KiB/op", "cf KiB/op", "cf retained B/op"),
+    ]
+    for name in dict.fromkeys(result["scenario"] for result in results):
+        base, instrumented = by_key[(name, "baseline")], by_key[(name, "captureflow")]
+        rows.append(
+            (
+                name,
+                f"{base['us_per_op']:.1f}",
+                f"{instrumented['us_per_op']:.1f}",
+                f"{instrumented['us_per_op'] / base['us_per_op']:.2f}x",
+                f"{base['peak_bytes_per_op'] / 1024:.1f}",
+                f"{instrumented['peak_bytes_per_op'] / 1024:.1f}",
+                f"{instrumented['retained_bytes_per_op']:.0f}",
+            )
+        )
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    return "\n".join(
+        "  ".join(
+            cell.ljust(width) if column == 0 else cell.rjust(width)
+            for column, (cell, width) in enumerate(zip(row, widths))
+        )
+        for row in rows
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure CaptureFlow instrumentation overhead.")
+    parser.add_argument("--iterations", type=int, default=2000, help="operations per timed repeat")
+    parser.add_argument(
+        "--scenarios", default=",".join(SCENARIOS), help=f"comma separated, from {', '.join(SCENARIOS)}"
+    )
+    parser.add_argument("--json", help="also write raw results to this file")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    if args.mode:
+        run_mode(args.mode, scenarios, args.iterations)
+        return 0
+
+    results = run(scenarios, args.iterations)
+    print(format_table(results))
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
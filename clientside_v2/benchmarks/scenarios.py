@@ -0,0 +1,152 @@
+"""
+One scenario per instrumentation, each using only in-process stand-ins so no docker-compose services are needed.
+
+A scenario is a setup function returning `(operation, teardown)`. Setups import their libraries lazily, so the
+CaptureFlow run configures the distro before any instrumented module is loaded, the way `opentelemetry-instrument`
+does.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+
+Operation = Callable[[], object]
+Scenario = Callable[[bool], Tuple[Operation, Optional[Callable[[], None]]]]
+
+ITEM = {"id": 1, "name": "widget", "tags": ["a", "b", "c"], "price": 9.99}
+ITEM_BODY = json.dumps(ITEM).encode()
+
+
+def fastapi_scenario(instrumented: bool):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def get_item(item_id: int):
+        return ITEM
+
+    client = TestClient(app)
+    return lambda: client.get("/items/1"), client.close
+
+
+def flask_scenario(instrumented: bool):
+    from flask import Flask
+
+    app = Flask(__name__)
+
+    @app.get("/items/<int:item_id>")
+    def get_item(item_id):
+        return ITEM
+
+    client = app.test_client()
+    return lambda: client.get("/items/1"), None
+
+
+class _ItemHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes, Nagle + delayed ACK would add ~40ms to every keep-alive request
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(ITEM_BODY)))
+        self.end_headers()
+        self.wfile.write(ITEM_BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def requests_scenario(instrumented: bool):
+    import requests
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ItemHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    session = requests.Session()
+    url = f"http://{host}:{port}/items/1"
+
+    def teardown():
+        session.close()
+        server.shutdown()
+        server.server_close()
+
+    return lambda: session.get(url).content, teardown
+
+
+def httpx_scenario(instrumented: bool):
+    import httpx
+
+    def handler(request):
+        return httpx.Response(200, content=ITEM_BODY, headers={"Content-Type": "application/json"})
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    return lambda: client.get("http://api.example.com/items/1").content, client.close
+
+
+def sqlalchemy_scenario(instrumented: bool):
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT, price REAL)"))
+        connection.execute(
+            text("INSERT INTO items (name, price) VALUES (:name, :price)"),
+            [{"name": f"item {i}", "price": i / 10} for i in range(20)],
+        )
+    query = text("SELECT id, name, price FROM items WHERE price > :price")
+
+    def operation():
+        with engine.connect() as connection:
+            return connection.execute(query, {"price": 1.0}).fetchall()
+
+    return operation, engine.dispose
+
+
+def redis_scenario(instrumented: bool):
+    import fakeredis
+
+    client = fakeredis.FakeRedis()
+    client.set("item:1", ITEM_BODY)
+
+    def operation():
+        client.incr("counter")
+        return client.get("item:1")
+
+    return operation, client.close
+
+
+def frame_info_scenario(instrumented: bool):
+    from opentelemetry.sdk.trace import TracerProvider
+
+    from captureflow.span_processor import FrameInfoSpanProcessor
+
+    # Span creation cost with and without the stack walk, independent of the global provider
+    tracer_provider = TracerProvider()
+    if instrumented:
+        tracer_provider.add_span_processor(FrameInfoSpanProcessor())
+    tracer = tracer_provider.get_tracer(__name__)
+
+    def nested(depth: int):
+        if depth:
+            return nested(depth - 1)
+        with tracer.start_as_current_span("handler"):
+            pass
+
+    return lambda: nested(10), tracer_provider.shutdown
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "fastapi": fastapi_scenario,
+    "flask": flask_scenario,
+    "requests": requests_scenario,
+    "httpx": httpx_scenario,
+    "sqlalchemy": sqlalchemy_scenario,
+    "redis": redis_scenario,
+    "frame_info": frame_info_scenario,
+}
@@ -0,0 +1,85 @@
+"""
+ASGI request and response body capture.
+`receive` and `send` are wrapped so body chunks are teed into capped buffers as they pass, streaming responses
+included, and the result is recorded on the current server span right before the last body chunk is sent.
+"""
+
+import time
+
+from opentelemetry import trace
+
+from captureflow.body_capture import BodyBuffer
+from captureflow.metrics import record_server_duration
+
+
+def _decode_headers(headers) -> dict:
+    return {name.decode("latin-1"): value.decode("latin-1") for name, value in headers}
+
+
+def _record(span: trace.Span, key: str, headers: dict, body: BodyBuffer) -> None:
+    span.set_attribute(f"{key}.headers", str(headers))
+    if body.total_bytes:
+        captured = body.capture(headers.get("content-type"))
+        if captured is not None:
+            span.set_attribute(f"{key}.body", captured)
+
+
+class BodyCaptureMiddleware:
+    """
+    Must run inside the middleware that starts the server span, its span is read when a request comes in.
+    Request duration is recorded for every request, bodies only when the span is recording.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        span = trace.get_current_span()
+        capture = span.is_recording()
+        start = time.perf_counter()
+        request_body = BodyBuffer() if capture else None
+        response_body = BodyBuffer() if capture else None
+        response_headers = {}
+        status_code = None
+        recorded = False
+
+        def record():
+            nonlocal recorded
+            recorded = True
+            # The router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", None)
+            record_server_duration((time.perf_counter() - start) * 1000, scope["method"], route, status_code)
+            if capture:
+                _record(span, "http.request", _decode_headers(scope.get("headers", ())), request_body)
+                _record(span, "http.response", response_headers, response_body)
+
+        async def capturing_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                request_body.write(message.get("body", b""))
+            return message
+
+        async def capturing_send(message):
+            nonlocal response_headers, status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if capture:
+                    response_headers = _decode_headers(message.get("headers", ()))
+            elif message["type"] == "http.response.body":
+                if capture:
+                    response_body.write(message.get("body", b""))
+                # OpenTelemetryMiddleware ends the server span once the last chunk is sent,
+                # background tasks that run afterwards are not part of the request's duration
+                if not message.get("more_body", False):
+                    record()
+            await send(message)
+
+        try:
+            await self.app(scope, capturing_receive if capture else receive, capturing_send)
+        finally:
+            # Failed or abandoned responses, the span is still open
+            if not recorded:
+                record()
@@ -0,0 +1,117 @@
+"""
+Shared policy for recording HTTP bodies as span attributes.
+Every instrumentation goes through `capture_body`, so memory and export size per span have a hard upper bound.
+"""
+
+import functools
+from typing import Optional, Union
+
+from captureflow.config import (
+    CF_BODY_CONTENT_TYPES_ALLOW,
+    CF_BODY_CONTENT_TYPES_DENY,
+    CF_BODY_MAX_BYTES,
+)
+
+BINARY_SNIFF_BYTES = 1024
+
+
+def truncation_marker(dropped_bytes: int) -> str:
+    return f"...[truncated {dropped_bytes} bytes]"
+
+
+def binary_marker(total_bytes: int) -> str:
+    return f"[binary body: {total_bytes} bytes]"
+
+
+@functools.lru_cache(maxsize=256)
+def is_capturable_content_type(content_type: Optional[str]) -> bool:
+    """
+    Deny list wins over allow list, an empty allow list allows everything. Entries are prefixes, e.g. "image/".
+    A missing content type is allowed, binary detection still applies.
+    """
+    if not content_type:
+        return True
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if any(media_type.startswith(denied) for denied in CF_BODY_CONTENT_TYPES_DENY):
+        return False
+    return not CF_BODY_CONTENT_TYPES_ALLOW or any(
+        media_type.startswith(allowed) for allowed in CF_BODY_CONTENT_TYPES_ALLOW
+    )
+
+
+def _decode_head(data: bytes, encoding: str, truncated: bool) -> Optional[str]:
+    """Decode captured bytes, None if they look binary."""
+    if b"\x00" in data[:BINARY_SNIFF_BYTES]:
+        return None
+    try:
+        return data.decode(encoding)
+    except UnicodeDecodeError as e:
+        # Truncation may cut a multi-byte character in half, anything else is not text
+        if truncated and encoding.replace("-", "").lower() == "utf8" and e.start >= len(data) - 3:
+            return data[: e.start].decode(encoding, errors="replace")
+        return None
+    except LookupError:
+        return data.decode("utf-8", errors="replace")
+
+
+def capture_body(
+    body: Union[bytes, bytearray, memoryview, str, None],
+    content_type: Optional[str] = None,
+    total_bytes: Optional[int] = None,
+    encoding: Optional[str] = None,
+    max_bytes: int = CF_BODY_MAX_BYTES,
+) -> Optional[str]:
+    """
+    Text to record for `body`, or None when nothing should be recorded.
+    `body` may already be cut to `max_bytes` by the caller, `total_bytes` is then the full size.
+    """
+    if not body or max_bytes <= 0 or not is_capturable_content_type(content_type):
+        return None
+
+    if isinstance(body, str):
+        # Slicing first keeps the copy at O(max_bytes) for huge strings
+        head = body[:max_bytes]
+        data = head.encode("utf-8", errors="replace")
+        if total_bytes is None:
+            # Markers report UTF-8 bytes, only non-ASCII tails have to be encoded to be measured
+            tail = body[len(head) :]
+            total_bytes = len(data) + (len(tail) if tail.isascii() else len(tail.encode("utf-8", errors="replace")))
+        data = data[:max_bytes]
+        encoding = "utf-8"
+    else:
+        data = bytes(body[:max_bytes])
+        total_bytes = total_bytes if total_bytes is not None else len(body)
+
+    truncated = total_bytes > len(data)
+    text = _decode_head(data, encoding or "utf-8", truncated)
+    if text is None:
+        return binary_marker(total_bytes)
+    if truncated:
+        text += truncation_marker(total_bytes - len(data))
+    return text
+
+
+class BodyBuffer:
+    """First `max_bytes` of a body that is read in chunks, plus its total size."""
+
+    __slots__ = ("max_bytes", "total_bytes", "_head")
+
+    def __init__(self, max_bytes: int = CF_BODY_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._head = bytearray()
+
+    def write(self, chunk: bytes) -> None:
+        self.total_bytes += len(chunk)
+        room = self.max_bytes - len(self._head)
+        if room > 0:
+            self._head += chunk[:room]
+
+    def capture(self, content_type: Optional[str] = None, encoding: Optional[str] = None) -> Optional[str]:
+        return capture_body(
+            bytes(self._head),
+            content_type=content_type,
+            total_bytes=self.total_bytes,
+            encoding=encoding,
+            max_bytes=self.max_bytes,
+        )
@@ -5,6 +5,101 @@ from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
+
+def _csv(value: str) -> tuple:
+    return tuple(item.strip().lower() for item in value.split(",") if item.strip())
+
+
 CF_SERVICE_NAME = os.getenv("CF_SERVICE_NAME", "default_service_name")
 CF_DEBUG = os.getenv("CF_DEBUG", False)
-CF_OTLP_ENDPOINT = os.getenv("CF_OTLP_ENDPOINT", "http://localhost:4317")  # gRPC OTLP by default
+CF_OTLP_PROTOCOL = os.getenv("CF_OTLP_PROTOCOL", "grpc")  # "grpc" or "http/protobuf"
+CF_OTLP_ENDPOINT = os.getenv(
+    "CF_OTLP_ENDPOINT",
+    "http://localhost:4318/v1/traces" if CF_OTLP_PROTOCOL == "http/protobuf" else "http://localhost:4317",
+)  # gRPC OTLP by default
+CF_OTLP_COMPRESSION = os.getenv("CF_OTLP_COMPRESSION", "none").strip().lower()
+OTLP_COMPRESSIONS = ("none", "gzip", "deflate")
+if CF_OTLP_COMPRESSION not in OTLP_COMPRESSIONS:
+    # Checked once here, the span, metric and upload exporters all index their codec tables with it
+    raise ValueError(
+        f"Unsupported CF_OTLP_COMPRESSION: {CF_OTLP_COMPRESSION!r}, expected one of {', '.join(OTLP_COMPRESSIONS)}"
+    )
+
+# "otlp" sends spans to CF_OTLP_ENDPOINT, "file" writes them to rotating gzip files for `python -m captureflow.upload`
+CF_TRACES_EXPORTER = os.getenv("CF_TRACES_EXPORTER", "otlp")
+CF_FILE_EXPORT_DIR = os.getenv("CF_FILE_EXPORT_DIR", "captureflow-spans")
+CF_FILE_EXPORT_FORMAT = os.getenv("CF_FILE_EXPORT_FORMAT", "json")  # "json" (OTLP/JSON lines) or "protobuf"
+CF_FILE_EXPORT_MAX_BYTES = int(os.getenv("CF_FILE_EXPORT_MAX_BYTES", 64 * 1024 * 1024))
+CF_FILE_EXPORT_MAX_FILES = int(os.getenv("CF_FILE_EXPORT_MAX_FILES", 20))
+# Upper bound for exporting queued spans before fork(), only spent when spans are queued
+CF_FORK_FLUSH_TIMEOUT_MILLIS = int(os.getenv("CF_FORK_FLUSH_TIMEOUT_MILLIS", 1000))
+
+# Latency histograms, exported over CF_OTLP_PROTOCOL independently of span sampling. Opt-in, they need a collector
+# accepting metrics. The final export at exit gets at most CF_METRICS_SHUTDOWN_TIMEOUT_MILLIS, retries included
+CF_METRICS = os.getenv("CF_METRICS", "false").lower() == "true"
+CF_METRICS_SHUTDOWN_TIMEOUT_MILLIS = int(os.getenv("CF_METRICS_SHUTDOWN_TIMEOUT_MILLIS", 1000))
+CF_OTLP_METRICS_ENDPOINT = os.getenv(
+    "CF_OTLP_METRICS_ENDPOINT",
+    "http://localhost:4318/v1/metrics" if CF_OTLP_PROTOCOL == "http/protobuf" else CF_OTLP_ENDPOINT,
+)
+CF_METRICS_EXPORT_INTERVAL_MILLIS = int(os.getenv("CF_METRICS_EXPORT_INTERVAL_MILLIS", 60000))
+
+# HTTP body capture, content type entries are prefixes ("image/" denies every image type)
+CF_BODY_MAX_BYTES = int(os.getenv("CF_BODY_MAX_BYTES", 16384))
+CF_BODY_CONTENT_TYPES_ALLOW = _csv(os.getenv("CF_BODY_CONTENT_TYPES_ALLOW", ""))
+CF_BODY_CONTENT_TYPES_DENY = _csv(
+    os.getenv(
+        "CF_BODY_CONTENT_TYPES_DENY",
+        "image/,audio/,video/,font/,application/octet-stream,application/pdf,application/zip,application/gzip",
+    )
+)
+
+# Database results, recorded while the application fetches them. String and bytes values of result rows and
+# statement parameters are cut to CF_DB_VALUE_MAX_LENGTH
+CF_DB_RESULT_MAX_ROWS = int(os.getenv("CF_DB_RESULT_MAX_ROWS", 100))
+CF_DB_RESULT_MAX_BYTES = int(os.getenv("CF_DB_RESULT_MAX_BYTES", 16384))
+CF_DB_VALUE_MAX_LENGTH = int(os.getenv("CF_DB_VALUE_MAX_LENGTH", 256))
+CF_DB_PARAMETERS_MAX_BYTES = int(os.getenv("CF_DB_PARAMETERS_MAX_BYTES", 4096))
+
+# SQL statements are aggregated per fingerprint and exported as periodic summary spans,
+# per-query spans are kept for a CF_SQL_SPAN_SAMPLE_RATE fraction of executions
+CF_SQL_SUMMARY = os.getenv("CF_SQL_SUMMARY", "true").lower() == "true"
+CF_SQL_SUMMARY_INTERVAL_SECONDS = float(os.getenv("CF_SQL_SUMMARY_INTERVAL_SECONDS", 60))
+CF_SQL_SUMMARY_MAX_FINGERPRINTS = int(os.getenv("CF_SQL_SUMMARY_MAX_FINGERPRINTS", 1000))
+CF_SQL_SPAN_SAMPLE_RATE = float(os.getenv("CF_SQL_SPAN_SAMPLE_RATE", 1.0))
+
+# DB-API drivers to trace besides sqlite3, e.g. "psycopg2,pymysql"
+CF_DBAPI_MODULES = tuple(name.strip() for name in os.getenv("CF_DBAPI_MODULES", "").split(",") if name.strip())
+
+# Redis arguments and replies are recorded as reprs of at most CF_REDIS_MAX_ITEMS elements and CF_REDIS_MAX_BYTES,
+# command latencies are aggregated per command like SQL statements
+CF_REDIS_MAX_ITEMS = int(os.getenv("CF_REDIS_MAX_ITEMS", 20))
+CF_REDIS_MAX_BYTES = int(os.getenv("CF_REDIS_MAX_BYTES", 1024))
+CF_REDIS_SUMMARY = os.getenv("CF_REDIS_SUMMARY", "true").lower() == "true"
+
+# Thread pool submissions waiting at least this long before a worker picks them up get an "executor queue wait" span
+CF_EXECUTOR_QUEUE_WAIT_MIN_MS = float(os.getenv("CF_EXECUTOR_QUEUE_WAIT_MIN_MS", 1.0))
+
+# N+1 detection: repeats of one SQL fingerprint or HTTP URL under the same parent span
+CF_N_PLUS_ONE = os.getenv("CF_N_PLUS_ONE", "true").lower() == "true"
+CF_N_PLUS_ONE_THRESHOLD = int(os.getenv("CF_N_PLUS_ONE_THRESHOLD", 10))
+
+# BatchSpanProcessor, defaults are the OpenTelemetry SDK ones
+CF_BSP_MAX_QUEUE_SIZE = int(os.getenv("CF_BSP_MAX_QUEUE_SIZE", 2048))
+CF_BSP_MAX_EXPORT_BATCH_SIZE = int(os.getenv("CF_BSP_MAX_EXPORT_BATCH_SIZE", 512))
+CF_BSP_SCHEDULE_DELAY_MILLIS = int(os.getenv("CF_BSP_SCHEDULE_DELAY_MILLIS", 5000))
+CF_BSP_EXPORT_TIMEOUT_MILLIS = int(os.getenv("CF_BSP_EXPORT_TIMEOUT_MILLIS", 30000))
+
+# Tail-based sampling: keep errored or slow traces, plus a share of all others
+CF_TAIL_SAMPLING = os.getenv("CF_TAIL_SAMPLING", "false").lower() == "true"
+CF_TAIL_SAMPLING_RATE = float(os.getenv("CF_TAIL_SAMPLING_RATE", 0.1))
+CF_TAIL_SAMPLING_LATENCY_MS = float(os.getenv("CF_TAIL_SAMPLING_LATENCY_MS", 1000))
+CF_TAIL_SAMPLING_MAX_SPANS = int(os.getenv("CF_TAIL_SAMPLING_MAX_SPANS", 10000))
+
+# Last completed traces kept in memory and served as JSON on CF_DEBUG_SERVER_PORT (0 disables the server)
+CF_RECENT_TRACES = os.getenv("CF_RECENT_TRACES", "false").lower() == "true"
+CF_RECENT_TRACES_MAX = int(os.getenv("CF_RECENT_TRACES_MAX", 200))
+CF_RECENT_TRACES_MAX_BYTES = int(os.getenv("CF_RECENT_TRACES_MAX_BYTES", 8 * 1024 * 1024))
+CF_RECENT_TRACES_MAX_PENDING_SECONDS = float(os.getenv("CF_RECENT_TRACES_MAX_PENDING_SECONDS", 300))
+CF_DEBUG_SERVER_HOST = os.getenv("CF_DEBUG_SERVER_HOST", "127.0.0.1")
+CF_DEBUG_SERVER_PORT = int(os.getenv("CF_DEBUG_SERVER_PORT", 0))
@@ -0,0 +1,74 @@
+"""
+OTel context propagation into thread pools.
+
+asyncio tasks already run in a copy of the context that created them, but ThreadPoolExecutor workers, and with them
+`loop.run_in_executor`, run submissions in the worker thread's own context: spans started there became separate
+root traces. Submissions now carry a copy of the submitter's context, and time spent waiting for a free worker is
+recorded as a span under the submitting span.
+"""
+
+import contextvars
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind
+
+from captureflow.config import CF_EXECUTOR_QUEUE_WAIT_MIN_MS
+
+_tracer: Optional[trace.Tracer] = None
+_min_queue_wait_ns = 0
+
+
+def _record_queue_wait(executor_name: str, fn, submitted_ns: int, started_ns: int) -> None:
+    if _tracer is None or started_ns - submitted_ns < _min_queue_wait_ns:
+        return
+    # Only as part of a trace, waits of untraced submissions are not worth a root span each
+    if not trace.get_current_span().is_recording():
+        return
+    span = _tracer.start_span(
+        "executor queue wait",
+        kind=SpanKind.INTERNAL,
+        start_time=submitted_ns,
+        attributes={
+            "executor.class": executor_name,
+            "executor.queue_wait_ms": (started_ns - submitted_ns) / 1e6,
+            "code.function": getattr(fn, "__qualname__", type(fn).__qualname__),
+        },
+    )
+    span.end(end_time=started_ns)
+
+
+def _run_submission(executor_name: str, submitted_ns: int, fn, args, kwargs):
+    _record_queue_wait(executor_name, fn, submitted_ns, time.time_ns())
+    return fn(*args, **kwargs)
+
+
+def _run_in_context(context: contextvars.Context, executor_name: str, submitted_ns: int, fn, *args, **kwargs):
+    return context.run(_run_submission, executor_name, submitted_ns, fn, args, kwargs)
+
+
+def instrument_thread_pools(tracer: trace.Tracer, min_queue_wait_ms: float = CF_EXECUTOR_QUEUE_WAIT_MIN_MS) -> None:
+    global _tracer, _min_queue_wait_ns
+    # Module globals, every executor instance shares the patched method
+    _tracer = tracer
+    _min_queue_wait_ns = int(min_queue_wait_ms * 1e6)
+
+    original_submit = ThreadPoolExecutor.submit
+    if hasattr(original_submit, "_captureflow_original"):
+        return
+
+    @functools.wraps(original_submit)
+    def submit(self, fn, /, *args, **kwargs):
+        # copy_context() is O(1), contexts are immutable mappings
+        return original_submit(
+            self,
+            functools.partial(_run_in_context, contextvars.copy_context(), type(self).__name__, time.time_ns(), fn),
+            *args,
+            **kwargs,
+        )
+
+    submit._captureflow_original = original_submit
+    ThreadPoolExecutor.submit = submit
@@ -0,0 +1,261 @@
+"""
+Helpers shared by database instrumentations: cached statement analysis and result capture for DB-API cursors.
+Rows are recorded while the application fetches them, so a query is never executed a second time just to trace it.
+"""
+
+import functools
+import itertools
+import re
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import sqlparse
+from opentelemetry import trace
+
+from captureflow.body_capture import truncation_marker
+from captureflow.config import (
+    CF_DB_PARAMETERS_MAX_BYTES,
+    CF_DB_RESULT_MAX_BYTES,
+    CF_DB_RESULT_MAX_ROWS,
+    CF_DB_VALUE_MAX_LENGTH,
+)
+
+MAX_CACHED_STATEMENTS = 2048
+
+# executemany() parameter sets recorded in db.parameters
+MAX_PARAMETER_SETS = 100
+
+# Statements starting with one of these are classified without parsing
+SIMPLE_STATEMENT_KEYWORDS = frozenset(
+    "SELECT INSERT UPDATE DELETE REPLACE CREATE DROP ALTER TRUNCATE "
+    "BEGIN COMMIT ROLLBACK SAVEPOINT RELEASE PRAGMA SET SHOW".split()
+)
+
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_VALUE_LIST_RE = re.compile(r"\?(?:\s*,\s*\?)+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class StatementInfo(NamedTuple):
+    statement_type: str
+    fingerprint: str
+    span_name: str
+
+
+def fingerprint_statement(statement: str) -> str:
+    """Normalize a statement so that executions differing only in literal values compare equal."""
+    fingerprint = _COMMENT_RE.sub(" ", statement)
+    fingerprint = _STRING_LITERAL_RE.sub("?", fingerprint)
+    fingerprint = _NUMBER_LITERAL_RE.sub("?", fingerprint)
+    fingerprint = _VALUE_LIST_RE.sub("?", fingerprint)
+    return _WHITESPACE_RE.sub(" ", fingerprint).strip()
+
+
+def _statement_type(statement: str) -> str:
+    words = statement.split(None, 1)
+    keyword = words[0].upper() if words else ""
+    if keyword in SIMPLE_STATEMENT_KEYWORDS:
+        return keyword
+
+    # CTEs, leading comments or parentheses, only these need a real parse
+    parsed = sqlparse.parse(statement)
+    statement_type = parsed[0].get_type().upper() if parsed else "UNKNOWN"
+    return keyword if statement_type == "UNKNOWN" and keyword.isalpha() else statement_type
+
+
+@functools.lru_cache(maxsize=MAX_CACHED_STATEMENTS)
+def analyze_statement(statement: str, span_name_prefix: str) -> StatementInfo:
+    """
+    Type, fingerprint and span name of a statement. ORMs execute the same few hundred statement texts over and over,
+    so after warm-up this is a dict lookup per query.
+    """
+    statement_type = _statement_type(statement)
+    return StatementInfo(statement_type, fingerprint_statement(statement), f"{span_name_prefix}: {statement_type}")
+
+
+class TruncatedValue:
+    """Head of a long string or bytes value, its repr says how much was cut."""
+
+    __slots__ = ("head", "dropped")
+
+    def __init__(self, head, dropped: int):
+        self.head = head
+        self.dropped = dropped
+
+    def __repr__(self) -> str:
+        return f"{self.head!r}{truncation_marker(self.dropped)}"
+
+
+def cap_value(value, max_length: int = CF_DB_VALUE_MAX_LENGTH):
+    if isinstance(value, (str, bytes, bytearray)) and len(value) > max_length:
+        return TruncatedValue(value[:max_length], len(value) - max_length)
+    return value
+
+
+def _cap_parameters(parameters, max_length: int):
+    if isinstance(parameters, dict):
+        return {key: cap_value(value, max_length) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        # executemany() passes a sequence of parameter sets
+        capped = [_cap_parameters(item, max_length) for item in itertools.islice(parameters, MAX_PARAMETER_SETS)]
+        return tuple(capped) if isinstance(parameters, tuple) else capped
+    return cap_value(parameters, max_length)
+
+
+def format_parameters(
+    parameters, max_length: int = CF_DB_VALUE_MAX_LENGTH, max_bytes: int = CF_DB_PARAMETERS_MAX_BYTES
+) -> str:
+    """str() of statement parameters with long values cut, cut to `max_bytes` characters."""
+    text = str(_cap_parameters(parameters, max_length))
+    if isinstance(parameters, (list, tuple)) and len(parameters) > MAX_PARAMETER_SETS:
+        text += f"...[{len(parameters) - MAX_PARAMETER_SETS} more items]"
+    if len(text) > max_bytes:
+        text = text[:max_bytes] + truncation_marker(len(text) - max_bytes)
+    return text
+
+
+def suppress_dbapi_tracing(dbapi_connection) -> None:
+    """Connections owned by SQLAlchemy are traced by the SQLAlchemy instrumentation, not a second time by DB-API tracing."""
+    if hasattr(dbapi_connection, "captureflow_suppressed"):
+        dbapi_connection.captureflow_suppressed = True
+
+
+class ResultCapture:
+    """
+    Rows of one query result, recorded on `span` as the application fetches them, up to `max_rows` rows and
+    `max_bytes` of row reprs, with string and bytes values cut to `max_value_length`.
+    `finish` ends the span, then calls `on_finish` with the number of rows fetched.
+    """
+
+    def __init__(
+        self,
+        span: trace.Span,
+        description,
+        max_rows: int = CF_DB_RESULT_MAX_ROWS,
+        max_bytes: int = CF_DB_RESULT_MAX_BYTES,
+        on_finish: Optional[Callable[[int], None]] = None,
+        max_value_length: int = CF_DB_VALUE_MAX_LENGTH,
+    ):
+        self.span = span
+        self.on_finish = on_finish
+        self.rows_fetched = 0
+        self._columns = [desc[0] for desc in description]
+        self._rows: List[Dict[str, Any]] = []
+        self._captured_bytes = 0
+        self._capturing = span.is_recording() and max_rows > 0 and max_bytes > 0
+        self._max_rows = max_rows
+        self._max_bytes = max_bytes
+        self._max_value_length = max_value_length
+        self._values_truncated = 0
+        self._value_bytes_dropped = 0
+        self._ended = False
+
+    def _capture_row(self, row) -> Dict[str, Any]:
+        captured = {}
+        for column, value in zip(self._columns, row):
+            value = cap_value(value, self._max_value_length)
+            if isinstance(value, TruncatedValue):
+                self._values_truncated += 1
+                self._value_bytes_dropped += value.dropped
+            captured[column] = value
+        return captured
+
+    def add(self, rows) -> None:
+        self.rows_fetched += len(rows)
+        if not self._capturing:
+            return
+        for row in rows:
+            if len(self._rows) >= self._max_rows:
+                self._capturing = False
+                return
+            captured = self._capture_row(row)
+            self._captured_bytes += len(repr(captured))
+            if self._captured_bytes > self._max_bytes:
+                self._capturing = False
+                return
+            self._rows.append(captured)
+
+    def finish(self) -> None:
+        if self._ended:
+            return
+        self._ended = True
+        if self.span.is_recording():
+            self._record_summary()
+        self.span.end()
+        if self.on_finish is not None:
+            self.on_finish(self.rows_fetched)
+
+    def _record_summary(self) -> None:
+        if self._rows:
+            self.span.set_attribute("db.result_data", str(self._rows))
+        self.span.set_attribute("db.result.rows_total", self.rows_fetched)
+        # Rows past the caps are only counted, measuring them would cost as much as capturing them
+        if len(self._rows) < self.rows_fetched:
+            self.span.set_attribute("db.result.rows_captured", len(self._rows))
+        if self._values_truncated:
+            self.span.set_attribute("db.result.values_truncated", self._values_truncated)
+            self.span.set_attribute("db.result.bytes_dropped", self._value_bytes_dropped)
+
+
+class ResultCapturingCursor:
+    """
+    Proxy for a DB-API cursor that records fetched rows through a `ResultCapture`.
+    The span ends when the cursor is closed, exhausted, or garbage collected, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        cursor,
+        span: trace.Span,
+        max_rows: int = CF_DB_RESULT_MAX_ROWS,
+        max_bytes: int = CF_DB_RESULT_MAX_BYTES,
+        on_finish: Optional[Callable[[int], None]] = None,
+    ):
+        self._cursor = cursor
+        self._result = ResultCapture(span, cursor.description, max_rows, max_bytes, on_finish)
+
+    @property
+    def rows_fetched(self) -> int:
+        return self._result.rows_fetched
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is None:
+            self._result.finish()
+        else:
+            self._result.add((row,))
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        if rows:
+            self._result.add(rows)
+        else:
+            self._result.finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._result.add(rows)
+        self._result.finish()
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._result.add((row,))
+            yield row
+        self._result.finish()
+
+    def close(self):
+        try:
+            self._cursor.close()
+        finally:
+            self._result.finish()
+
+    def __del__(self):
+        # Results that are dropped without being read to the end or closed still get their span exported
+        self._result.finish()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
@@ -0,0 +1,313 @@
+"""
+Tracing for DB-API 2.0 drivers used directly, without SQLAlchemy.
+
+sqlite3 connections are created through a traced `factory=` subclass, so they remain real `sqlite3.Connection`
+instances. Other drivers listed in CF_DBAPI_MODULES get their connections wrapped in proxies.
+"""
+
+import functools
+import random
+import sqlite3
+import time
+from typing import Optional, Tuple
+
+import wrapt
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind
+
+from captureflow.config import CF_SQL_SPAN_SAMPLE_RATE, CF_SQL_SUMMARY
+from captureflow.db import ResultCapture, analyze_statement, format_parameters
+from captureflow.metrics import record_db_duration
+from captureflow.query_stats import query_stats
+
+
+class DBAPITracer:
+    def __init__(self, tracer: trace.Tracer, db_system: str, span_name_prefix: str):
+        self.tracer = tracer
+        self.db_system = db_system
+        self.span_name_prefix = span_name_prefix
+
+    def execute(
+        self, dbapi_cursor, statement: str, parameters, execute, args: tuple, kwargs: dict
+    ) -> Tuple[object, Optional[ResultCapture]]:
+        """
+        Run `execute(*args, **kwargs)` for `statement` on `dbapi_cursor`.
+        Returns its result and, for row-returning statements, the `ResultCapture` that ends the span.
+        """
+        statement_info = analyze_statement(statement, self.span_name_prefix)
+        if random.random() < CF_SQL_SPAN_SAMPLE_RATE:
+            span = self.tracer.start_span(statement_info.span_name, kind=SpanKind.CLIENT)
+            # Spans dropped by the sampler don't pay for formatting the parameters
+            if span.is_recording():
+                span.set_attribute("db.system", self.db_system)
+                span.set_attribute("db.statement", statement)
+                span.set_attribute("db.statement.fingerprint", statement_info.fingerprint)
+                if parameters:
+                    span.set_attribute("db.parameters", format_parameters(parameters))
+        else:
+            span = trace.INVALID_SPAN
+
+        start = time.perf_counter()
+        try:
+            with trace.use_span(span):
+                result = execute(*args, **kwargs)
+        except BaseException:
+            span.end()
+            raise
+        duration_ms = (time.perf_counter() - start) * 1000
+        record_db_duration(duration_ms, self.db_system, statement_info.statement_type)
+
+        on_finish = None
+        if CF_SQL_SUMMARY:
+            on_finish = functools.partial(
+                query_stats.record,
+                statement_info.fingerprint,
+                self.db_system,
+                statement_info.statement_type,
+                duration_ms,
+            )
+
+        rowcount = getattr(dbapi_cursor, "rowcount", -1)
+        recording = span.is_recording()
+        if recording:
+            span.set_attribute("db.row_count", rowcount)
+
+        description = dbapi_cursor.description
+        if description and (recording or on_finish is not None):
+            if recording:
+                span.set_attribute("db.result_columns", str([desc[0] for desc in description]))
+            return result, ResultCapture(span, description, on_finish=on_finish)
+
+        span.end()
+        if on_finish is not None:
+            on_finish(rowcount)
+        return result, None
+
+
+class _TracedSQLiteCursorMixin:
+    dbapi_tracer: Optional[DBAPITracer] = None
+    captureflow_suppressed = False
+    _result_capture: Optional[ResultCapture] = None
+
+    def _finish_result(self):
+        if self._result_capture is not None:
+            self._result_capture.finish()
+            self._result_capture = None
+
+    def _traced_execute(self, execute, sql, parameters):
+        # A new statement discards whatever was left of the previous result
+        self._finish_result()
+        if self.captureflow_suppressed or self.dbapi_tracer is None:
+            return execute(sql, parameters)
+        result, self._result_capture = self.dbapi_tracer.execute(self, sql, parameters, execute, (sql, parameters), {})
+        return result
+
+    def execute(self, sql, parameters=()):
+        return self._traced_execute(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._traced_execute(super().executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        row = super().fetchone()
+        if self._result_capture is not None:
+            if row is None:
+                self._finish_result()
+            else:
+                self._result_capture.add((row,))
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        if self._result_capture is not None:
+            if rows:
+                self._result_capture.add(rows)
+            else:
+                self._finish_result()
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        if self._result_capture is not None:
+            self._result_capture.add(rows)
+            self._finish_result()
+        return rows
+
+    def __next__(self):
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._finish_result()
+            raise
+        if self._result_capture is not None:
+            self._result_capture.add((row,))
+        return row
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._finish_result()
+
+    def __del__(self):
+        self._finish_result()
+
+
+class _TracedSQLiteConnectionMixin:
+    captureflow_suppressed = False
+
+    def cursor(self, factory=sqlite3.Cursor):
+        cursor = super().cursor(traced_sqlite_cursor_class(factory))
+        cursor.captureflow_suppressed = self.captureflow_suppressed
+        return cursor
+
+    # The C implementations of these shortcuts don't go through Cursor.execute()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+@functools.lru_cache(maxsize=None)
+def traced_sqlite_cursor_class(cursor_class: type) -> type:
+    if issubclass(cursor_class, _TracedSQLiteCursorMixin):
+        return cursor_class
+    return type(f"Traced{cursor_class.__name__}", (_TracedSQLiteCursorMixin, cursor_class), {})
+
+
+@functools.lru_cache(maxsize=None)
+def traced_sqlite_connection_class(connection_class: type) -> type:
+    if issubclass(connection_class, _TracedSQLiteConnectionMixin):
+        return connection_class
+    return type(f"Traced{connection_class.__name__}", (_TracedSQLiteConnectionMixin, connection_class), {})
+
+
+def instrument_sqlite3(tracer: trace.Tracer) -> None:
+    # Class attribute, the cursor classes are shared by every connection
+    _TracedSQLiteCursorMixin.dbapi_tracer = DBAPITracer(tracer, "sqlite", "sqlite3")
+
+    original_connect = sqlite3.connect
+    if hasattr(original_connect, "_captureflow_original"):
+        return
+
+    @functools.wraps(original_connect)
+    def connect(*args, **kwargs):
+        # factory is the 6th positional parameter, nobody passes it that way
+        if len(args) < 6:
+            kwargs["factory"] = traced_sqlite_connection_class(kwargs.get("factory", sqlite3.Connection))
+        return original_connect(*args, **kwargs)
+
+    connect._captureflow_original = original_connect
+    # SQLAlchemy calls sqlite3.dbapi2.connect
+    sqlite3.connect = sqlite3.dbapi2.connect = connect
+
+
+class TracedCursorProxy(wrapt.ObjectProxy):
+    captureflow_suppressed = False
+
+    def __init__(self, cursor, dbapi_tracer: DBAPITracer):
+        super().__init__(cursor)
+        self._self_dbapi_tracer = dbapi_tracer
+        self._self_result_capture: Optional[ResultCapture] = None
+
+    def _finish_result(self):
+        if self._self_result_capture is not None:
+            self._self_result_capture.finish()
+            self._self_result_capture = None
+
+    def _traced_execute(self, execute, operation, args, kwargs):
+        self._finish_result()
+        if self.captureflow_suppressed:
+            return execute(operation, *args, **kwargs)
+        parameters = args[0] if args else kwargs.get("parameters")
+        result, self._self_result_capture = self._self_dbapi_tracer.execute(
+            self.__wrapped__, operation, parameters, execute, (operation, *args), kwargs
+        )
+        return result
+
+    def execute(self, operation, *args, **kwargs):
+        return self._traced_execute(self.__wrapped__.execute, operation, args, kwargs)
+
+    def executemany(self, operation, *args, **kwargs):
+        return self._traced_execute(self.__wrapped__.executemany, operation, args, kwargs)
+
+    def fetchone(self):
+        row = self.__wrapped__.fetchone()
+        if self._self_result_capture is not None:
+            if row is None:
+                self._finish_result()
+            else:
+                self._self_result_capture.add((row,))
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self.__wrapped__.fetchmany(*args, **kwargs)
+        if self._self_result_capture is not None:
+            if rows:
+                self._self_result_capture.add(rows)
+            else:
+                self._finish_result()
+        return rows
+
+    def fetchall(self):
+        rows = self.__wrapped__.fetchall()
+        if self._self_result_capture is not None:
+            self._self_result_capture.add(rows)
+            self._finish_result()
+        return rows
+
+    def __iter__(self):
+        for row in self.__wrapped__:
+            if self._self_result_capture is not None:
+                self._self_result_capture.add((row,))
+            yield row
+        self._finish_result()
+
+    def close(self):
+        try:
+            self.__wrapped__.close()
+        finally:
+            self._finish_result()
+
+    def __enter__(self):
+        self.__wrapped__.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self.__wrapped__.__exit__(*exc_info)
+
+
+class TracedConnectionProxy(wrapt.ObjectProxy):
+    captureflow_suppressed = False
+
+    def __init__(self, connection, dbapi_tracer: DBAPITracer):
+        super().__init__(connection)
+        self._self_dbapi_tracer = dbapi_tracer
+
+    def cursor(self, *args, **kwargs):
+        cursor = TracedCursorProxy(self.__wrapped__.cursor(*args, **kwargs), self._self_dbapi_tracer)
+        cursor.captureflow_suppressed = self.captureflow_suppressed
+        return cursor
+
+    def __enter__(self):
+        self.__wrapped__.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self.__wrapped__.__exit__(*exc_info)
+
+
+def instrument_dbapi_module(module, tracer: trace.Tracer) -> None:
+    """Wrap the connections returned by `module.connect` of a DB-API 2.0 driver."""
+    original_connect = module.connect
+    if hasattr(original_connect, "_captureflow_original"):
+        return
+    dbapi_tracer = DBAPITracer(tracer, module.__name__, module.__name__)
+
+    @functools.wraps(original_connect)
+    def connect(*args, **kwargs):
+        return TracedConnectionProxy(original_connect(*args, **kwargs), dbapi_tracer)
+
+    connect._captureflow_original = original_connect
+    module.connect = connect
@@ -0,0 +1,221 @@
+"""
+Serves the traces kept by `RecentTracesSpanProcessor` as JSON, with latency percentiles per root span name.
+
+    GET /traces?limit=20&name=GET%20/users     newest traces first, plus the summary
+    GET /traces/<trace id in hex>                a single trace
+    GET /summary                                 latency summary only
+
+A standalone server is started on CF_DEBUG_SERVER_PORT, or `DebugTracesApp` can be mounted into an ASGI app:
+
+    app.mount("/_captureflow", DebugTracesApp())
+
+Both only ever read the in-memory buffer, nothing is sent off-box. The standalone server binds to
+CF_DEBUG_SERVER_HOST (loopback by default) and runs in the process that configured the distro, pre-fork servers
+should mount the ASGI route so every worker serves its own traces.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging import getLogger
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.trace import StatusCode
+
+from captureflow.config import (
+    CF_DEBUG_SERVER_HOST,
+    CF_DEBUG_SERVER_PORT,
+    CF_RECENT_TRACES_MAX,
+    CF_RECENT_TRACES_MAX_BYTES,
+    CF_RECENT_TRACES_MAX_PENDING_SECONDS,
+)
+from captureflow.span_processor import RecentTracesSpanProcessor
+
+logger = getLogger(__name__)
+
+DEFAULT_LIMIT = 50
+PERCENTILES = (50, 95, 99)
+
+# Set by `install_recent_traces`, served by default
+recent_traces: Optional[RecentTracesSpanProcessor] = None
+
+
+def _duration_ms(span: ReadableSpan) -> float:
+    return (span.end_time - span.start_time) / 1e6
+
+
+def _span_to_dict(span: ReadableSpan) -> dict:
+    return {
+        "name": span.name,
+        "span_id": format(span.context.span_id, "016x"),
+        "parent_span_id": format(span.parent.span_id, "016x") if span.parent else None,
+        "kind": span.kind.name,
+        "start_time_unix_nano": span.start_time,
+        "duration_ms": _duration_ms(span),
+        "status": span.status.status_code.name,
+        "attributes": dict(span.attributes),
+        "events": [{"name": event.name, "attributes": dict(event.attributes)} for event in span.events],
+    }
+
+
+def _root_of(spans: List[ReadableSpan]) -> ReadableSpan:
+    for span in spans:
+        if span.parent is None or span.parent.is_remote:
+            return span
+    return spans[0]
+
+
+def trace_to_dict(spans: List[ReadableSpan]) -> dict:
+    root = _root_of(spans)
+    return {
+        "trace_id": format(root.context.trace_id, "032x"),
+        "name": root.name,
+        "duration_ms": _duration_ms(root),
+        "errored": any(span.status.status_code is StatusCode.ERROR for span in spans),
+        "spans": [_span_to_dict(span) for span in sorted(spans, key=lambda span: span.start_time)],
+    }
+
+
+def _percentile(sorted_values: List[float], percentile: int) -> float:
+    # Nearest rank, exact for the handful of traces the buffer holds
+    index = max(0, -(-len(sorted_values) * percentile // 100) - 1)
+    return sorted_values[index]
+
+
+def latency_summary(traces: List[List[ReadableSpan]]) -> List[dict]:
+    """Count, errors and duration percentiles per root span name, slowest p95 first."""
+    durations: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for spans in traces:
+        root = _root_of(spans)
+        durations.setdefault(root.name, []).append(_duration_ms(root))
+        errors[root.name] = errors.get(root.name, 0) + any(
+            span.status.status_code is StatusCode.ERROR for span in spans
+        )
+
+    summary = []
+    for name, values in durations.items():
+        values.sort()
+        entry = {"name": name, "count": len(values), "errors": errors[name], "max_ms": values[-1]}
+        entry.update({f"p{percentile}_ms": _percentile(values, percentile) for percentile in PERCENTILES})
+        summary.append(entry)
+    return sorted(summary, key=lambda entry: entry["p95_ms"], reverse=True)
+
+
+def handle_request(processor: RecentTracesSpanProcessor, path: str, query_string: str) -> Tuple[int, dict]:
+    """Status code and JSON document for a GET of `path`."""
+    path = path.rstrip("/") or "/"
+    query = parse_qs(query_string)
+
+    if path == "/summary":
+        return 200, {"summary": latency_summary(processor.traces())}
+
+    if path == "/traces":
+        traces = processor.traces()
+        summary = latency_summary(traces)
+        name = query.get("name", [None])[0]
+        if name is not None:
+            traces = [spans for spans in traces if _root_of(spans).name == name]
+        try:
+            limit = int(query.get("limit", [DEFAULT_LIMIT])[0])
+        except ValueError:
+            return 400, {"error": "limit must be an integer"}
+        return 200, {"summary": summary, "traces": [trace_to_dict(spans) for spans in traces[:limit]]}
+
+    if path.startswith("/traces/"):
+        try:
+            trace_id = int(path[len("/traces/") :], 16)
+        except ValueError:
+            return 400, {"error": "trace id must be hex"}
+        spans = processor.get_trace(trace_id)
+        if spans is None:
+            return 404, {"error": "trace not found"}
+        return 200, trace_to_dict(spans)
+
+    return 404, {"error": "not found"}
+
+
+def _encode(document: dict) -> bytes:
+    # Attribute values are str, bool, int, float or tuples of them, `default` only guards against surprises
+    return json.dumps(document, default=str).encode()
+
+
+class DebugTracesApp:
+    """ASGI app serving the recent traces, mount it under any prefix."""
+
+    def __init__(self, processor: Optional[RecentTracesSpanProcessor] = None):
+        self.processor = processor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        processor = self.processor or recent_traces
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path) :]
+
+        if processor is None:
+            status, document = 503, {"error": "recent traces are disabled, set CF_RECENT_TRACES=true"}
+        elif scope["method"] != "GET":
+            status, document = 405, {"error": "method not allowed"}
+        else:
+            status, document = handle_request(processor, path, scope.get("query_string", b"").decode("latin-1"))
+
+        body = _encode(document)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+def _handler_for(processor: RecentTracesSpanProcessor):
+    class DebugRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path, _, query_string = self.path.partition("?")
+            status, document = handle_request(processor, path, query_string)
+            body = _encode(document)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return DebugRequestHandler
+
+
+def start_debug_server(
+    processor: RecentTracesSpanProcessor, host: str = CF_DEBUG_SERVER_HOST, port: int = CF_DEBUG_SERVER_PORT
+) -> ThreadingHTTPServer:
+    """Serve `processor` from a daemon thread, port 0 picks a free port (see `server.server_address`)."""
+    server = ThreadingHTTPServer((host, port), _handler_for(processor))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="captureflow-debug-server", daemon=True).start()
+    logger.info(f"CaptureFlow debug server listening on {server.server_address}")
+    return server
+
+
+def install_recent_traces(tracer_provider: TracerProvider) -> RecentTracesSpanProcessor:
+    global recent_traces
+
+    recent_traces = RecentTracesSpanProcessor(
+        max_traces=CF_RECENT_TRACES_MAX,
+        max_bytes=CF_RECENT_TRACES_MAX_BYTES,
+        max_pending_seconds=CF_RECENT_TRACES_MAX_PENDING_SECONDS,
+    )
+    tracer_provider.add_span_processor(recent_traces)
+    if CF_DEBUG_SERVER_PORT:
+        try:
+            start_debug_server(recent_traces)
+        except OSError as e:
+            logger.warning(f"Failed to start CaptureFlow debug server on port {CF_DEBUG_SERVER_PORT}: {e}")
+    return recent_traces
@@ -1,11 +1,20 @@
 from logging import getLogger
 
 from opentelemetry.instrumentation.distro import BaseDistro
+from opentelemetry.metrics import set_meter_provider
 from opentelemetry.trace import set_tracer_provider
 
+from captureflow.config import (
+    CF_METRICS,
+    CF_N_PLUS_ONE,
+    CF_N_PLUS_ONE_THRESHOLD,
+    CF_RECENT_TRACES,
+)
+from captureflow.debug_server import install_recent_traces
 from captureflow.instrumentation import apply_instrumentation
+from captureflow.meter_provider import get_meter_provider
 from captureflow.resource import get_resource
-from captureflow.span_processor import FrameInfoSpanProcessor
+from captureflow.span_processor import FrameInfoSpanProcessor, NPlusOneSpanProcessor
 from captureflow.tracer_provider import get_tracer_provider
 
 logger = getLogger(__name__)
@@ -23,7 +32,18 @@ class CaptureFlowDistro(BaseDistro):
         frame_info_span_processor = FrameInfoSpanProcessor()
         tracer_provider.add_span_processor(frame_info_span_processor)
 
+        if CF_N_PLUS_ONE:
+            tracer_provider.add_span_processor(NPlusOneSpanProcessor(threshold=CF_N_PLUS_ONE_THRESHOLD))
+
+        # Sees every sampled span, independent of tail sampling and export
+        if CF_RECENT_TRACES:
+            install_recent_traces(tracer_provider)
+
         set_tracer_provider(tracer_provider)
 
+        # Latency histograms are recorded for every operation, not only for sampled spans
+        if CF_METRICS:
+            set_meter_provider(get_meter_provider(resource))
+
         # Make sure libraries of interest are instrumented
         apply_instrumentation(tracer_provider)
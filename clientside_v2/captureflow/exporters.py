@@ -0,0 +1,189 @@
+import threading
+import time
+import weakref
+from logging import getLogger
+from typing import Callable, Iterable, Sequence
+
+from opentelemetry import metrics
+from opentelemetry.metrics import CallbackOptions, Observation
+from opentelemetry.sdk.metrics.export import (
+    MetricExporter,
+    MetricExportResult,
+    MetricsData,
+)
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    SpanExporter,
+    SpanExportResult,
+)
+
+from captureflow.fork_safety import register_at_fork
+
+logger = getLogger(__name__)
+
+
+class ForkSafeSpanExporter(SpanExporter):
+    """
+    Builds the real exporter from `exporter_factory` and builds it again in every forked child.
+    gRPC channels and HTTP connection pools inherited from the parent process are not usable after fork().
+    """
+
+    def __init__(self, exporter_factory: Callable[[], SpanExporter]):
+        self._exporter_factory = exporter_factory
+        self._exporter = exporter_factory()
+        register_at_fork(after_in_child=self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        # The inherited exporter is dropped without shutdown(), closing a parent's channel from a child can hang
+        self._exporter = self._exporter_factory()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        return self._exporter.export(spans)
+
+    def shutdown(self) -> None:
+        self._exporter.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self._exporter.force_flush(timeout_millis)
+
+
+class ForkSafeMetricExporter(MetricExporter):
+    """ForkSafeSpanExporter for metrics, PeriodicExportingMetricReader restarts its own thread after fork()."""
+
+    def __init__(self, exporter_factory: Callable[[], MetricExporter]):
+        self._exporter_factory = exporter_factory
+        self._exporter = exporter_factory()
+        super().__init__(
+            preferred_temporality=self._exporter._preferred_temporality,
+            preferred_aggregation=self._exporter._preferred_aggregation,
+        )
+        register_at_fork(after_in_child=self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        self._exporter = self._exporter_factory()
+
+    def export(self, metrics_data: MetricsData, timeout_millis: float = 10_000, **kwargs) -> MetricExportResult:
+        return self._exporter.export(metrics_data, timeout_millis=timeout_millis, **kwargs)
+
+    def force_flush(self, timeout_millis: float = 10_000) -> bool:
+        return self._exporter.force_flush(timeout_millis)
+
+    def shutdown(self, timeout_millis: float = 30_000, **kwargs) -> None:
+        self._exporter.shutdown(timeout_millis=timeout_millis, **kwargs)
+
+
+_meter = metrics.get_meter("captureflow.export")
+_monitored_processors: "weakref.WeakSet[MonitoredBatchSpanProcessor]" = weakref.WeakSet()
+
+
+def _observe_dropped_spans(options: CallbackOptions) -> Iterable[Observation]:
+    for processor in list(_monitored_processors):
+        yield Observation(processor.dropped_spans)
+
+
+def _observe_queue_size(options: CallbackOptions) -> Iterable[Observation]:
+    for processor in list(_monitored_processors):
+        yield Observation(processor.queue_size(), {"captureflow.max_queue_size": processor.max_queue_size})
+
+
+_meter.create_observable_counter(
+    "captureflow.span_export.dropped_spans",
+    callbacks=[_observe_dropped_spans],
+    unit="{span}",
+    description="Spans dropped because the export queue was full",
+)
+_meter.create_observable_gauge(
+    "captureflow.span_export.queue_size",
+    callbacks=[_observe_queue_size],
+    unit="{span}",
+    description="Spans waiting in the export queue",
+)
+_export_duration = _meter.create_histogram(
+    "captureflow.span_export.duration",
+    unit="ms",
+    description="Duration of span export calls",
+)
+_exported_spans = _meter.create_counter(
+    "captureflow.span_export.exported_spans",
+    unit="{span}",
+    description="Spans handed to the exporter, by export result",
+)
+
+
+class MonitoredSpanExporter(SpanExporter):
+    """Records latency and outcome of every export call made by the wrapped exporter."""
+
+    def __init__(self, span_exporter: SpanExporter):
+        self.span_exporter = span_exporter
+        self.last_export_duration_ms = 0.0
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        start = time.perf_counter()
+        result = SpanExportResult.FAILURE
+        try:
+            result = self.span_exporter.export(spans)
+            return result
+        finally:
+            self.last_export_duration_ms = (time.perf_counter() - start) * 1000
+            attributes = {"captureflow.export_result": result.name}
+            _export_duration.record(self.last_export_duration_ms, attributes)
+            _exported_spans.add(len(spans), attributes)
+
+    def shutdown(self) -> None:
+        self.span_exporter.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.span_exporter.force_flush(timeout_millis)
+
+
+class MonitoredBatchSpanProcessor(BatchSpanProcessor):
+    """
+    BatchSpanProcessor that counts the spans it drops and exposes its queue fill level.
+    Drops are also logged, at most once per `dropped_spans_warning_interval` seconds, metrics are opt-in.
+    Spans still queued before fork() are exported first, the child drops its inherited copy of the queue.
+    """
+
+    dropped_spans_warning_interval = 60
+
+    def __init__(
+        self, span_exporter: SpanExporter, max_queue_size: int, fork_flush_timeout_millis: int = 1000, **kwargs
+    ):
+        super().__init__(span_exporter, max_queue_size=max_queue_size, **kwargs)
+        self.max_queue_size = max_queue_size
+        self.fork_flush_timeout_millis = fork_flush_timeout_millis
+        self.dropped_spans = 0
+        self._last_dropped_spans_warning = float("-inf")
+        _monitored_processors.add(self)
+        register_at_fork(before=self._flush_before_fork)
+
+    def _flush_before_fork(self) -> None:
+        # Every fork() of the host process waits for this, including forks that have nothing to do with serving.
+        # Newer SDKs ignore force_flush's timeout and export the whole queue, retries included, so the flush runs
+        # on its own thread and fork() only waits for it up to the timeout. The child reinitializes the export lock
+        if not self.queue_size():
+            return
+        flush = threading.Thread(
+            target=self.force_flush, args=(self.fork_flush_timeout_millis,), name="captureflow-fork-flush", daemon=True
+        )
+        flush.start()
+        flush.join(self.fork_flush_timeout_millis / 1000)
+
+    def queue_size(self) -> int:
+        # The queue moved into a shared BatchProcessor in newer SDK versions
+        batch_processor = getattr(self, "_batch_processor", None)
+        queue = batch_processor._queue if batch_processor is not None else self.queue
+        return len(queue)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        if span.context.trace_flags.sampled and self.queue_size() >= self.max_queue_size:
+            self.dropped_spans += 1
+            now = time.monotonic()
+            if now - self._last_dropped_spans_warning >= self.dropped_spans_warning_interval:
+                self._last_dropped_spans_warning = now
+                logger.warning(
+                    "Span export queue is full (%d spans), %d spans dropped so far",
+                    self.max_queue_size,
+                    self.dropped_spans,
+                )
+        super().on_end(span)
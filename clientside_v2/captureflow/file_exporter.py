@@ -0,0 +1,267 @@
+"""
+OTLP span export to rotating, gzip-compressed local files, for deployments without a reachable collector.
+
+Batches are written as OTLP ExportTraceServiceRequest messages, one per line in OTLP/JSON or length-delimited
+protobuf. The file being written has a ".part" suffix and is renamed once it is rotated or the exporter shuts down,
+so readers and `captureflow.upload` only ever see complete files. A ".part" file whose process died without renaming
+it is finalized by the next exporter or upload that finds it, up to its last complete record.
+"""
+
+import base64
+import binascii
+import gzip
+import json
+import os
+import threading
+import time
+from logging import getLogger
+from pathlib import Path
+from typing import IO, Iterator, List, Optional, Sequence, Set
+
+from google.protobuf import json_format
+from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+    ExportTraceServiceRequest,
+)
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+from captureflow.config import (
+    CF_FILE_EXPORT_DIR,
+    CF_FILE_EXPORT_FORMAT,
+    CF_FILE_EXPORT_MAX_BYTES,
+    CF_FILE_EXPORT_MAX_FILES,
+)
+from captureflow.fork_safety import register_at_fork
+
+logger = getLogger(__name__)
+
+FILE_SUFFIXES = {"json": ".jsonl.gz", "protobuf": ".pb.gz"}
+PART_SUFFIX = ".part"
+
+# ".part" files this process is writing, other ones carrying its pid are left from an earlier process with that pid
+_files_in_use: Set[Path] = set()
+
+# OTLP/JSON encodes trace and span ids as hex, protobuf's JSON mapping would use base64
+_ID_FIELDS = frozenset(("traceId", "spanId", "parentSpanId"))
+
+
+def _convert_ids(value, convert):
+    if isinstance(value, dict):
+        return {
+            key: convert(item) if key in _ID_FIELDS and item else _convert_ids(item, convert)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_convert_ids(item, convert) for item in value]
+    return value
+
+
+def request_to_json(request: ExportTraceServiceRequest) -> str:
+    message = json_format.MessageToDict(request, use_integers_for_enums=True)
+    message = _convert_ids(message, lambda item: base64.b64decode(item).hex())
+    return json.dumps(message, separators=(",", ":"))
+
+
+def request_from_json(line: str) -> ExportTraceServiceRequest:
+    message = _convert_ids(json.loads(line), lambda item: base64.b64encode(binascii.unhexlify(item)).decode())
+    return json_format.ParseDict(message, ExportTraceServiceRequest())
+
+
+def _varint(value: int) -> bytes:
+    encoded = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            encoded.append(byte | 0x80)
+        else:
+            encoded.append(byte)
+            return bytes(encoded)
+
+
+def _read_varint(stream: IO[bytes]) -> Optional[int]:
+    value = shift = 0
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            if shift:
+                raise EOFError("Truncated length prefix")
+            return None
+        value |= (byte[0] & 0x7F) << shift
+        if not byte[0] & 0x80:
+            return value
+        shift += 7
+
+
+class FileSpanExporter(SpanExporter):
+    """
+    Appends every batch to the current file of `directory`, a new file is started once it holds `max_bytes`
+    of compressed data. Only the newest `max_files` complete files are kept.
+    Every process writes its own files, so workers forked from one parent never interleave records.
+    """
+
+    def __init__(
+        self,
+        directory: str = CF_FILE_EXPORT_DIR,
+        file_format: str = CF_FILE_EXPORT_FORMAT,
+        max_bytes: int = CF_FILE_EXPORT_MAX_BYTES,
+        max_files: int = CF_FILE_EXPORT_MAX_FILES,
+    ):
+        if file_format not in FILE_SUFFIXES:
+            raise ValueError(f"Unsupported file export format: {file_format}")
+        self.directory = Path(directory)
+        self.file_format = file_format
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+
+        self._lock = threading.Lock()
+        self._path: Optional[Path] = None
+        self._raw_file: Optional[IO[bytes]] = None
+        self._file: Optional[gzip.GzipFile] = None
+        self._sequence = 0
+        self._shutdown = False
+        register_at_fork(after_in_child=self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        # The parent keeps writing and finishes its own file, the child starts one with its own pid
+        self._lock = threading.Lock()
+        self._path = self._raw_file = self._file = None
+
+    def _open(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        finalize_orphaned_files(self.directory)
+        self._sequence += 1
+        name = f"spans-{time.time_ns()}-{os.getpid()}-{self._sequence}{FILE_SUFFIXES[self.file_format]}"
+        self._path = self.directory / (name + PART_SUFFIX)
+        _files_in_use.add(self._path)
+        self._raw_file = open(self._path, "wb")
+        self._file = gzip.GzipFile(fileobj=self._raw_file, mode="wb")
+
+    def _close(self) -> None:
+        if self._file is None:
+            return
+        self._file.close()
+        self._raw_file.close()
+        self._path.rename(self._path.with_name(self._path.name[: -len(PART_SUFFIX)]))
+        _files_in_use.discard(self._path)
+        self._path = self._raw_file = self._file = None
+        self._remove_old_files()
+
+    def _remove_old_files(self) -> None:
+        for path in complete_span_files(self.directory)[: -self.max_files or None]:
+            try:
+                path.unlink()
+            except OSError as e:
+                logger.warning(f"Failed to remove old span file {path}: {e}")
+
+    def _encode(self, spans: Sequence[ReadableSpan]) -> bytes:
+        request = encode_spans(spans)
+        if self.file_format == "json":
+            return request_to_json(request).encode() + b"\n"
+        data = request.SerializeToString()
+        return _varint(len(data)) + data
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        if self._shutdown:
+            return SpanExportResult.FAILURE
+        record = self._encode(spans)
+        try:
+            with self._lock:
+                if self._file is None:
+                    self._open()
+                self._file.write(record)
+                # Sync flush, a crash loses at most the batch being written
+                self._file.flush()
+                if self._raw_file.tell() >= self.max_bytes:
+                    self._close()
+        except OSError as e:
+            logger.error(f"Failed to write spans to {self.directory}: {e}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._shutdown = True
+            self._close()
+
+
+def _is_orphaned(path: Path, pid: int) -> bool:
+    if pid == os.getpid():
+        return path not in _files_in_use
+    if os.name != "posix":
+        # No signal 0 to probe with, leave the file alone
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def finalize_orphaned_files(directory) -> List[Path]:
+    """
+    Rename ".part" files no running process writes to, so they are uploaded and pruned like any other.
+    Their gzip stream has no trailer, `read_span_file` stops at the last complete record.
+    """
+    finalized = []
+    for suffix in FILE_SUFFIXES.values():
+        for path in Path(directory).glob(f"spans-*{suffix}{PART_SUFFIX}"):
+            try:
+                pid = int(path.name.split("-")[2])
+            except (IndexError, ValueError):
+                continue
+            if not _is_orphaned(path, pid):
+                continue
+            complete_path = path.with_name(path.name[: -len(PART_SUFFIX)])
+            try:
+                path.rename(complete_path)
+            except OSError as e:
+                # Another process may have finalized it first
+                logger.debug(f"Failed to finalize orphaned span file {path}: {e}")
+                continue
+            logger.warning(f"Finalized span file {complete_path} left behind by process {pid}")
+            finalized.append(complete_path)
+    return finalized
+
+
+def complete_span_files(directory) -> List[Path]:
+    """Files that are no longer written to, oldest first."""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    paths = [path for suffix in FILE_SUFFIXES.values() for path in directory.glob(f"spans-*{suffix}")]
+    # Names start with a nanosecond timestamp
+    return sorted(paths, key=lambda path: int(path.name.split("-")[1]))
+
+
+def read_span_file(path) -> Iterator[ExportTraceServiceRequest]:
+    """
+    Requests stored in a span file. Files of crashed processes end without a gzip trailer and possibly inside a
+    record, everything up to the last complete record is returned.
+    """
+    path = Path(path)
+    with gzip.open(path, "rb") as stream:
+        try:
+            if path.name.endswith(FILE_SUFFIXES["json"]):
+                for line in stream:
+                    if not line.endswith(b"\n"):
+                        raise EOFError("Truncated record")
+                    if line.strip():
+                        yield request_from_json(line.decode())
+                return
+            while True:
+                length = _read_varint(stream)
+                if length is None:
+                    return
+                data = stream.read(length)
+                if len(data) < length:
+                    raise EOFError("Truncated record")
+                yield ExportTraceServiceRequest.FromString(data)
+        except EOFError as e:
+            logger.warning(f"{path} ends early, skipping its incomplete tail: {e}")
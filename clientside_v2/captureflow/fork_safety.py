@@ -0,0 +1,41 @@
+import os
+import weakref
+from logging import getLogger
+from typing import Callable, Optional
+
+logger = getLogger(__name__)
+
+
+def _weak_callback(method: Optional[Callable[[], None]]) -> Optional[Callable[[], None]]:
+    if method is None:
+        return None
+
+    method_ref = weakref.WeakMethod(method)
+
+    def callback():
+        bound_method = method_ref()
+        if bound_method is None:
+            return
+        try:
+            bound_method()
+        except Exception as e:
+            # Never break the fork of the host application because of tracing
+            logger.error(f"CaptureFlow fork handler {bound_method} failed: {e}")
+
+    return callback
+
+
+def register_at_fork(before: Callable[[], None] = None, after_in_child: Callable[[], None] = None) -> None:
+    """
+    `os.register_at_fork` for bound methods that doesn't keep their owner alive.
+    Pre-fork servers (e.g. `gunicorn --preload`) fork after the agent is configured, so every component that owns
+    threads, queues or network channels has to rebuild them in the child process.
+    """
+    if not hasattr(os, "register_at_fork"):
+        return  # Windows, there is no fork()
+
+    callbacks = {
+        "before": _weak_callback(before),
+        "after_in_child": _weak_callback(after_in_child),
+    }
+    os.register_at_fork(**{name: callback for name, callback in callbacks.items() if callback is not None})
@@ -0,0 +1,236 @@
+"""
+httpx instrumentation as a wrapping transport.
+Response bodies are never pre-read: the byte stream is teed into a capped buffer while the caller consumes it,
+and the span ends when the stream is closed.
+"""
+
+import time
+import zlib
+
+import httpx
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+from captureflow.body_capture import capture_body, is_capturable_content_type
+from captureflow.config import CF_BODY_MAX_BYTES
+from captureflow.metrics import record_client_duration
+
+# In-process transports (test clients, ASGI / WSGI apps) are not outgoing HTTP calls
+IN_PROCESS_TRANSPORT_MODULES = ("starlette.testclient", "httpx._transports.asgi", "httpx._transports.wsgi")
+
+
+def _start_span(tracer: trace.Tracer, request: httpx.Request) -> trace.Span:
+    span = tracer.start_span(f"HTTP {request.method}", kind=SpanKind.CLIENT)
+    if span.is_recording():
+        span.set_attribute("http.request.method", request.method)
+        span.set_attribute("http.request.url", str(request.url))
+        span.set_attribute("http.request.headers", str(dict(request.headers)))
+        try:
+            content = request.content
+        except httpx.RequestNotRead:
+            content = None  # Streaming upload, reading it here would consume it
+        if content:
+            body = capture_body(content, content_type=request.headers.get("Content-Type"))
+            if body is not None:
+                span.set_attribute("http.request.body", body)
+    return span
+
+
+def _record_failure(request: httpx.Request, start: float) -> None:
+    record_client_duration((time.perf_counter() - start) * 1000, request.method, request.url.host, None)
+
+
+def _record_response(
+    span: trace.Span, request: httpx.Request, response: httpx.Response, start: float, tee_stream_class
+) -> None:
+    if span.is_recording():
+        span.set_attribute("http.response.status_code", response.status_code)
+        span.set_attribute("http.response.headers", str(dict(response.headers)))
+    recorder = _ResponseBodyRecorder(span, request, response, start)
+    if response.is_closed:
+        # Body was already read by the transport itself (httpx.MockTransport), nothing is left to stream
+        if recorder.capture:
+            recorder.feed_decoded(response.content)
+        recorder.finish()
+    else:
+        response.stream = tee_stream_class(response.stream, recorder)
+
+
+class _ResponseBodyRecorder:
+    """
+    Keeps the first `max_bytes` of a decoded response body, ends the span and records the request duration
+    once the body is closed.
+    """
+
+    def __init__(
+        self,
+        span: trace.Span,
+        request: httpx.Request,
+        response: httpx.Response,
+        start: float,
+        max_bytes: int = CF_BODY_MAX_BYTES,
+    ):
+        self.span = span
+        self.request = request
+        self.status_code = response.status_code
+        self.start = start
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._head = bytearray()
+        self._decoder = None
+        self._ended = False
+
+        # Responses of spans that are not exported only need the duration, headers are not even parsed
+        self.capture = span.is_recording() and max_bytes > 0
+        if not self.capture:
+            return
+        self.content_type = response.headers.get("Content-Type")
+        self.encoding = response.charset_encoding
+        self.capture = is_capturable_content_type(self.content_type)
+
+        content_encoding = response.headers.get("Content-Encoding", "identity").lower()
+        if content_encoding in ("gzip", "deflate"):
+            # The transport sees the bytes as sent, decoding only happens later inside httpx.Response
+            self._decoder = zlib.decompressobj(zlib.MAX_WBITS | 32)
+        elif content_encoding not in ("identity", ""):
+            self.capture = False
+
+    def feed(self, chunk: bytes) -> None:
+        if not self.capture:
+            return
+        if self._decoder is not None:
+            try:
+                chunk = self._decoder.decompress(chunk)
+            except zlib.error:
+                self.capture = False
+                return
+        self.feed_decoded(chunk)
+
+    def feed_decoded(self, chunk: bytes) -> None:
+        self.total_bytes += len(chunk)
+        room = self.max_bytes - len(self._head)
+        if room > 0:
+            self._head += chunk[:room]
+
+    def record_error(self, exc: BaseException) -> None:
+        self.span.record_exception(exc)
+        self.span.set_status(Status(StatusCode.ERROR, f"{type(exc).__name__}: {exc}"))
+
+    def finish(self) -> None:
+        if self._ended:
+            return
+        self._ended = True
+        if self.capture and self.total_bytes:
+            body = capture_body(
+                bytes(self._head),
+                content_type=self.content_type,
+                total_bytes=self.total_bytes,
+                encoding=self.encoding,
+                max_bytes=self.max_bytes,
+            )
+            if body is not None:
+                self.span.set_attribute("http.response.body", body)
+        self.span.end()
+        record_client_duration(
+            (time.perf_counter() - self.start) * 1000, self.request.method, self.request.url.host, self.status_code
+        )
+
+
+class _TeeSyncByteStream(httpx.SyncByteStream):
+    def __init__(self, stream: httpx.SyncByteStream, recorder: _ResponseBodyRecorder):
+        self._stream = stream
+        self._recorder = recorder
+
+    def __iter__(self):
+        try:
+            for chunk in self._stream:
+                self._recorder.feed(chunk)
+                yield chunk
+        except Exception as exc:
+            self._recorder.record_error(exc)
+            raise
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._recorder.finish()
+
+
+class _TeeAsyncByteStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, recorder: _ResponseBodyRecorder):
+        self._stream = stream
+        self._recorder = recorder
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._stream:
+                self._recorder.feed(chunk)
+                yield chunk
+        except Exception as exc:
+            self._recorder.record_error(exc)
+            raise
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._recorder.finish()
+
+
+class InstrumentedTransport(httpx.BaseTransport):
+    def __init__(self, transport: httpx.BaseTransport, tracer: trace.Tracer):
+        self.transport = transport
+        self.tracer = tracer
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        span = _start_span(self.tracer, request)
+        try:
+            with trace.use_span(span):
+                response = self.transport.handle_request(request)
+        except BaseException:
+            span.end()
+            _record_failure(request, start)
+            raise
+        _record_response(span, request, response, start, _TeeSyncByteStream)
+        return response
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class InstrumentedAsyncTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport, tracer: trace.Tracer):
+        self.transport = transport
+        self.tracer = tracer
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        span = _start_span(self.tracer, request)
+        try:
+            with trace.use_span(span):
+                response = await self.transport.handle_async_request(request)
+        except BaseException:
+            span.end()
+            _record_failure(request, start)
+            raise
+        _record_response(span, request, response, start, _TeeAsyncByteStream)
+        return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def wrap_transport(transport, tracer: trace.Tracer, is_async: bool):
+    """
+    Wrap a client transport, in-process and already wrapped transports are returned unchanged.
+    `is_async` comes from the client, some transports (httpx.MockTransport) implement both interfaces.
+    """
+    if isinstance(transport, (InstrumentedTransport, InstrumentedAsyncTransport)):
+        return transport
+    if type(transport).__module__.startswith(IN_PROCESS_TRANSPORT_MODULES):
+        return transport
+    if is_async:
+        return InstrumentedAsyncTransport(transport, tracer)
+    return InstrumentedTransport(transport, tracer)
@@ -1,62 +1,117 @@
 import functools
+import random
+import sys
+import threading
+import time
+from logging import getLogger
 
+import wrapt
 from opentelemetry import trace
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.trace import SpanKind
 
+from captureflow.body_capture import BodyBuffer, capture_body
+from captureflow.config import CF_DBAPI_MODULES, CF_SQL_SPAN_SAMPLE_RATE, CF_SQL_SUMMARY
+
+logger = getLogger(__name__)
+
 # TBD: instrument all top libraries
 
 
-def _decode_body(body):
-    try:
-        if isinstance(body, bytes):
-            return body.decode("utf-8")
-        return body
-    except Exception as e:
-        return body
+def _set_body_attribute(span, key, body, content_type=None, encoding=None):
+    _set_captured_attribute(span, key, capture_body(body, content_type=content_type, encoding=encoding))
+
+
+def _set_captured_attribute(span, key, captured):
+    if captured is not None:
+        span.set_attribute(key, captured)
 
 
 def _instrument_fastapi(tracer_provider: TracerProvider):
+    """
+    Bodies and headers are recorded by an ASGI middleware placed right inside the FastAPIInstrumentor server span.
+    Older instrumentations add OpenTelemetryMiddleware with `add_middleware`, somewhere inside Starlette's
+    ServerErrorMiddleware, so the built stack is searched for it. Newer ones wrap the stack built here themselves.
+    """
     try:
+        import fastapi
+        from opentelemetry.instrumentation.asgi import OpenTelemetryMiddleware
         from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
-        from opentelemetry.instrumentation.fastapi import Span as FastAPISpan
-
-        def client_request_hook(span: FastAPISpan, scope: dict):
-            if span and span.is_recording():
-                if "body" in scope:
-                    span.set_attribute("http.request.body", _decode_body(scope["body"]))
-
-        def client_response_hook(span: FastAPISpan, message: dict):
-            if span and span.is_recording():
-                if "body" in message:
-                    span.set_attribute("http.response.body", _decode_body(message["body"]))
-
-        FastAPIInstrumentor().instrument(
-            client_request_hook=client_request_hook,
-            client_response_hook=client_response_hook,
-            tracer_provider=tracer_provider,
-        )
+        from starlette.middleware.errors import ServerErrorMiddleware
+
+        from captureflow.asgi import BodyCaptureMiddleware
+
+        original_build_middleware_stack = fastapi.FastAPI.build_middleware_stack
+
+        def build_middleware_stack(app):
+            if not getattr(app, "_is_instrumented_by_opentelemetry", False):
+                # Apps created before instrumentation, instrument_app wraps this method and calls it back
+                FastAPIInstrumentor.instrument_app(app, tracer_provider=tracer_provider)
+                return app.build_middleware_stack()
+
+            middleware_stack = original_build_middleware_stack(app)
+            middleware = middleware_stack
+            while middleware is not None and not isinstance(middleware, OpenTelemetryMiddleware):
+                middleware = getattr(middleware, "app", None)
+            if middleware is None:
+                # Newer instrumentations wrap the stack built here in their own OpenTelemetryMiddleware, and expect
+                # ServerErrorMiddleware outermost when they do
+                middleware = middleware_stack if isinstance(middleware_stack, ServerErrorMiddleware) else None
+            if middleware is None:
+                return BodyCaptureMiddleware(middleware_stack)
+            middleware.app = BodyCaptureMiddleware(middleware.app)
+            return middleware_stack
+
+        # Patched before FastAPIInstrumentor swaps fastapi.FastAPI for its subclass, so every app goes through it
+        fastapi.FastAPI.build_middleware_stack = build_middleware_stack
+        FastAPIInstrumentor().instrument(tracer_provider=tracer_provider)
     except ImportError as e:
         pass
 
 
 def _instrument_requests(tracer_provider: TracerProvider):
     try:
+        from urllib.parse import urlsplit
+
         from opentelemetry.instrumentation.requests import RequestsInstrumentor
 
+        from captureflow.metrics import record_client_duration
+
         def request_hook(span, request_obj):
+            request_obj._captureflow_start = time.perf_counter()
+            if not span.is_recording():
+                return
             if request_obj.headers:
                 for k, v in request_obj.headers.items():
                     span.set_attribute("http.request.header.%s" % k.lower(), v)
             if request_obj.body:
-                span.set_attribute("http.request.body", _decode_body(request_obj.body))
+                _set_body_attribute(
+                    span, "http.request.body", request_obj.body, content_type=request_obj.headers.get("Content-Type")
+                )
 
         def response_hook(span, request_obj, response):
+            start = getattr(request_obj, "_captureflow_start", None)
+            if start is not None:
+                record_client_duration(
+                    (time.perf_counter() - start) * 1000,
+                    request_obj.method,
+                    urlsplit(request_obj.url).hostname,
+                    response.status_code,
+                )
+            if not span.is_recording():
+                return
             if response.headers:
                 for k, v in response.headers.items():
                     span.set_attribute("http.response.header.%s" % k.lower(), v)
-            if response.text:
-                span.set_attribute("http.response.body", response.text)
+            # Streamed responses are left unread, reading them here would buffer the whole download
+            if response._content_consumed and response.content:
+                _set_body_attribute(
+                    span,
+                    "http.response.body",
+                    response.content,
+                    content_type=response.headers.get("Content-Type"),
+                    encoding=response.encoding,
+                )
 
         RequestsInstrumentor().instrument(
             request_hook=request_hook,
@@ -68,206 +123,226 @@ def _instrument_requests(tracer_provider: TracerProvider):
 
 
 def _instrument_httpx(tracer_provider=None):
+    """
+    Patches the client classes to wrap every transport they create, including user supplied ones.
+    Wrapping at the transport keeps `client.stream()` lazy and costs nothing per client instance.
+    """
     import httpx
 
-    tracer = trace.get_tracer(__name__, tracer_provider=tracer_provider)
-
-    def _capture_request(request: httpx.Request, span: trace.Span):
-        span.set_attribute("http.lol", 1)
-        span.set_attribute("http.request.method", request.method)
-        span.set_attribute("http.request.url", str(request.url))
-        span.set_attribute("http.request.headers", str(dict(request.headers)))
-        if request.content:
-            span.set_attribute("http.request.body", request.content.decode("utf-8", errors="replace"))
-
-    def _capture_response(response: httpx.Response, span: trace.Span):
-        span.set_attribute("http.response.body", response.text)
-        span.set_attribute("http.response.status_code", response.status_code)
-        span.set_attribute("http.response.headers", str(dict(response.headers)))
-
-    def instrumented_send(self, request: httpx.Request, **kwargs) -> httpx.Response:
-        with tracer.start_as_current_span(
-            f"HTTP {request.method}",
-            kind=SpanKind.CLIENT,
-        ) as span:
-            _capture_request(request, span)
-            response = self._original_send(request, **kwargs)
-            _capture_response(response, span)
-            return response
+    from captureflow.httpx_transport import wrap_transport
 
-    async def async_instrumented_send(self, request: httpx.Request, **kwargs) -> httpx.Response:
-        with tracer.start_as_current_span(
-            f"HTTP {request.method}",
-            kind=SpanKind.CLIENT,
-        ) as span:
-            _capture_request(request, span)
-            response = await self._original_send(request, **kwargs)
-            _capture_response(response, span)
-            return response
-
-    original_client = httpx.Client
-    original_async_client = httpx.AsyncClient
+    tracer = trace.get_tracer(__name__, tracer_provider=tracer_provider)
 
-    class InstrumentedClient(httpx.Client):
-        def __init__(self, *args, **kwargs):
-            super().__init__(*args, **kwargs)
-            self._original_send = super().send
-            self.send = functools.partial(instrumented_send, self)
+    def wrap_transport_factory(original_factory, is_async):
+        @functools.wraps(original_factory)
+        def transport_factory(self, *args, **kwargs):
+            return wrap_transport(original_factory(self, *args, **kwargs), tracer, is_async)
 
-    class InstrumentedAsyncClient(httpx.AsyncClient):
-        def __init__(self, *args, **kwargs):
-            super().__init__(*args, **kwargs)
-            self._original_send = super().send
-            self.send = functools.partial(async_instrumented_send, self)
+        transport_factory._captureflow_original = original_factory
+        return transport_factory
 
-    httpx.Client = InstrumentedClient
-    httpx.AsyncClient = InstrumentedAsyncClient
+    for client_class in (httpx.Client, httpx.AsyncClient):
+        for name in ("_init_transport", "_init_proxy_transport"):
+            factory = getattr(client_class, name)
+            if not hasattr(factory, "_captureflow_original"):
+                setattr(client_class, name, wrap_transport_factory(factory, client_class is httpx.AsyncClient))
 
-    return original_client, original_async_client
+    return tracer
 
 
 def _instrument_flask(tracer_provider: TracerProvider):
+    """
+    Bodies and headers are added to the server span of FlaskInstrumentor, no second span is created.
+    Request bodies are teed by a WSGI middleware installed in front of `app.wsgi_app` on the app's first request,
+    response bodies are taken from the buffered response in a single after_request hook.
+    """
     try:
-        from flask import Flask, g, request
+        from flask import Flask, request
         from opentelemetry.instrumentation.flask import FlaskInstrumentor
-        from opentelemetry.trace import Span, SpanKind
-
-        def before_request():
-            tracer = trace.get_tracer(__name__)
-            span = tracer.start_span(f"HTTP {request.method} {request.path}", kind=SpanKind.SERVER)
-            g.span = span
 
-            span.set_attribute("http.method", request.method)
-            span.set_attribute("http.url", request.url)
-            span.set_attribute("http.request.headers", str(dict(request.headers)))
-
-            if request.data:
-                span.set_attribute("http.request.body", _decode_body(request.data))
+        from captureflow.metrics import record_server_duration
+        from captureflow.wsgi import (
+            REQUEST_BODY_ENVIRON_KEY,
+            REQUEST_START_ENVIRON_KEY,
+            RequestBodyMiddleware,
+        )
 
         def after_request(response):
-            span: Span = getattr(g, "span", None)
-            if span and span.is_recording():
-                span.set_attribute("http.response.headers", str(dict(response.headers)))
-                if response.data:
-                    span.set_attribute("http.response.body", _decode_body(response.data))
-                span.set_attribute("http.status_code", response.status_code)
-                span.end()
+            # Also runs for responses of unhandled exceptions, Flask finalizes its 500 response the same way
+            start = request.environ.get(REQUEST_START_ENVIRON_KEY)
+            if start is not None:
+                record_server_duration(
+                    (time.perf_counter() - start) * 1000,
+                    request.method,
+                    request.url_rule.rule if request.url_rule else None,
+                    response.status_code,
+                )
+
+            # FlaskInstrumentor's span is current until teardown_request
+            span = trace.get_current_span()
+            if not span.is_recording():
+                return response
 
+            span.set_attribute("http.request.headers", str(dict(request.headers)))
+            request_body = request.environ.get(REQUEST_BODY_ENVIRON_KEY)
+            if request_body is not None and request_body.total_bytes:
+                _set_captured_attribute(span, "http.request.body", request_body.capture(request.content_type))
+
+            span.set_attribute("http.response.headers", str(dict(response.headers)))
+            # Streamed bodies are produced after the span has ended
+            if not response.is_streamed:
+                response_body = BodyBuffer()
+                for chunk in response.iter_encoded():
+                    response_body.write(chunk)
+                if response_body.total_bytes:
+                    _set_captured_attribute(span, "http.response.body", response_body.capture(response.content_type))
             return response
 
+        install_lock = threading.Lock()
+
+        def install(app):
+            with install_lock:
+                middleware = app.__dict__.get("_captureflow_middleware")
+                if middleware is None:
+                    # Apps created before instrumentation are plain Flask instances without the server span
+                    if not getattr(app, "_is_instrumented_by_opentelemetry", False):
+                        FlaskInstrumentor.instrument_app(app, tracer_provider=tracer_provider)
+                    app.after_request(after_request)
+                    middleware = app._captureflow_middleware = RequestBodyMiddleware(app.wsgi_app)
+            return middleware
+
+        def __call__(app, environ, start_response):
+            middleware = app.__dict__.get("_captureflow_middleware") or install(app)
+            return middleware(environ, start_response)
+
+        # Patched before FlaskInstrumentor swaps flask.Flask for its subclass, so every app goes through it
+        Flask.__call__ = __call__
         FlaskInstrumentor().instrument(tracer_provider=tracer_provider)
 
-        original_wsgi_app = Flask.wsgi_app
-
-        def wrapped_wsgi_app(app, environ, start_response):
-            app.before_request(before_request)
-            app.after_request(after_request)
-            return original_wsgi_app(app, environ, start_response)
-
-        Flask.wsgi_app = wrapped_wsgi_app
-
     except ImportError as e:
         print(f"Flask instrumentation failed: {e}")
 
 
 def _instrument_sqlalchemy(tracer_provider=None):
     """
-    NOTE: this way of getting results is really hacky and is going to degrade SELECT() query performance,
-          but there is no other easy way of reading into DB-API cursors.
-          Hopefully sampling rate is pretty high and after experimentation something can be figured out.
+    Result rows are captured by swapping the execution context's DB-API cursor for a proxy before SQLAlchemy builds
+    the CursorResult, so rows are recorded as the application fetches them and the SELECT only runs once.
+    Every execution is aggregated per fingerprint, per-query spans are sampled with CF_SQL_SPAN_SAMPLE_RATE.
     """
-    import sqlparse
     from opentelemetry.trace import SpanKind
     from sqlalchemy import event
     from sqlalchemy.engine import Engine
+    from sqlalchemy.pool import Pool
+
+    from captureflow.db import (
+        ResultCapturingCursor,
+        analyze_statement,
+        format_parameters,
+        suppress_dbapi_tracing,
+    )
+    from captureflow.metrics import record_db_duration
+    from captureflow.query_stats import query_stats
 
     tracer = trace.get_tracer(__name__, tracer_provider=tracer_provider)
+    if CF_SQL_SUMMARY:
+        query_stats.start(tracer)
 
-    def is_select_statement(statement):
-        parsed = sqlparse.parse(statement)
-        if parsed:
-            return parsed[0].get_type().upper() == "SELECT"
-        return False
+    # Runs before the dialect's own connect hooks, their statements don't go through cursor events
+    @event.listens_for(Pool, "connect", insert=True)
+    def connect(dbapi_connection, connection_record):
+        suppress_dbapi_tracing(dbapi_connection)
 
     @event.listens_for(Engine, "before_cursor_execute")
     def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
-        context._span = tracer.start_span(
-            name=f"SQLAlchemy: {statement.split()[0]}",
-            kind=SpanKind.CLIENT,
-        )
-        context._span.set_attribute("db.system", "sqlalchemy")
-        context._span.set_attribute("db.statement", statement)
-        context._span.set_attribute("db.parameters", str(parameters))
+        statement_info = analyze_statement(statement, "SQLAlchemy")
+        if random.random() < CF_SQL_SPAN_SAMPLE_RATE:
+            span = tracer.start_span(
+                name=statement_info.span_name,
+                kind=SpanKind.CLIENT,
+            )
+            # Spans dropped by the sampler don't pay for formatting the parameters
+            if span.is_recording():
+                span.set_attribute("db.system", "sqlalchemy")
+                span.set_attribute("db.statement", statement)
+                span.set_attribute("db.statement.fingerprint", statement_info.fingerprint)
+                span.set_attribute("db.parameters", format_parameters(parameters))
+        else:
+            span = trace.INVALID_SPAN
 
-        context._original_statement = statement
-        context._original_parameters = parameters
-        context._is_select = is_select_statement(statement)
+        context._span = span
+        context._statement_info = statement_info
+        context._start_time = time.perf_counter()
 
     @event.listens_for(Engine, "after_cursor_execute")
     def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
-        if hasattr(context, "_span"):
-            span = context._span
-            if cursor.description:
+        if not hasattr(context, "_span"):
+            return
+        span = context._span
+        duration_ms = (time.perf_counter() - context._start_time) * 1000
+        statement_info = context._statement_info
+        record_db_duration(duration_ms, "sqlalchemy", statement_info.statement_type)
+        on_finish = None
+        if CF_SQL_SUMMARY:
+            on_finish = functools.partial(
+                query_stats.record, statement_info.fingerprint, "sqlalchemy", statement_info.statement_type, duration_ms
+            )
+
+        recording = span.is_recording()
+        if recording and hasattr(cursor, "rowcount"):
+            span.set_attribute("db.row_count", cursor.rowcount)
+
+        if (recording or on_finish is not None) and cursor.description:
+            if recording:
                 span.set_attribute("db.result_columns", str([desc[0] for desc in cursor.description]))
-            if hasattr(cursor, "rowcount"):
-                span.set_attribute("db.row_count", cursor.rowcount)
-
-            if context._is_select:
-                try:
-                    with conn.connection.cursor() as new_cursor:
-                        new_cursor.execute(context._original_statement, context._original_parameters)
-                        columns = [col[0] for col in new_cursor.description]
-                        rows = [dict(zip(columns, row)) for row in new_cursor.fetchall()]
-                        span.set_attribute("db.result_data", str(rows))
-                except Exception as e:
-                    span.set_attribute("db.result_capture_error", str(e))
-
+            # The span ends once the result is exhausted or closed
+            context.cursor = ResultCapturingCursor(cursor, span, on_finish=on_finish)
+        else:
             span.end()
+            if on_finish is not None:
+                on_finish(getattr(cursor, "rowcount", 0))
 
     return tracer
 
 
-def _instrument_dbapi(tracer_provider: TracerProvider):
-    try:
-        from opentelemetry.instrumentation.dbapi import DatabaseApiIntegration
+def _instrument_dbapi(tracer_provider: TracerProvider, module_name: str):
+    """Opt-in for DB-API drivers listed in CF_DBAPI_MODULES, their connections are wrapped in proxies."""
+    from captureflow.dbapi import instrument_dbapi_module
+    from captureflow.query_stats import query_stats
 
-        pass
-    except ImportError as e:
-        pass
+    tracer = trace.get_tracer(__name__, tracer_provider=tracer_provider)
+    if CF_SQL_SUMMARY:
+        query_stats.start(tracer)
+    instrument_dbapi_module(sys.modules[module_name], tracer)
 
 
 def _instrument_sqlite3(tracer_provider: TracerProvider):
-    try:
-        from opentelemetry.instrumentation.sqlite3 import SQLite3Instrumentor
+    from captureflow.dbapi import instrument_sqlite3
+    from captureflow.query_stats import query_stats
 
-        pass
-    except ImportError as e:
-        pass
+    tracer = trace.get_tracer(__name__, tracer_provider=tracer_provider)
+    if CF_SQL_SUMMARY:
+        query_stats.start(tracer)
+    instrument_sqlite3(tracer)
 
 
 def _instrument_redis(tracer_provider: TracerProvider):
     try:
         from opentelemetry.instrumentation.redis import RedisInstrumentor
 
-        def request_hook(span, instance, args, kwargs):
-            if span.is_recording():
-                span.set_attribute("redis.command", args[0])
-                if len(args) > 1:
-                    span.set_attribute("redis.command.args", str(args[1:]))
-
-        def response_hook(span, instance, response):
-            if span.is_recording():
-                span.set_attribute("redis.response", str(response))
+        from captureflow.redis_capture import instrument_redis_capture
 
-        RedisInstrumentor().instrument(
-            tracer_provider=tracer_provider,
-            request_hook=request_hook,
-            response_hook=response_hook,
-        )
+        instrument_redis_capture(trace.get_tracer(__name__, tracer_provider=tracer_provider))
+        RedisInstrumentor().instrument(tracer_provider=tracer_provider)
     except ImportError as e:
         pass
 
 
+def _instrument_thread_pools(tracer_provider: TracerProvider):
+    from captureflow.context_propagation import instrument_thread_pools
+
+    instrument_thread_pools(trace.get_tracer(__name__, tracer_provider=tracer_provider))
+
+
 def _instrument_openai(tracer_provider: TracerProvider):
     try:
         pass
@@ -275,20 +350,41 @@ def _instrument_openai(tracer_provider: TracerProvider):
         pass
 
 
-def apply_instrumentation(tracer_provider: TracerProvider):
+# Instrumentations are installed by post-import hooks, a library that is never imported costs nothing at startup
+INSTRUMENTATIONS = (
     # Web Frameworks
-    _instrument_fastapi(tracer_provider)
-    _instrument_flask(tracer_provider)
-
+    ("fastapi", _instrument_fastapi),
+    ("flask", _instrument_flask),
     # Generic HTTP request libraries
-    _instrument_requests(tracer_provider)
-    _instrument_httpx(tracer_provider)
-
+    ("requests", _instrument_requests),
+    ("httpx", _instrument_httpx),
     # Database interactions
-    _instrument_dbapi(tracer_provider)
-    _instrument_sqlalchemy(tracer_provider)
-    _instrument_sqlite3(tracer_provider)
-    _instrument_redis(tracer_provider)
-
+    ("sqlalchemy", _instrument_sqlalchemy),
+    ("sqlite3", _instrument_sqlite3),
+    ("redis", _instrument_redis),
     # Other
-    _instrument_openai(tracer_provider)
+    ("openai", _instrument_openai),
+)
+
+
+def _instrument_on_import(module_name: str, instrument, tracer_provider: TracerProvider):
+    def post_import_hook(module):
+        # Errors here would surface as a failed import in application code
+        try:
+            instrument(tracer_provider)
+        except Exception as e:
+            logger.error(f"Failed to instrument {module_name}: {e}")
+
+    # Runs right away if the module is already imported
+    wrapt.register_post_import_hook(post_import_hook, module_name)
+
+
+def apply_instrumentation(tracer_provider: TracerProvider):
+    # Standard library, already imported by the exporters
+    _instrument_thread_pools(tracer_provider)
+    for module_name, instrument in INSTRUMENTATIONS:
+        _instrument_on_import(module_name, instrument, tracer_provider)
+    for module_name in CF_DBAPI_MODULES:
+        _instrument_on_import(
+            module_name, functools.partial(_instrument_dbapi, module_name=module_name), tracer_provider
+        )
@@ -0,0 +1,80 @@
+# captureflow/meter_provider.py
+import atexit
+
+from opentelemetry.sdk.metrics import Histogram, MeterProvider
+from opentelemetry.sdk.metrics.export import (
+    ConsoleMetricExporter,
+    MetricExporter,
+    PeriodicExportingMetricReader,
+)
+from opentelemetry.sdk.metrics.view import ExplicitBucketHistogramAggregation, View
+from opentelemetry.sdk.resources import Resource
+
+from captureflow.config import (
+    CF_BSP_EXPORT_TIMEOUT_MILLIS,
+    CF_DEBUG,
+    CF_METRICS_EXPORT_INTERVAL_MILLIS,
+    CF_METRICS_SHUTDOWN_TIMEOUT_MILLIS,
+    CF_OTLP_COMPRESSION,
+    CF_OTLP_METRICS_ENDPOINT,
+    CF_OTLP_PROTOCOL,
+)
+from captureflow.exporters import ForkSafeMetricExporter
+
+# Millisecond boundaries, the SDK defaults stop at 10s and are coarse below 5ms
+LATENCY_BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 75, 100, 250, 500, 750, 1000, 2500, 5000, 10000, 30000)
+
+
+def get_otlp_metric_exporter() -> MetricExporter:
+    timeout = CF_BSP_EXPORT_TIMEOUT_MILLIS / 1000
+
+    if CF_OTLP_PROTOCOL == "http/protobuf":
+        from opentelemetry.exporter.otlp.proto.http import Compression
+        from opentelemetry.exporter.otlp.proto.http.metric_exporter import (
+            OTLPMetricExporter as HTTPMetricExporter,
+        )
+
+        return HTTPMetricExporter(
+            endpoint=CF_OTLP_METRICS_ENDPOINT, compression=Compression(CF_OTLP_COMPRESSION), timeout=timeout
+        )
+
+    if CF_OTLP_PROTOCOL != "grpc":
+        raise ValueError(f"Unsupported CF_OTLP_PROTOCOL: {CF_OTLP_PROTOCOL}")
+
+    from grpc import Compression
+    from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import (
+        OTLPMetricExporter,
+    )
+
+    compression = {"none": Compression.NoCompression, "gzip": Compression.Gzip, "deflate": Compression.Deflate}
+    return OTLPMetricExporter(
+        endpoint=CF_OTLP_METRICS_ENDPOINT, insecure=True, compression=compression[CF_OTLP_COMPRESSION], timeout=timeout
+    )
+
+
+def get_meter_provider(resource: Resource) -> MeterProvider:
+    metric_readers = [
+        PeriodicExportingMetricReader(
+            ForkSafeMetricExporter(get_otlp_metric_exporter),
+            export_interval_millis=CF_METRICS_EXPORT_INTERVAL_MILLIS,
+        )
+    ]
+    if CF_DEBUG:
+        metric_readers.append(
+            PeriodicExportingMetricReader(
+                ConsoleMetricExporter(), export_interval_millis=CF_METRICS_EXPORT_INTERVAL_MILLIS
+            )
+        )
+
+    latency_view = View(
+        instrument_type=Histogram,
+        instrument_name="captureflow.*",
+        aggregation=ExplicitBucketHistogramAggregation(LATENCY_BUCKETS_MS),
+    )
+    # The SDK's own exit hook waits up to 30s, and OTLP retries against an unreachable collector aren't bounded by
+    # the per-request timeout. The reader thread is a daemon, whatever is still retrying at the deadline is dropped
+    meter_provider = MeterProvider(
+        resource=resource, metric_readers=metric_readers, views=[latency_view], shutdown_on_exit=False
+    )
+    atexit.register(meter_provider.shutdown, timeout_millis=CF_METRICS_SHUTDOWN_TIMEOUT_MILLIS)
+    return meter_provider
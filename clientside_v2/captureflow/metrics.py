@@ -0,0 +1,56 @@
+"""
+Latency histograms recorded for every request, query and command, whether or not its span is sampled.
+Attributes are limited to low-cardinality values (route templates, statement types, command names),
+so SLO data never depends on which spans are kept.
+"""
+
+from typing import Optional
+
+from opentelemetry import metrics
+
+
+class LatencyHistograms:
+    def __init__(self, meter: metrics.Meter):
+        self.server = meter.create_histogram(
+            "captureflow.http.server.duration", unit="ms", description="Duration of inbound HTTP requests, by route"
+        )
+        self.client = meter.create_histogram(
+            "captureflow.http.client.duration", unit="ms", description="Duration of outbound HTTP requests, by host"
+        )
+        self.db = meter.create_histogram(
+            "captureflow.db.duration", unit="ms", description="Duration of SQL statements, by statement type"
+        )
+        self.redis = meter.create_histogram(
+            "captureflow.redis.duration", unit="ms", description="Duration of Redis commands, by command"
+        )
+
+
+# Instruments of the global proxy meter start recording once the distro sets the MeterProvider
+latency_histograms = LatencyHistograms(metrics.get_meter("captureflow.latency"))
+
+
+def record_server_duration(duration_ms: float, method: str, route: Optional[str], status_code: Optional[int]) -> None:
+    attributes = {"http.request.method": method}
+    # Unmatched requests have no route, raw paths would make the cardinality unbounded
+    if route:
+        attributes["http.route"] = route
+    if status_code:
+        attributes["http.response.status_code"] = status_code
+    latency_histograms.server.record(duration_ms, attributes)
+
+
+def record_client_duration(duration_ms: float, method: str, host: Optional[str], status_code: Optional[int]) -> None:
+    attributes = {"http.request.method": method}
+    if host:
+        attributes["server.address"] = host
+    if status_code:
+        attributes["http.response.status_code"] = status_code
+    latency_histograms.client.record(duration_ms, attributes)
+
+
+def record_db_duration(duration_ms: float, db_system: str, operation: str) -> None:
+    latency_histograms.db.record(duration_ms, {"db.system": db_system, "db.operation": operation})
+
+
+def record_redis_duration(duration_ms: float, command: str) -> None:
+    latency_histograms.redis.record(duration_ms, {"db.system": "redis", "db.operation": command})
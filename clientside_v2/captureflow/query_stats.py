@@ -0,0 +1,135 @@
+"""
+In-process aggregation of SQL statements by fingerprint.
+Every `interval` seconds one summary span per fingerprint is exported, so export volume follows the number of
+distinct queries instead of the number of executions. Redis commands are aggregated the same way, by command name.
+"""
+
+import atexit
+import threading
+import time
+from logging import getLogger
+from typing import Dict, Optional
+
+from opentelemetry import context, trace
+from opentelemetry.trace import SpanKind
+
+from captureflow.config import (
+    CF_SQL_SUMMARY_INTERVAL_SECONDS,
+    CF_SQL_SUMMARY_MAX_FINGERPRINTS,
+)
+from captureflow.fork_safety import register_at_fork
+
+logger = getLogger(__name__)
+
+# Fingerprints beyond `max_fingerprints` in one interval are counted here
+OVERFLOW_FINGERPRINT = "<other>"
+
+
+class _QueryStats:
+    __slots__ = ("db_system", "statement_type", "count", "total_ms", "max_ms", "rows")
+
+    def __init__(self, db_system: str, statement_type: str):
+        self.db_system = db_system
+        self.statement_type = statement_type
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+
+
+class QueryStatsAggregator:
+    def __init__(
+        self,
+        interval: float = CF_SQL_SUMMARY_INTERVAL_SECONDS,
+        max_fingerprints: int = CF_SQL_SUMMARY_MAX_FINGERPRINTS,
+        summary_name: str = "SQL summary",
+    ):
+        self.interval = interval
+        self.max_fingerprints = max_fingerprints
+        self.summary_name = summary_name
+        self.tracer: Optional[trace.Tracer] = None
+
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _QueryStats] = {}
+        self._interval_start_ns = time.time_ns()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        register_at_fork(after_in_child=self._reinit_after_fork)
+        atexit.register(self.flush)
+
+    def start(self, tracer: trace.Tracer) -> None:
+        self.tracer = tracer
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="captureflow-query-stats", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def _reinit_after_fork(self) -> None:
+        # Queries of the parent process are reported by the parent
+        was_running = self._thread is not None and not self._stop_event.is_set()
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._interval_start_ns = time.time_ns()
+        self._stop_event = threading.Event()
+        self._thread = None
+        if was_running:
+            self.start(self.tracer)
+
+    def record(self, fingerprint: str, db_system: str, statement_type: str, duration_ms: float, rows: int) -> None:
+        with self._lock:
+            stats = self._stats.get(fingerprint)
+            if stats is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    fingerprint, statement_type = OVERFLOW_FINGERPRINT, "UNKNOWN"
+                    stats = self._stats.get(fingerprint)
+                if stats is None:
+                    stats = self._stats[fingerprint] = _QueryStats(db_system, statement_type)
+            stats.count += 1
+            stats.total_ms += duration_ms
+            if duration_ms > stats.max_ms:
+                stats.max_ms = duration_ms
+            if rows > 0:
+                stats.rows += rows
+
+    def flush(self) -> None:
+        """Export one summary span per fingerprint seen since the previous flush."""
+        with self._lock:
+            stats, self._stats = self._stats, {}
+            start_ns, self._interval_start_ns = self._interval_start_ns, time.time_ns()
+        if not stats or self.tracer is None:
+            return
+
+        end_ns = time.time_ns()
+        # Summaries are not part of whatever request happens to be active in the flushing thread
+        root_context = context.Context()
+        for fingerprint, summary in stats.items():
+            span = self.tracer.start_span(
+                f"{self.summary_name}: {summary.statement_type}",
+                context=root_context,
+                kind=SpanKind.INTERNAL,
+                start_time=start_ns,
+                attributes={
+                    "db.system": summary.db_system,
+                    "db.statement.fingerprint": fingerprint,
+                    "db.query.count": summary.count,
+                    "db.query.duration_total_ms": summary.total_ms,
+                    "db.query.duration_max_ms": summary.max_ms,
+                    "db.query.rows": summary.rows,
+                },
+            )
+            span.end(end_time=end_ns)
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to export SQL summaries: {e}")
+
+
+query_stats = QueryStatsAggregator()
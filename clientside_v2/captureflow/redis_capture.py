@@ -0,0 +1,177 @@
+"""
+Redis command capture with bounded reprs.
+Wrappers sit inside the RedisInstrumentor spans: a pipeline's command stack is still queued when they run,
+so each command is recorded next to its reply instead of as one opaque blob.
+"""
+
+import itertools
+import json
+import time
+
+import wrapt
+from opentelemetry import trace
+from opentelemetry.instrumentation.utils import is_instrumentation_enabled
+
+from captureflow.body_capture import truncation_marker
+from captureflow.config import (
+    CF_REDIS_MAX_BYTES,
+    CF_REDIS_MAX_ITEMS,
+    CF_REDIS_SUMMARY,
+    CF_SQL_SUMMARY_INTERVAL_SECONDS,
+    CF_SQL_SUMMARY_MAX_FINGERPRINTS,
+)
+from captureflow.metrics import record_redis_duration
+from captureflow.query_stats import QueryStatsAggregator
+
+_instrumented = False
+
+redis_stats = QueryStatsAggregator(
+    CF_SQL_SUMMARY_INTERVAL_SECONDS, CF_SQL_SUMMARY_MAX_FINGERPRINTS, summary_name="Redis summary"
+)
+
+
+def _shorten(value, max_bytes: int):
+    # Keeps repr() below O(max_bytes) for huge values
+    if isinstance(value, (bytes, str)) and len(value) > max_bytes:
+        return value[:max_bytes]
+    return value
+
+
+def capped_repr(value, max_items: int = CF_REDIS_MAX_ITEMS, max_bytes: int = CF_REDIS_MAX_BYTES) -> str:
+    """repr() of at most `max_items` elements of a collection, cut to `max_bytes` characters."""
+    omitted = 0
+    if isinstance(value, dict):
+        omitted = len(value) - max_items
+        value = {
+            _shorten(key, max_bytes): _shorten(item, max_bytes)
+            for key, item in itertools.islice(value.items(), max_items)
+        }
+    elif isinstance(value, (list, tuple, set)):
+        omitted = len(value) - max_items
+        items = [_shorten(item, max_bytes) for item in itertools.islice(value, max_items)]
+        value = tuple(items) if isinstance(value, tuple) else items
+    else:
+        value = _shorten(value, max_bytes)
+
+    text = repr(value)
+    if omitted > 0:
+        text += f"...[{omitted} more items]"
+    if len(text) > max_bytes:
+        text = text[:max_bytes] + truncation_marker(len(text) - max_bytes)
+    return text
+
+
+def _command_name(args) -> str:
+    if not args:
+        return "UNKNOWN"
+    name = args[0]
+    return (name.decode("latin-1") if isinstance(name, bytes) else str(name)).upper()
+
+
+def _command_args(command):
+    # Queued commands are (args, options) tuples, or objects with `args` in cluster pipelines
+    return command.args if hasattr(command, "args") else command[0]
+
+
+def _current_span() -> trace.Span:
+    # With instrumentation suppressed RedisInstrumentor starts no span, the current one belongs to the caller
+    return trace.get_current_span() if is_instrumentation_enabled() else trace.INVALID_SPAN
+
+
+def _record_command(span: trace.Span, args, response, duration_ms: float) -> None:
+    name = _command_name(args)
+    # reprs are only built for spans that are exported
+    if span.is_recording():
+        span.set_attribute("redis.command", name)
+        if len(args) > 1:
+            span.set_attribute("redis.command.args", capped_repr(tuple(args[1:])))
+        span.set_attribute("redis.response", capped_repr(response))
+    record_redis_duration(duration_ms, name)
+    if CF_REDIS_SUMMARY:
+        redis_stats.record(name, "redis", name, duration_ms, 0)
+
+
+def _snapshot_pipeline(span: trace.Span, instance) -> list:
+    command_stack = getattr(instance, "command_stack", ())
+    if not span.is_recording():
+        # Only the length is needed for the summary
+        return [None] * len(command_stack)
+    return [_command_args(command) for command in command_stack]
+
+
+def _record_pipeline(span: trace.Span, instance, commands: list, response, duration_ms: float) -> None:
+    transaction = bool(getattr(instance, "transaction", False))
+    if span.is_recording():
+        replies = response if isinstance(response, (list, tuple)) else ()
+        recorded = [
+            {
+                "command": _command_name(args),
+                "args": capped_repr(tuple(args[1:])),
+                "response": capped_repr(replies[index]) if index < len(replies) else None,
+            }
+            for index, args in enumerate(commands[:CF_REDIS_MAX_ITEMS])
+        ]
+        span.set_attribute("redis.pipeline.transaction", transaction)
+        span.set_attribute("redis.pipeline.commands", json.dumps(recorded))
+        if len(commands) > CF_REDIS_MAX_ITEMS:
+            span.set_attribute("redis.pipeline.commands_omitted", len(commands) - CF_REDIS_MAX_ITEMS)
+    # Per-command latency is not observable inside a pipeline
+    name = "MULTI/EXEC" if transaction else "PIPELINE"
+    record_redis_duration(duration_ms, name)
+    if CF_REDIS_SUMMARY:
+        # "rows" counts the pipeline's commands
+        redis_stats.record(name, "redis", name, duration_ms, len(commands))
+
+
+def _traced_execute_command(wrapped, instance, args, kwargs):
+    span = _current_span()
+    start = time.perf_counter()
+    response = wrapped(*args, **kwargs)
+    _record_command(span, args, response, (time.perf_counter() - start) * 1000)
+    return response
+
+
+def _traced_execute_pipeline(wrapped, instance, args, kwargs):
+    span = _current_span()
+    commands = _snapshot_pipeline(span, instance)
+    start = time.perf_counter()
+    response = wrapped(*args, **kwargs)
+    _record_pipeline(span, instance, commands, response, (time.perf_counter() - start) * 1000)
+    return response
+
+
+async def _async_traced_execute_command(wrapped, instance, args, kwargs):
+    span = _current_span()
+    start = time.perf_counter()
+    response = await wrapped(*args, **kwargs)
+    _record_command(span, args, response, (time.perf_counter() - start) * 1000)
+    return response
+
+
+async def _async_traced_execute_pipeline(wrapped, instance, args, kwargs):
+    span = _current_span()
+    commands = _snapshot_pipeline(span, instance)
+    start = time.perf_counter()
+    response = await wrapped(*args, **kwargs)
+    _record_pipeline(span, instance, commands, response, (time.perf_counter() - start) * 1000)
+    return response
+
+
+def instrument_redis_capture(tracer: trace.Tracer) -> None:
+    """Must run before RedisInstrumentor wraps the same methods, so these wrappers end up inside its spans."""
+    global _instrumented
+    if _instrumented:
+        return
+    _instrumented = True
+
+    import redis.asyncio.client
+    import redis.client
+
+    wrapt.wrap_function_wrapper(redis.client, "Redis.execute_command", _traced_execute_command)
+    wrapt.wrap_function_wrapper(redis.client, "Pipeline.immediate_execute_command", _traced_execute_command)
+    wrapt.wrap_function_wrapper(redis.client, "Pipeline.execute", _traced_execute_pipeline)
+    wrapt.wrap_function_wrapper(redis.asyncio.client, "Redis.execute_command", _async_traced_execute_command)
+    wrapt.wrap_function_wrapper(redis.asyncio.client, "Pipeline.execute", _async_traced_execute_pipeline)
+
+    if CF_REDIS_SUMMARY:
+        redis_stats.start(tracer)
@@ -1,12 +1,22 @@
+import functools
 import inspect
+import json
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
 from logging import getLogger
 from pathlib import Path
 from types import CodeType, FrameType
+from typing import Dict, List, Optional, Tuple
 
 import opentelemetry
 from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
+from opentelemetry.trace import SpanKind, StatusCode
 
 import captureflow
+from captureflow.fork_safety import register_at_fork
 
 logger = getLogger(__name__)
 
@@ -17,16 +27,17 @@ PREFIXES = (
     str(Path(inspect.__file__).parent),
     str(Path(captureflow.__file__).parent),
 )
+MAX_CACHED_FILES = 4096
 
 
 def get_stack_info_from_frame(frame: FrameType):
     """
     Extract file path, function name, and line number from a frame.
     """
-    code = frame.f_code
-    info = {"code.filepath": get_relative_filepath(code.co_filename)}
-    if code.co_name != "<module>":
-        info["code.function"] = code.co_name
+    _, filepath, function = _get_code_info(frame.f_code)
+    info = {"code.filepath": filepath}
+    if function is not None:
+        info["code.function"] = function
     info["code.lineno"] = frame.f_lineno
     return info
 
@@ -46,16 +57,38 @@ def is_user_code(code: CodeType) -> bool:
     """
     Determine if a code object is from user code.
     """
-    return not any(str(Path(code.co_filename).absolute()).startswith(prefix) for prefix in PREFIXES)
+    return _get_file_info(code.co_filename)[0]
 
 
-def get_user_stack_info():
+@functools.lru_cache(maxsize=MAX_CACHED_FILES)
+def _get_file_info(filename: str) -> Tuple[bool, str]:
+    """
+    (is user code, relative file path) of a source file, computed once per file.
+    Keyed by file name rather than code object: code objects compare equal across files when only co_filename differs.
+    """
+    is_user = not any(str(Path(filename).absolute()).startswith(prefix) for prefix in PREFIXES)
+    return is_user, get_relative_filepath(filename)
+
+
+def _get_code_info(code: CodeType) -> Tuple[bool, str, Optional[str]]:
+    """
+    (is user code, relative file path, function name) of a code object.
+    """
+    function = code.co_name if code.co_name != "<module>" else None
+    return (*_get_file_info(code.co_filename), function)
+
+
+def get_user_stack_info(start_depth: int = 1):
     """
     Get the stack info for the first calling frame in user code.
+    Classification and relative paths are cached per source file, so the walk doesn't build any Path on a hot path.
     """
-    frame = inspect.currentframe()
+    try:
+        frame = sys._getframe(start_depth)
+    except ValueError:
+        return {}
     while frame:
-        if is_user_code(frame.f_code):
+        if _get_code_info(frame.f_code)[0]:
             return get_stack_info_from_frame(frame)
         frame = frame.f_back
     return {}
@@ -66,7 +99,8 @@ class FrameInfoSpanProcessor(SpanProcessor):
         """
         Add user stack info attributes to the span when it starts.
         """
-        stack_info = get_user_stack_info()
+        # Skip this method and its SDK caller, neither of them is user code
+        stack_info = get_user_stack_info(start_depth=2)
         for key, value in stack_info.items():
             span.set_attribute(key, value)
 
@@ -78,3 +112,323 @@ class FrameInfoSpanProcessor(SpanProcessor):
 
     def force_flush(self, timeout_millis: int = 30000):
         pass
+
+
+class _BufferedTrace:
+    __slots__ = ("spans", "errored")
+
+    def __init__(self):
+        self.spans: List[ReadableSpan] = []
+        self.errored = False
+
+
+class TailSamplingSpanProcessor(SpanProcessor):
+    """
+    Buffers the spans of each trace until its local root span ends, then passes the whole trace to `span_processor`
+    only if it errored, took longer than `latency_threshold_ms` or won the `sampling_rate` coin flip.
+
+    At most `max_buffered_spans` spans are held; when full, the oldest trace is evicted (still exported if it errored).
+    """
+
+    def __init__(
+        self,
+        span_processor: SpanProcessor,
+        sampling_rate: float = 0.1,
+        latency_threshold_ms: float = 1000,
+        max_buffered_spans: int = 10000,
+        max_decided_traces: int = 10000,
+    ):
+        self.span_processor = span_processor
+        self.sampling_rate = sampling_rate
+        self.latency_threshold_ns = int(latency_threshold_ms * 1e6)
+        self.max_buffered_spans = max_buffered_spans
+        self.max_decided_traces = max_decided_traces
+        self.dropped_traces = 0
+
+        self._lock = threading.Lock()
+        self._traces: "OrderedDict[int, _BufferedTrace]" = OrderedDict()
+        # Decisions of recently finished traces, for children that end after their local root (fire-and-forget tasks)
+        self._decided: "OrderedDict[int, bool]" = OrderedDict()
+        self._buffered_spans = 0
+
+        register_at_fork(after_in_child=self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        # Buffered spans belong to requests of the parent process
+        self._lock = threading.Lock()
+        self._traces.clear()
+        self._decided.clear()
+        self._buffered_spans = 0
+
+    def on_start(self, span: Span, parent_context=None):
+        self.span_processor.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span: ReadableSpan):
+        trace_id = span.context.trace_id
+        is_local_root = span.parent is None or span.parent.is_remote
+        evicted = []
+
+        with self._lock:
+            decision = self._decided.get(trace_id)
+            if decision is None:
+                buffered_trace = self._traces.get(trace_id)
+                if buffered_trace is None:
+                    buffered_trace = self._traces[trace_id] = _BufferedTrace()
+                buffered_trace.spans.append(span)
+                buffered_trace.errored |= span.status.status_code is StatusCode.ERROR
+                self._buffered_spans += 1
+
+                if is_local_root:
+                    del self._traces[trace_id]
+                    self._buffered_spans -= len(buffered_trace.spans)
+                    decision = self._should_keep(span, buffered_trace.errored)
+                    self._remember_decision(trace_id, decision)
+                    spans = buffered_trace.spans if decision else []
+                else:
+                    evicted = self._evict_overflow()
+                    spans = []
+            else:
+                spans = [span] if decision else []
+
+        for finished_span in spans:
+            self.span_processor.on_end(finished_span)
+        for evicted_trace in evicted:
+            for finished_span in evicted_trace.spans:
+                self.span_processor.on_end(finished_span)
+
+    def _should_keep(self, root_span: ReadableSpan, errored: bool) -> bool:
+        if errored:
+            return True
+        if root_span.end_time - root_span.start_time >= self.latency_threshold_ns:
+            return True
+        return random.random() < self.sampling_rate
+
+    def _remember_decision(self, trace_id: int, decision: bool):
+        self._decided[trace_id] = decision
+        while len(self._decided) > self.max_decided_traces:
+            self._decided.popitem(last=False)
+
+    def _evict_overflow(self) -> List[_BufferedTrace]:
+        """Drop the oldest buffered traces until the buffer fits, returns the errored ones so they can be exported."""
+        evicted = []
+        while self._buffered_spans > self.max_buffered_spans and self._traces:
+            trace_id, buffered_trace = self._traces.popitem(last=False)
+            self._buffered_spans -= len(buffered_trace.spans)
+            self._remember_decision(trace_id, buffered_trace.errored)
+            if buffered_trace.errored:
+                evicted.append(buffered_trace)
+            else:
+                self.dropped_traces += 1
+        return evicted
+
+    def shutdown(self):
+        self.span_processor.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000):
+        # Traces that are still in progress stay buffered, there is no decision for them yet
+        return self.span_processor.force_flush(timeout_millis)
+
+
+class _TraceRepeats:
+    __slots__ = ("root", "counts", "first_locations", "findings")
+
+    def __init__(self, root: Span):
+        self.root = root
+        self.counts: Dict[Tuple[int, str, str], int] = {}
+        self.first_locations: Dict[Tuple[int, str, str], dict] = {}
+        self.findings: Dict[Tuple[int, str, str], dict] = {}
+
+
+class NPlusOneSpanProcessor(SpanProcessor):
+    """
+    Counts SQL statements (by fingerprint) and outbound HTTP calls (by URL) repeated under the same parent span.
+    Once a repeat reaches `threshold`, the local root span gets a `captureflow.n_plus_one` attribute: a JSON list of
+    findings with the repeated statement or URL, its count and the code location of its first occurrence.
+
+    Work is done incrementally in `on_end`. At most `max_traces` traces and `max_keys_per_trace` distinct
+    repeats per trace are tracked.
+    """
+
+    FINDINGS_ATTRIBUTE = "captureflow.n_plus_one"
+
+    def __init__(self, threshold: int = 10, max_traces: int = 1000, max_keys_per_trace: int = 256):
+        self.threshold = threshold
+        self.max_traces = max_traces
+        self.max_keys_per_trace = max_keys_per_trace
+
+        self._lock = threading.Lock()
+        self._traces: "OrderedDict[int, _TraceRepeats]" = OrderedDict()
+
+        register_at_fork(after_in_child=self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        self._lock = threading.Lock()
+        self._traces.clear()
+
+    def on_start(self, span: Span, parent_context=None):
+        if span.parent is None or span.parent.is_remote:
+            with self._lock:
+                self._traces[span.context.trace_id] = _TraceRepeats(span)
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+
+    def on_end(self, span: ReadableSpan):
+        trace_id = span.context.trace_id
+        if span.parent is None or span.parent.is_remote:
+            with self._lock:
+                self._traces.pop(trace_id, None)
+            return
+
+        repeat = self._repeat_of(span)
+        if repeat is None:
+            return
+        key = (span.parent.span_id, *repeat)
+
+        with self._lock:
+            trace_repeats = self._traces.get(trace_id)
+            if trace_repeats is None:
+                return
+            count = trace_repeats.counts.get(key)
+            if count is None:
+                if len(trace_repeats.counts) >= self.max_keys_per_trace:
+                    return
+                count = 0
+            trace_repeats.counts[key] = count = count + 1
+
+            if count == 1:
+                trace_repeats.first_locations[key] = self._code_location(span)
+            if count < self.threshold:
+                return
+            if count == self.threshold:
+                kind, value = repeat
+                trace_repeats.findings[key] = {"kind": kind, "key": value, **trace_repeats.first_locations[key]}
+            trace_repeats.findings[key]["count"] = count
+            findings = json.dumps(list(trace_repeats.findings.values()))
+            root = trace_repeats.root
+
+        root.set_attribute(self.FINDINGS_ATTRIBUTE, findings)
+
+    @staticmethod
+    def _repeat_of(span: ReadableSpan) -> Optional[Tuple[str, str]]:
+        attributes = span.attributes
+        fingerprint = attributes.get("db.statement.fingerprint")
+        if fingerprint is not None:
+            return "sql", fingerprint
+        if span.kind is SpanKind.CLIENT:
+            url = attributes.get("http.request.url") or attributes.get("url.full") or attributes.get("http.url")
+            if url is not None:
+                return "http", url
+        return None
+
+    @staticmethod
+    def _code_location(span: ReadableSpan) -> dict:
+        attributes = span.attributes
+        return {key: attributes[key] for key in ("code.filepath", "code.lineno", "code.function") if key in attributes}
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000):
+        return True
+
+
+# Rough per-object overheads, the memory bound only has to be right within a small factor
+_SPAN_OVERHEAD_BYTES = 512
+_ATTRIBUTE_OVERHEAD_BYTES = 64
+
+
+def _estimated_size(span: ReadableSpan) -> int:
+    size = _SPAN_OVERHEAD_BYTES + len(span.name)
+    for attributes in (span.attributes, *(event.attributes for event in span.events)):
+        for key, value in (attributes or {}).items():
+            size += _ATTRIBUTE_OVERHEAD_BYTES + len(key)
+            size += len(value) if isinstance(value, str) else 8 * len(value) if isinstance(value, tuple) else 8
+    return size
+
+
+class _RecentTrace:
+    __slots__ = ("spans", "size", "started")
+
+    def __init__(self):
+        self.spans: List[ReadableSpan] = []
+        self.size = 0
+        self.started = time.monotonic()
+
+
+class RecentTracesSpanProcessor(SpanProcessor):
+    """
+    Ring buffer of the last `max_traces` completed traces, for looking at traces without a collector.
+    A trace is complete once its local root span ends; spans of traces still in progress are held separately.
+
+    Span sizes are estimated from names and attribute values, the oldest completed traces are evicted once the
+    buffer, pending spans included, holds more than `max_bytes`. Traces in progress are only evicted for room once
+    they alone hold more than `max_bytes`, a burst of long requests would otherwise push out each other before
+    completing. They are also dropped once pending for `max_pending_seconds`, their root is unlikely to ever end.
+    """
+
+    def __init__(self, max_traces: int = 200, max_bytes: int = 8 * 1024 * 1024, max_pending_seconds: float = 300):
+        self.max_traces = max_traces
+        self.max_bytes = max_bytes
+        self.max_pending_seconds = max_pending_seconds
+
+        self._lock = threading.Lock()
+        self._pending: "OrderedDict[int, _RecentTrace]" = OrderedDict()
+        self._completed: "OrderedDict[int, _RecentTrace]" = OrderedDict()
+        self._size = 0
+
+        register_at_fork(after_in_child=self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        # Traces of the parent process would be served as if the worker had handled them
+        self._lock = threading.Lock()
+        self._pending.clear()
+        self._completed.clear()
+        self._size = 0
+
+    def on_start(self, span: Span, parent_context=None):
+        pass
+
+    def on_end(self, span: ReadableSpan):
+        trace_id = span.context.trace_id
+        size = _estimated_size(span)
+
+        with self._lock:
+            # Children ending after their local root (fire-and-forget tasks) join the completed trace
+            recent_trace = self._completed.get(trace_id) or self._pending.get(trace_id)
+            if recent_trace is None:
+                recent_trace = self._pending[trace_id] = _RecentTrace()
+            recent_trace.spans.append(span)
+            recent_trace.size += size
+            self._size += size
+
+            if (span.parent is None or span.parent.is_remote) and trace_id in self._pending:
+                self._completed[trace_id] = self._pending.pop(trace_id)
+            self._evict_overflow()
+
+    def _evict_overflow(self):
+        # Pending traces are ordered by their first span, so the stale ones are at the front
+        deadline = time.monotonic() - self.max_pending_seconds
+        while self._pending and next(iter(self._pending.values())).started < deadline:
+            self._size -= self._pending.popitem(last=False)[1].size
+        while len(self._completed) > self.max_traces:
+            self._size -= self._completed.popitem(last=False)[1].size
+        while self._size > self.max_bytes and (self._completed or self._pending):
+            # Traces in progress only go once they alone exceed the budget, oldest first
+            traces = self._completed if self._completed else self._pending
+            self._size -= traces.popitem(last=False)[1].size
+
+    def traces(self) -> List[List[ReadableSpan]]:
+        """Completed traces, newest first."""
+        with self._lock:
+            return [list(recent_trace.spans) for recent_trace in reversed(self._completed.values())]
+
+    def get_trace(self, trace_id: int) -> Optional[List[ReadableSpan]]:
+        with self._lock:
+            recent_trace = self._completed.get(trace_id)
+            return list(recent_trace.spans) if recent_trace is not None else None
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000):
+        return True
@@ -5,21 +5,90 @@ from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import (
     BatchSpanProcessor,
     ConsoleSpanExporter,
-    SimpleSpanProcessor,
+    SpanExporter,
 )
 
-from captureflow.config import CF_DEBUG, CF_OTLP_ENDPOINT
+from captureflow.config import (
+    CF_BSP_EXPORT_TIMEOUT_MILLIS,
+    CF_BSP_MAX_EXPORT_BATCH_SIZE,
+    CF_BSP_MAX_QUEUE_SIZE,
+    CF_BSP_SCHEDULE_DELAY_MILLIS,
+    CF_DEBUG,
+    CF_FORK_FLUSH_TIMEOUT_MILLIS,
+    CF_OTLP_COMPRESSION,
+    CF_OTLP_ENDPOINT,
+    CF_OTLP_PROTOCOL,
+    CF_TAIL_SAMPLING,
+    CF_TAIL_SAMPLING_LATENCY_MS,
+    CF_TAIL_SAMPLING_MAX_SPANS,
+    CF_TAIL_SAMPLING_RATE,
+    CF_TRACES_EXPORTER,
+)
+from captureflow.exporters import (
+    ForkSafeSpanExporter,
+    MonitoredBatchSpanProcessor,
+    MonitoredSpanExporter,
+)
+from captureflow.span_processor import TailSamplingSpanProcessor
+
+
+def get_otlp_exporter() -> SpanExporter:
+    timeout = CF_BSP_EXPORT_TIMEOUT_MILLIS / 1000
+
+    if CF_OTLP_PROTOCOL == "http/protobuf":
+        from opentelemetry.exporter.otlp.proto.http import Compression
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter as HTTPSpanExporter,
+        )
+
+        return HTTPSpanExporter(
+            endpoint=CF_OTLP_ENDPOINT, compression=Compression(CF_OTLP_COMPRESSION), timeout=timeout
+        )
+
+    if CF_OTLP_PROTOCOL != "grpc":
+        raise ValueError(f"Unsupported CF_OTLP_PROTOCOL: {CF_OTLP_PROTOCOL}")
+
+    from grpc import Compression
+
+    compression = {"none": Compression.NoCompression, "gzip": Compression.Gzip, "deflate": Compression.Deflate}
+    return OTLPSpanExporter(
+        endpoint=CF_OTLP_ENDPOINT, insecure=True, compression=compression[CF_OTLP_COMPRESSION], timeout=timeout
+    )
 
 
 def get_tracer_provider(resource: Resource) -> TracerProvider:
     trace_provider = TracerProvider(resource=resource)
 
-    # Replace with Jaeger
-    otlp_exporter = OTLPSpanExporter(endpoint=CF_OTLP_ENDPOINT, insecure=True)
+    if CF_TRACES_EXPORTER == "file":
+        from captureflow.file_exporter import FileSpanExporter
+
+        span_exporter = MonitoredSpanExporter(FileSpanExporter())
+    elif CF_TRACES_EXPORTER == "otlp":
+        # BatchSpanProcessor restarts its own worker thread after fork(), the exporter's channel has to be rebuilt by us
+        span_exporter = MonitoredSpanExporter(ForkSafeSpanExporter(get_otlp_exporter))
+    else:
+        raise ValueError(f"Unsupported CF_TRACES_EXPORTER: {CF_TRACES_EXPORTER}")
+
+    span_processor = MonitoredBatchSpanProcessor(
+        span_exporter,
+        max_queue_size=CF_BSP_MAX_QUEUE_SIZE,
+        max_export_batch_size=CF_BSP_MAX_EXPORT_BATCH_SIZE,
+        schedule_delay_millis=CF_BSP_SCHEDULE_DELAY_MILLIS,
+        export_timeout_millis=CF_BSP_EXPORT_TIMEOUT_MILLIS,
+        fork_flush_timeout_millis=CF_FORK_FLUSH_TIMEOUT_MILLIS,
+    )
+    if CF_TAIL_SAMPLING:
+        span_processor = TailSamplingSpanProcessor(
+            span_processor,
+            sampling_rate=CF_TAIL_SAMPLING_RATE,
+            latency_threshold_ms=CF_TAIL_SAMPLING_LATENCY_MS,
+            max_buffered_spans=CF_TAIL_SAMPLING_MAX_SPANS,
+        )
 
-    trace_provider.add_span_processor(BatchSpanProcessor(otlp_exporter))
+    trace_provider.add_span_processor(span_processor)
 
     if CF_DEBUG:
-        trace_provider.add_span_processor(SimpleSpanProcessor(ConsoleSpanExporter()))
+        # Printing happens on the processor's worker thread, never in the request thread
+        trace_provider.add_span_processor(BatchSpanProcessor(ConsoleSpanExporter()))
 
     return trace_provider
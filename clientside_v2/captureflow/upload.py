@@ -0,0 +1,125 @@
+"""
+Bulk upload of span files written by `FileSpanExporter` to an OTLP collector.
+
+    python -m captureflow.upload [directory]
+
+Files are sent oldest first and deleted once every request in them was accepted, a failed upload can simply be
+retried later. Files left unfinished by crashed processes are uploaded up to their last complete record.
+Endpoint, protocol and compression come from the same settings as live export.
+"""
+
+import argparse
+import sys
+from logging import getLogger
+from typing import Callable, Optional
+
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+    ExportTraceServiceRequest,
+)
+
+from captureflow.config import (
+    CF_BSP_EXPORT_TIMEOUT_MILLIS,
+    CF_FILE_EXPORT_DIR,
+    CF_OTLP_COMPRESSION,
+    CF_OTLP_ENDPOINT,
+    CF_OTLP_PROTOCOL,
+)
+from captureflow.file_exporter import (
+    complete_span_files,
+    finalize_orphaned_files,
+    read_span_file,
+)
+
+logger = getLogger(__name__)
+
+Sender = Callable[[ExportTraceServiceRequest], None]
+
+
+def grpc_sender(endpoint: str = CF_OTLP_ENDPOINT) -> Sender:
+    import grpc
+    from opentelemetry.proto.collector.trace.v1.trace_service_pb2_grpc import (
+        TraceServiceStub,
+    )
+
+    compression = {
+        "none": grpc.Compression.NoCompression,
+        "gzip": grpc.Compression.Gzip,
+        "deflate": grpc.Compression.Deflate,
+    }[CF_OTLP_COMPRESSION]
+    target = endpoint.split("://", 1)[-1]
+    stub = TraceServiceStub(grpc.insecure_channel(target))
+
+    def send(request: ExportTraceServiceRequest) -> None:
+        stub.Export(
+            request,
+            timeout=CF_BSP_EXPORT_TIMEOUT_MILLIS / 1000,
+            compression=compression,
+        )
+
+    return send
+
+
+def http_sender(endpoint: str = CF_OTLP_ENDPOINT) -> Sender:
+    import gzip
+    import zlib
+
+    import requests
+
+    session = requests.Session()
+    headers = {"Content-Type": "application/x-protobuf"}
+    if CF_OTLP_COMPRESSION != "none":
+        headers["Content-Encoding"] = CF_OTLP_COMPRESSION
+
+    def send(request: ExportTraceServiceRequest) -> None:
+        data = request.SerializeToString()
+        if CF_OTLP_COMPRESSION == "gzip":
+            data = gzip.compress(data)
+        elif CF_OTLP_COMPRESSION == "deflate":
+            data = zlib.compress(data)
+        response = session.post(endpoint, data=data, headers=headers, timeout=CF_BSP_EXPORT_TIMEOUT_MILLIS / 1000)
+        response.raise_for_status()
+
+    return send
+
+
+def get_sender() -> Sender:
+    if CF_OTLP_PROTOCOL == "http/protobuf":
+        return http_sender()
+    if CF_OTLP_PROTOCOL != "grpc":
+        raise ValueError(f"Unsupported CF_OTLP_PROTOCOL: {CF_OTLP_PROTOCOL}")
+    return grpc_sender()
+
+
+def upload_span_files(directory: str = CF_FILE_EXPORT_DIR, send: Optional[Sender] = None, delete: bool = True) -> int:
+    """Send every complete span file in `directory`, returns the number of files uploaded."""
+    send = send or get_sender()
+    # Files of crashed processes, nobody else would ever rename them
+    finalize_orphaned_files(directory)
+    uploaded = 0
+    for path in complete_span_files(directory):
+        for request in read_span_file(path):
+            send(request)
+        if delete:
+            path.unlink()
+        uploaded += 1
+        logger.info(f"Uploaded {path}")
+    return uploaded
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Upload span files written by the CaptureFlow file exporter.")
+    parser.add_argument("directory", nargs="?", default=CF_FILE_EXPORT_DIR)
+    parser.add_argument("--keep", action="store_true", help="keep files after uploading them")
+    args = parser.parse_args(argv)
+
+    try:
+        uploaded = upload_span_files(args.directory, delete=not args.keep)
+    except Exception as e:
+        print(f"Upload failed: {e}", file=sys.stderr)
+        return 1
+    print(f"Uploaded {uploaded} span files from {args.directory}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+WSGI request body capture. The input stream is teed into a capped buffer while the application reads it,
+so a body is never read on the application's behalf and never held in full.
+"""
+
+import time
+from typing import Optional
+
+from opentelemetry import trace
+
+from captureflow.body_capture import BodyBuffer
+
+REQUEST_BODY_ENVIRON_KEY = "captureflow.request_body"
+REQUEST_START_ENVIRON_KEY = "captureflow.request_start"
+
+
+class TeeInput:
+    """
+    `wsgi.input` wrapper copying what the application reads into `buffer`.
+    The server span is started inside this middleware, so whether to copy at all is decided on the first read:
+    bodies of requests whose span is not recording are passed through untouched.
+    """
+
+    def __init__(self, stream, buffer: BodyBuffer):
+        self._stream = stream
+        self._buffer: Optional[BodyBuffer] = buffer
+        self._decided = False
+
+    def _target(self) -> Optional[BodyBuffer]:
+        if not self._decided:
+            self._decided = True
+            if not trace.get_current_span().is_recording():
+                self._buffer = None
+        return self._buffer
+
+    def read(self, *args):
+        data = self._stream.read(*args)
+        buffer = self._target()
+        if buffer is not None:
+            buffer.write(data)
+        return data
+
+    def readline(self, *args):
+        line = self._stream.readline(*args)
+        buffer = self._target()
+        if buffer is not None:
+            buffer.write(line)
+        return line
+
+    def readlines(self, *args):
+        lines = self._stream.readlines(*args)
+        buffer = self._target()
+        if buffer is not None:
+            for line in lines:
+                buffer.write(line)
+        return lines
+
+    def __iter__(self):
+        buffer = self._target()
+        for line in self._stream:
+            if buffer is not None:
+                buffer.write(line)
+            yield line
+
+
+class RequestBodyMiddleware:
+    """
+    Puts a `BodyBuffer` holding the part of the request body read by the application under REQUEST_BODY_ENVIRON_KEY,
+    and the `time.perf_counter()` the request came in at under REQUEST_START_ENVIRON_KEY.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        environ[REQUEST_START_ENVIRON_KEY] = time.perf_counter()
+        stream = environ.get("wsgi.input")
+        if stream is not None:
+            buffer = environ[REQUEST_BODY_ENVIRON_KEY] = BodyBuffer()
+            environ["wsgi.input"] = TeeInput(stream, buffer)
+        return self.wsgi_app(environ, start_response)
@@ -1,46 +1,28 @@
-import subprocess
-import time
-
 import pytest
-import requests
-
-
-@pytest.fixture(scope="session", autouse=True)
-def start_docker_compose():
-    """
-    All the custom instrumentations require docker contains running (e.g. postgres, redis, etc).
-    Also, make sure Docker itself is running.
-    """
-
-    def is_jaeger_running():
-        """
-        Checking if docker compose is already running.
-        Currently, check is simplified to just checking "jaeger" container, that runs on :16686 port
-        """
-        try:
-            response = requests.get("http://localhost:16686")
-            return response.status_code == 200
-        except requests.ConnectionError:
-            return False
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
 
-    if is_jaeger_running():
-        print("Jaeger is already running, skipping docker compose start.")
-    else:
-        subprocess.run(["docker", "compose", "up", "-d"], check=True)
 
-        # Wait for Jaeger to be available
-        for _ in range(10):
-            if is_jaeger_running():
-                print("Docker compose started successfully.")
-                break
-            time.sleep(2)
-        else:
-            print("Docker compose did not start in time")
+@pytest.fixture
+def span_exporter():
+    return InMemorySpanExporter()
 
-    yield
 
-    # OpenTelemetry exports some additional traces after test suite completes
-    # To allow for that, adding a delay to make sure test container can consume it
-    print("Waiting for traces to be sent...")
-    time.sleep(7)
-    subprocess.run(["docker", "compose", "down"], check=True)
+@pytest.fixture
+def make_tracer():
+    """
+    Builds a tracer whose spans go through the given span processors, in order, e.g.
+        tracer = make_tracer(NPlusOneSpanProcessor(threshold=3), SimpleSpanProcessor(span_exporter))
+    """
+    tracer_providers = []
+
+    def make(*span_processors):
+        tracer_provider = TracerProvider(shutdown_on_exit=False)
+        for span_processor in span_processors:
+            tracer_provider.add_span_processor(span_processor)
+        tracer_providers.append(tracer_provider)
+        return tracer_provider.get_tracer(__name__)
+
+    yield make
+    for tracer_provider in tracer_providers:
+        tracer_provider.shutdown()
@@ -1,29 +1,72 @@
-import httpx
+"""
+This test verifies that FastAPI server spans include request and response details:
+    'http.request.headers' and 'http.request.body' in span.attributes
+    'http.response.headers' and 'http.response.body' in span.attributes
+    streamed response bodies are captured up to the body size cap
+"""
+
 import pytest
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
 from fastapi.testclient import TestClient
+from opentelemetry.trace import SpanKind
+
+from captureflow.body_capture import truncation_marker
+from captureflow.config import CF_BODY_MAX_BYTES
 
 app = FastAPI()
 
+STREAM_CHUNK = b"x" * 1024
+STREAM_CHUNKS = CF_BODY_MAX_BYTES // len(STREAM_CHUNK) + 4
+
+
+@app.post("/echo")
+async def echo(request: Request):
+    return {"received": await request.json()}
 
-@app.get("/external")
-async def call_external():
-    async with httpx.AsyncClient() as client:
-        response = await client.get("https://jsonplaceholder.typicode.com/posts/1")
-    return {"status_code": response.status_code, "body": response.json()}
+
+@app.get("/stream")
+async def stream():
+    async def chunks():
+        for _ in range(STREAM_CHUNKS):
+            yield STREAM_CHUNK
+
+    return StreamingResponse(chunks(), media_type="text/plain")
 
 
 @pytest.fixture(scope="module")
-def client():
+def client(span_exporter):
     with TestClient(app) as client:
         yield client
 
 
+def _server_spans(span_exporter, name):
+    return [span for span in span_exporter.get_finished_spans() if span.kind == SpanKind.SERVER and span.name == name]
+
+
 def test_fastapi_instrumentation(span_exporter, client):
-    # TODO, implement
-    # The challenge: fastapi.testclient is not a real ASGI app that gets instrumented by OTel-Contrib module, so we need to spawn real FastAPI app, yet we still need to access processed spans
-    # It's still testable by examples/server.py, but that's suboptimal DX
-    pass
+    # Raw bytes, httpx versions differ in how they serialize `json=`
+    response = client.post("/echo", content=b'{"id":1}', headers={"Content-Type": "application/json"})
+    assert response.status_code == 200
+
+    server_spans = _server_spans(span_exporter, "POST /echo")
+    assert len(server_spans) == 1, "Expected exactly one FastAPI server span"
+
+    server_span = server_spans[0]
+    assert server_span.attributes["http.status_code"] == 200
+    assert "application/json" in server_span.attributes["http.request.headers"]
+    assert server_span.attributes["http.request.body"] == '{"id":1}'
+    assert "http.response.headers" in server_span.attributes
+    assert server_span.attributes["http.response.body"] == '{"received":{"id":1}}'
+
+
+def test_fastapi_streaming_response_is_capped(span_exporter, client):
+    response = client.get("/stream")
+    assert len(response.content) == STREAM_CHUNKS * len(STREAM_CHUNK)
+
+    (server_span,) = _server_spans(span_exporter, "GET /stream")
+    dropped_bytes = STREAM_CHUNKS * len(STREAM_CHUNK) - CF_BODY_MAX_BYTES
+    assert server_span.attributes["http.response.body"] == "x" * CF_BODY_MAX_BYTES + truncation_marker(dropped_bytes)
 
 
 if __name__ == "__main__":
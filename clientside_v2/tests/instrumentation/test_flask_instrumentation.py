@@ -9,7 +9,8 @@ This test verifies that Flask request spans include request and response details
 
 import pytest
 import requests
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
+from opentelemetry.trace import SpanKind
 
 app = Flask(__name__)
 
@@ -20,6 +21,11 @@ def call_external():
     return jsonify({"status_code": response.status_code, "body": response.json()})
 
 
+@app.route("/echo", methods=["POST"])
+def echo():
+    return jsonify({"received": request.get_json()})
+
+
 @pytest.fixture(scope="module")
 def client():
     app.config["TESTING"] = True
@@ -34,7 +40,7 @@ def test_flask_instrumentation(span_exporter, client):
 
     # Retrieve the spans
     spans = span_exporter.get_finished_spans()
-    flask_spans = [span for span in spans if span.name.startswith("HTTP GET /external")]
+    flask_spans = [span for span in spans if span.kind == SpanKind.SERVER and span.name == "GET /external"]
 
     # Debug: Print all spans
     print("All spans:")
@@ -47,7 +53,7 @@ def test_flask_instrumentation(span_exporter, client):
 
     # Validate Flask span
     assert flask_span.attributes["http.method"] == "GET"
-    assert flask_span.attributes["http.url"].endswith("/external")
+    assert flask_span.attributes["http.target"] == "/external"
     assert "http.request.headers" in flask_span.attributes
     assert flask_span.attributes["http.status_code"] == 200
     assert "http.response.headers" in flask_span.attributes
@@ -58,5 +64,24 @@ def test_flask_instrumentation(span_exporter, client):
     assert "body" in response_body
 
 
+def test_flask_body_capture_reuses_server_span(span_exporter, client):
+    for i in range(3):
+        response = client.post("/echo", json={"id": i})
+        assert response.status_code == 200
+
+    server_spans = [
+        span
+        for span in span_exporter.get_finished_spans()
+        if span.kind == SpanKind.SERVER and span.name == "POST /echo"
+    ]
+    assert len(server_spans) == 3
+    assert server_spans[-1].attributes["http.request.body"] == '{"id": 2}'
+    assert '"received":{"id":2}' in server_spans[-1].attributes["http.response.body"]
+
+    # Hooks are registered once per app, not once per request
+    assert len(app.after_request_funcs[None]) == 1
+    assert not app.before_request_funcs.get(None, [])[1:]
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
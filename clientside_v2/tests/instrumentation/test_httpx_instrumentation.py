@@ -7,6 +7,8 @@ This test verifies that HTTPX request spans include request and response details
     'http.response.body' in span.attributes
 """
 
+import gzip
+
 import httpx
 import pytest
 from fastapi import FastAPI
@@ -63,8 +65,48 @@ def test_httpx_instrumentation(span_exporter):
     assert "body" in response_body
 
 
-if __name__ == "__main__":
-    pytest.main([__file__])
+def test_httpx_streamed_response_is_not_pre_read(span_exporter):
+    body = b'{"items": "' + b"x" * 100_000 + b'"}'
+    chunks_read = []
+
+    def chunks():
+        for i in range(0, len(body), 10_000):
+            chunks_read.append(i)
+            yield body[i : i + 10_000]
+
+    transport = httpx.MockTransport(
+        lambda request: httpx.Response(200, headers={"Content-Type": "application/json"}, content=chunks())
+    )
+    with httpx.Client(transport=transport) as client:
+        with client.stream("GET", "http://testserver/large") as response:
+            # Nothing is read and the span is still open until the caller consumes the stream
+            assert chunks_read == []
+            assert span_exporter.get_finished_spans() == ()
+            streamed = b"".join(response.iter_bytes())
+
+    assert streamed == body
+    spans = span_exporter.get_finished_spans()
+    assert len(spans) == 1
+    captured = spans[0].attributes["http.response.body"]
+    assert captured.startswith('{"items": "xxx')
+    assert captured.endswith("bytes]")
+    assert len(captured) < 20_000
+
+
+def test_httpx_gzip_response_body_is_decoded(span_exporter):
+    transport = httpx.MockTransport(
+        lambda request: httpx.Response(
+            200,
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+            content=gzip.compress(b'{"id": 1}'),
+        )
+    )
+    with httpx.Client(transport=transport) as client:
+        assert client.get("http://testserver/item").json() == {"id": 1}
+
+    spans = span_exporter.get_finished_spans()
+    assert len(spans) == 1
+    assert spans[0].attributes["http.response.body"] == '{"id": 1}'
 
 
 if __name__ == "__main__":
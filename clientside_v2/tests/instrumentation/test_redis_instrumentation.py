@@ -2,8 +2,12 @@
 This test verifies that Redis spans include command and arguments:
     'redis.command' in span.attributes
     'redis.command.args' in span.attributes
+    replies are capped, pipelines list each command with its reply, latencies are aggregated per command
 """
 
+import json
+
+import fakeredis
 import pytest
 import redis
 from fastapi import FastAPI
@@ -74,5 +78,51 @@ def test_redis_instrumentation(span_exporter):
     assert get_span.attributes["redis.response"] == "b'test_value'"
 
 
+def _redis_spans(span_exporter, name):
+    return [span for span in span_exporter.get_finished_spans() if span.name == name]
+
+
+def test_redis_reply_is_capped(span_exporter):
+    from captureflow.config import CF_REDIS_MAX_ITEMS
+
+    client = fakeredis.FakeRedis()
+    client.rpush("capped_list", *range(CF_REDIS_MAX_ITEMS + 30))
+    assert len(client.lrange("capped_list", 0, -1)) == CF_REDIS_MAX_ITEMS + 30
+
+    (lrange_span,) = _redis_spans(span_exporter, "LRANGE")
+    assert lrange_span.attributes["redis.command"] == "LRANGE"
+    assert lrange_span.attributes["redis.command.args"] == "('capped_list', 0, -1)"
+    assert lrange_span.attributes["redis.response"].endswith("...[30 more items]")
+
+
+def test_redis_pipeline_commands(span_exporter):
+    client = fakeredis.FakeRedis()
+    with client.pipeline() as pipeline:
+        pipeline.set("pipeline_key", "1").incr("pipeline_key").get("pipeline_key")
+        assert pipeline.execute() == [True, 2, b"2"]
+
+    (pipeline_span,) = _redis_spans(span_exporter, "SET INCRBY GET")
+    assert pipeline_span.attributes["redis.pipeline.transaction"] is True
+    assert json.loads(pipeline_span.attributes["redis.pipeline.commands"]) == [
+        {"command": "SET", "args": "('pipeline_key', '1')", "response": "True"},
+        {"command": "INCRBY", "args": "('pipeline_key', 1)", "response": "2"},
+        {"command": "GET", "args": "('pipeline_key',)", "response": "b'2'"},
+    ]
+
+
+def test_redis_latency_is_aggregated_per_command(span_exporter):
+    from captureflow.redis_capture import redis_stats
+
+    redis_stats.flush()
+    client = fakeredis.FakeRedis()
+    for _ in range(5):
+        client.get("missing_key")
+    redis_stats.flush()
+
+    (summary_span,) = _redis_spans(span_exporter, "Redis summary: GET")
+    assert summary_span.attributes["db.system"] == "redis"
+    assert summary_span.attributes["db.query.count"] == 5
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
@@ -10,6 +10,7 @@ This test verifies that SQLAlchemy query spans include execution and result deta
 
 import json
 import os
+from unittest import mock
 
 import pytest
 from fastapi import FastAPI
@@ -21,6 +22,7 @@ from sqlalchemy import Column, Integer, String, create_engine, text
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from captureflow.distro import CaptureFlowDistro
+from captureflow.query_stats import query_stats
 
 # SQLAlchemy setup
 Base = declarative_base()
@@ -114,3 +116,55 @@ def test_sqlalchemy_instrumentation(engine, client, span_exporter):
     assert "users_id" in result_data[0]  # For some reason SQLAlchemy does "SELECT users.id AS users_id"
     assert "users_name" in result_data[0]  # # For some reason SQLAlchemy does "SELECT users.name AS users_name"
     assert result_data[0]["users_name"] == "Test User"
+
+
+def test_sqlalchemy_select_is_executed_once(span_exporter):
+    sqlite_engine = create_engine("sqlite://")
+    setup_database(sqlite_engine)
+    with sqlite_engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (name) VALUES ('a'), ('b'), ('c')"))
+
+    executed = []
+    span_exporter.clear()
+
+    with sqlite_engine.connect() as conn:
+        conn.connection.driver_connection.set_trace_callback(executed.append)
+        result = conn.execute(text("SELECT id, name FROM users ORDER BY id"))
+        # The span stays open until the application has consumed the result
+        assert not [span for span in span_exporter.get_finished_spans() if span.name == "SQLAlchemy: SELECT"]
+        rows = result.fetchall()
+
+    assert [row.name for row in rows] == ["a", "b", "c"]
+    assert len([statement for statement in executed if statement.startswith("SELECT")]) == 1
+
+    select_span = next(span for span in span_exporter.get_finished_spans() if span.name == "SQLAlchemy: SELECT")
+    assert select_span.attributes["db.result_columns"] == str(["id", "name"])
+    assert eval(select_span.attributes["db.result_data"]) == [
+        {"id": 1, "name": "a"},
+        {"id": 2, "name": "b"},
+        {"id": 3, "name": "c"},
+    ]
+
+
+def test_sqlalchemy_queries_are_aggregated_without_spans(span_exporter):
+    sqlite_engine = create_engine("sqlite://")
+    setup_database(sqlite_engine)
+    query_stats.flush()
+    span_exporter.clear()
+
+    with mock.patch("captureflow.instrumentation.CF_SQL_SPAN_SAMPLE_RATE", 0.0):
+        with sqlite_engine.begin() as conn:
+            for name in ("a", "b", "c"):
+                conn.execute(text(f"INSERT INTO users (name) VALUES ('{name}')"))
+            assert len(conn.execute(text("SELECT id, name FROM users")).fetchall()) == 3
+
+    assert not [span for span in span_exporter.get_finished_spans() if span.name.startswith("SQLAlchemy")]
+
+    query_stats.flush()
+    summaries = {
+        span.attributes["db.statement.fingerprint"]: span
+        for span in span_exporter.get_finished_spans()
+        if span.name.startswith("SQL summary")
+    }
+    assert summaries["INSERT INTO users (name) VALUES (?)"].attributes["db.query.count"] == 3
+    assert summaries["SELECT id, name FROM users"].attributes["db.query.rows"] == 3
@@ -0,0 +1,106 @@
+"""
+This test verifies that sqlite3 query spans include execution and result details:
+    'db.system' in span.attributes
+    'db.statement' in span.attributes
+    'db.parameters' in span.attributes
+    'db.row_count' in span.attributes
+    'db.result_columns' in span.attributes (for SELECT queries)
+    'db.result_data' in span.attributes (for SELECT queries)
+"""
+
+import sqlite3
+import types
+
+import pytest
+from opentelemetry import trace
+from sqlalchemy import create_engine, text
+
+from captureflow.dbapi import instrument_dbapi_module
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE transactions (id INTEGER PRIMARY KEY, company_id TEXT, amount REAL)")
+    conn.executemany(
+        "INSERT INTO transactions (company_id, amount) VALUES (?, ?)",
+        [("company456", 100.0), ("company456", 50.0), ("other", 10.0)],
+    )
+    yield conn
+    conn.close()
+
+
+def get_spans(span_exporter, name):
+    return [span for span in span_exporter.get_finished_spans() if span.name == name]
+
+
+def test_sqlite3_instrumentation(span_exporter, conn):
+    assert isinstance(conn, sqlite3.Connection)
+    span_exporter.clear()
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, amount FROM transactions WHERE company_id = ? ORDER BY id", ("company456",))
+    # The span ends once the application has read the whole result
+    assert get_spans(span_exporter, "sqlite3: SELECT") == []
+    assert cursor.fetchall() == [(1, 100.0), (2, 50.0)]
+
+    (select_span,) = get_spans(span_exporter, "sqlite3: SELECT")
+    assert select_span.attributes["db.system"] == "sqlite"
+    assert select_span.attributes["db.statement"].startswith("SELECT id, amount FROM transactions")
+    assert select_span.attributes["db.statement.fingerprint"] == (
+        "SELECT id, amount FROM transactions WHERE company_id = ? ORDER BY id"
+    )
+    assert select_span.attributes["db.parameters"] == "('company456',)"
+    assert "db.row_count" in select_span.attributes
+    assert select_span.attributes["db.result_columns"] == str(["id", "amount"])
+    assert eval(select_span.attributes["db.result_data"]) == [{"id": 1, "amount": 100.0}, {"id": 2, "amount": 50.0}]
+
+
+def test_sqlite3_connection_shortcuts_are_traced(span_exporter, conn):
+    span_exporter.clear()
+
+    conn.execute("UPDATE transactions SET amount = amount * 2 WHERE company_id = ?", ("other",))
+    assert [row[0] for row in conn.execute("SELECT amount FROM transactions WHERE company_id = 'other'")] == [20.0]
+
+    (update_span,) = get_spans(span_exporter, "sqlite3: UPDATE")
+    assert update_span.attributes["db.row_count"] == 1
+    (select_span,) = get_spans(span_exporter, "sqlite3: SELECT")
+    assert eval(select_span.attributes["db.result_data"]) == [{"amount": 20.0}]
+
+
+def test_sqlite3_query_error_ends_span(span_exporter, conn):
+    span_exporter.clear()
+
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("SELECT * FROM missing_table")
+
+    (select_span,) = get_spans(span_exporter, "sqlite3: SELECT")
+    assert select_span.status.status_code is trace.StatusCode.ERROR
+
+
+def test_sqlalchemy_queries_are_not_traced_twice(span_exporter):
+    engine = create_engine("sqlite://")
+    span_exporter.clear()
+
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT 1")).scalar() == 1
+
+    assert get_spans(span_exporter, "SQLAlchemy: SELECT")
+    assert not [span for span in span_exporter.get_finished_spans() if span.name.startswith("sqlite3")]
+
+
+def test_dbapi_module_proxies(span_exporter):
+    # Any DB-API 2.0 module, sqlite3's unpatched connect() stands in for a third-party driver here
+    driver = types.ModuleType("fakedriver")
+    driver.connect = sqlite3.connect._captureflow_original
+    instrument_dbapi_module(driver, trace.get_tracer(__name__))
+    span_exporter.clear()
+
+    with driver.connect(":memory:") as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT ? AS answer", (42,))
+        assert list(cursor) == [(42,)]
+
+    (select_span,) = get_spans(span_exporter, "fakedriver: SELECT")
+    assert select_span.attributes["db.system"] == "fakedriver"
+    assert eval(select_span.attributes["db.result_data"]) == [{"answer": 42}]
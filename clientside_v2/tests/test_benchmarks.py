@@ -0,0 +1,41 @@
+"""
+This test verifies that every benchmark scenario runs against its in-process stand-in and produces a result row,
+uninstrumented in this process and with the CaptureFlow distro in the child interpreters `python -m benchmarks` uses.
+"""
+
+import pytest
+
+from benchmarks.__main__ import MODES, format_table, measure, run
+from benchmarks.scenarios import SCENARIOS
+
+
+@pytest.mark.parametrize("name", list(SCENARIOS))
+def test_scenario_runs(name):
+    result = measure(name, instrumented=False, iterations=2)
+
+    assert result["scenario"] == name
+    assert result["mode"] == "baseline"
+    assert result["us_per_op"] > 0
+    assert result["peak_bytes_per_op"] > 0
+
+
+def test_both_modes_run_in_child_interpreters():
+    # The distro is configured globally, so only the children the benchmark spawns ever load it
+    results = run(list(SCENARIOS), iterations=2)
+
+    assert sorted((result["scenario"], result["mode"]) for result in results) == sorted(
+        (name, mode) for name in SCENARIOS for mode in MODES
+    )
+    assert all(result["us_per_op"] > 0 for result in results)
+    assert len(format_table(results).splitlines()) == len(SCENARIOS) + 1
+
+
+def test_format_table():
+    results = [
+        {"scenario": "redis", "mode": mode, "us_per_op": us, "peak_bytes_per_op": 2048, "retained_bytes_per_op": 10}
+        for mode, us in (("baseline", 100.0), ("captureflow", 150.0))
+    ]
+
+    header, row = format_table(results).splitlines()
+    assert header.split()[0] == "scenario"
+    assert row.split() == ["redis", "100.0", "150.0", "1.50x", "2.0", "2.0", "10"]
@@ -0,0 +1,70 @@
+"""
+This test verifies the body capture policy shared by all HTTP instrumentations:
+    bodies are cut to a byte budget and end with a truncation marker
+    binary bodies and denied content types are not recorded as text
+"""
+
+from captureflow.body_capture import (
+    BodyBuffer,
+    binary_marker,
+    capture_body,
+    is_capturable_content_type,
+    truncation_marker,
+)
+
+
+def test_small_body_is_captured_as_is():
+    assert capture_body(b'{"id": 1}', content_type="application/json") == '{"id": 1}'
+    assert capture_body("plain text") == "plain text"
+
+
+def test_empty_body_is_not_captured():
+    assert capture_body(b"") is None
+    assert capture_body(None) is None
+
+
+def test_large_body_is_truncated():
+    body = b"a" * 1000
+    assert capture_body(body, max_bytes=100) == "a" * 100 + truncation_marker(900)
+
+
+def test_pre_truncated_body_reports_total_size():
+    assert capture_body(b"a" * 10, total_bytes=50, max_bytes=10) == "a" * 10 + truncation_marker(40)
+
+
+def test_large_string_is_truncated():
+    body = "é" * 100  # 2 bytes per character in UTF-8
+    captured = capture_body(body, max_bytes=51)
+    # The cut lands inside a character, only whole characters are kept
+    assert captured == "é" * 25 + truncation_marker(149)
+
+
+def test_multibyte_character_cut_by_truncation():
+    body = ("ü" * 10).encode("utf-8")
+    assert capture_body(body, max_bytes=5) == "üü" + truncation_marker(15)
+
+
+def test_binary_body_is_replaced_by_marker():
+    body = b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR" + b"\xff" * 100
+    assert capture_body(body) == binary_marker(len(body))
+    assert capture_body(b"\xff\xfe\xfa invalid utf-8") == binary_marker(17)
+
+
+def test_content_type_deny_list():
+    assert not is_capturable_content_type("image/png")
+    assert not is_capturable_content_type("application/octet-stream")
+    assert is_capturable_content_type("application/json; charset=utf-8")
+    assert is_capturable_content_type(None)
+    assert capture_body(b"GIF89a", content_type="image/gif") is None
+
+
+def test_declared_encoding_is_used():
+    assert capture_body("café".encode("latin-1"), encoding="latin-1") == "café"
+
+
+def test_body_buffer_keeps_head_of_chunked_body():
+    buffer = BodyBuffer(max_bytes=10)
+    for chunk in (b"abcdef", b"ghijkl", b"mnop"):
+        buffer.write(chunk)
+    assert buffer.total_bytes == 16
+    assert buffer.capture("text/plain") == "abcdefghij" + truncation_marker(6)
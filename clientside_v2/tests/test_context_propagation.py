@@ -0,0 +1,91 @@
+"""
+This test verifies that spans started in thread pool workers keep their parent:
+    ThreadPoolExecutor.submit and loop.run_in_executor carry the submitter's context
+    waiting for a free worker is recorded as an "executor queue wait" span
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from captureflow.context_propagation import instrument_thread_pools
+
+
+@pytest.fixture
+def tracer_and_exporter():
+    span_exporter = InMemorySpanExporter()
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(SimpleSpanProcessor(span_exporter))
+    tracer = tracer_provider.get_tracer(__name__)
+    instrument_thread_pools(tracer, min_queue_wait_ms=0)
+    return tracer, span_exporter
+
+
+def _spans_by_name(span_exporter):
+    return {span.name: span for span in span_exporter.get_finished_spans()}
+
+
+def test_submit_carries_context(tracer_and_exporter):
+    tracer, span_exporter = tracer_and_exporter
+
+    def work():
+        with tracer.start_as_current_span("work"):
+            pass
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        with tracer.start_as_current_span("request"):
+            executor.submit(work).result()
+
+    spans = _spans_by_name(span_exporter)
+    assert spans["work"].parent.span_id == spans["request"].context.span_id
+    assert spans["executor queue wait"].parent.span_id == spans["request"].context.span_id
+
+
+def test_run_in_executor_carries_context(tracer_and_exporter):
+    tracer, span_exporter = tracer_and_exporter
+
+    def work():
+        with tracer.start_as_current_span("work"):
+            pass
+
+    async def handler():
+        with tracer.start_as_current_span("request"):
+            await asyncio.get_running_loop().run_in_executor(None, work)
+
+    asyncio.run(handler())
+
+    spans = _spans_by_name(span_exporter)
+    assert spans["work"].parent.span_id == spans["request"].context.span_id
+
+
+def test_queue_wait_is_measured(tracer_and_exporter):
+    tracer, span_exporter = tracer_and_exporter
+    release = threading.Event()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with tracer.start_as_current_span("request"):
+            blocker = executor.submit(release.wait)
+            queued = executor.submit(lambda: None)
+            threading.Timer(0.05, release.set).start()
+            blocker.result()
+            queued.result()
+
+    queue_waits = [span for span in span_exporter.get_finished_spans() if span.name == "executor queue wait"]
+    assert len(queue_waits) == 2
+    longest = max(queue_waits, key=lambda span: span.attributes["executor.queue_wait_ms"])
+    assert longest.attributes["executor.queue_wait_ms"] >= 40
+    assert longest.attributes["executor.class"] == "ThreadPoolExecutor"
+
+
+def test_untraced_submissions_record_no_queue_wait(tracer_and_exporter):
+    _, span_exporter = tracer_and_exporter
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert executor.submit(lambda: 42).result() == 42
+
+    assert not span_exporter.get_finished_spans()
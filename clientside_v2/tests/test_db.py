@@ -0,0 +1,92 @@
+"""
+This test verifies statement analysis shared by the database instrumentations:
+    statement type and span name, with and without the keyword fast path
+    fingerprints that ignore literal values
+    one analysis per distinct statement text
+    result and parameter capture bounded by row, value length and byte caps
+"""
+
+from unittest import mock
+
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from captureflow import db
+from captureflow.body_capture import truncation_marker
+from captureflow.db import (
+    ResultCapture,
+    analyze_statement,
+    fingerprint_statement,
+    format_parameters,
+)
+
+
+def test_simple_statement_skips_parsing():
+    analyze_statement.cache_clear()
+    with mock.patch.object(db.sqlparse, "parse") as parse:
+        info = analyze_statement("SELECT id FROM users WHERE id = 1", "SQLAlchemy")
+    parse.assert_not_called()
+    assert info.statement_type == "SELECT"
+    assert info.span_name == "SQLAlchemy: SELECT"
+
+
+def test_cte_statement_is_parsed():
+    info = analyze_statement("WITH recent AS (SELECT id FROM users) SELECT * FROM recent", "SQLAlchemy")
+    assert info.statement_type == "SELECT"
+    assert info.span_name == "SQLAlchemy: SELECT"
+
+
+def test_fingerprint_strips_literals():
+    assert fingerprint_statement("SELECT * FROM users WHERE name = 'O''Brien' AND age > 30") == (
+        "SELECT * FROM users WHERE name = ? AND age > ?"
+    )
+    assert fingerprint_statement("SELECT * FROM users WHERE id IN (1, 2,  3)") == fingerprint_statement(
+        "SELECT * FROM users\n WHERE id IN (4) -- comment"
+    )
+    assert fingerprint_statement("SELECT * FROM table1") == "SELECT * FROM table1"
+
+
+def test_statement_is_analyzed_once():
+    analyze_statement.cache_clear()
+    for _ in range(100):
+        analyze_statement("UPDATE users SET name = ? WHERE id = ?", "SQLAlchemy")
+    assert analyze_statement.cache_info().misses == 1
+
+
+def capture_result(rows, **caps):
+    span_exporter = InMemorySpanExporter()
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(SimpleSpanProcessor(span_exporter))
+    span = tracer_provider.get_tracer(__name__).start_span("SELECT")
+
+    result = ResultCapture(span, [("id",), ("payload",)], **caps)
+    result.add(rows)
+    result.finish()
+    (finished_span,) = span_exporter.get_finished_spans()
+    return finished_span.attributes
+
+
+def test_result_rows_are_capped_with_summary():
+    attributes = capture_result([(i, "x") for i in range(50_000)], max_rows=2)
+    assert eval(attributes["db.result_data"]) == [{"id": 0, "payload": "x"}, {"id": 1, "payload": "x"}]
+    assert attributes["db.result.rows_total"] == 50_000
+    assert attributes["db.result.rows_captured"] == 2
+
+
+def test_result_values_are_cut():
+    attributes = capture_result([(1, "y" * 1000)], max_value_length=10)
+    assert attributes["db.result_data"] == "[{'id': 1, 'payload': 'yyyyyyyyyy'" + truncation_marker(990) + "}]"
+    assert attributes["db.result.values_truncated"] == 1
+    assert attributes["db.result.bytes_dropped"] == 990
+    assert "db.result.rows_captured" not in attributes
+
+
+def test_parameters_are_capped():
+    assert format_parameters(("company456",)) == "('company456',)"
+    assert format_parameters({"name": "z" * 20}, max_length=5) == "{'name': 'zzzzz'" + truncation_marker(15) + "}"
+
+    executemany = [(i,) for i in range(db.MAX_PARAMETER_SETS + 5)]
+    full = format_parameters(executemany, max_bytes=1_000_000)
+    assert full.endswith("(99,)]...[5 more items]")
+    assert format_parameters(executemany, max_bytes=12) == full[:12] + truncation_marker(len(full) - 12)
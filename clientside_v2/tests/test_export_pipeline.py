@@ -0,0 +1,82 @@
+"""
+This test verifies that the export pipeline reports backpressure:
+dropped spans and queue fill level on MonitoredBatchSpanProcessor, export latency on MonitoredSpanExporter.
+"""
+
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SpanExportResult
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from captureflow.exporters import MonitoredBatchSpanProcessor, MonitoredSpanExporter
+
+
+class BlockingSpanExporter(InMemorySpanExporter):
+    def __init__(self):
+        super().__init__()
+        self.export_started = threading.Event()
+        self.release = threading.Event()
+
+    def export(self, spans):
+        self.export_started.set()
+        self.release.wait(timeout=10)
+        return super().export(spans)
+
+
+def test_dropped_spans_and_queue_size_are_reported(caplog):
+    span_exporter = BlockingSpanExporter()
+    monitored_exporter = MonitoredSpanExporter(span_exporter)
+    span_processor = MonitoredBatchSpanProcessor(
+        monitored_exporter, max_queue_size=2, max_export_batch_size=2, schedule_delay_millis=60_000
+    )
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(span_processor)
+    tracer = tracer_provider.get_tracer(__name__)
+
+    # First batch is picked up by the worker, which then blocks inside export()
+    for _ in range(2):
+        tracer.start_span("batched").end()
+    assert span_exporter.export_started.wait(timeout=10)
+
+    for _ in range(5):
+        tracer.start_span("queued").end()
+
+    assert span_processor.queue_size() == 2
+    assert span_processor.dropped_spans == 3
+    # Logged without metrics enabled, once per interval rather than once per span
+    warnings = [record for record in caplog.records if record.name == "captureflow.exporters"]
+    assert [record.getMessage() for record in warnings] == [
+        "Span export queue is full (2 spans), 1 spans dropped so far"
+    ]
+
+    span_exporter.release.set()
+    tracer_provider.shutdown()
+
+    assert len(span_exporter.get_finished_spans()) == 4
+    assert monitored_exporter.last_export_duration_ms > 0
+
+
+def test_export_result_is_passed_through():
+    monitored_exporter = MonitoredSpanExporter(InMemorySpanExporter())
+    assert monitored_exporter.export([]) is SpanExportResult.SUCCESS
+
+
+def test_unsupported_compression_is_rejected_at_startup():
+    result = subprocess.run(
+        [sys.executable, "-c", "import captureflow.config"],
+        env={**os.environ, "CF_OTLP_COMPRESSION": "brotli"},
+        stderr=subprocess.PIPE,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode != 0
+    assert "ValueError: Unsupported CF_OTLP_COMPRESSION: 'brotli'" in result.stderr
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
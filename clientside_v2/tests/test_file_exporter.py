@@ -0,0 +1,173 @@
+"""
+This test verifies that FileSpanExporter writes complete, readable span files in both formats,
+rotates and prunes them, and that `upload_span_files` sends them in order.
+"""
+
+import gzip
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+
+from captureflow.file_exporter import (
+    PART_SUFFIX,
+    FileSpanExporter,
+    complete_span_files,
+    read_span_file,
+)
+from captureflow.upload import upload_span_files
+
+
+def _write_spans(exporter, names):
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(SimpleSpanProcessor(exporter))
+    tracer = tracer_provider.get_tracer(__name__)
+    spans = []
+    for name in names:
+        with tracer.start_as_current_span(name, attributes={"http.route": f"/{name}"}) as span:
+            spans.append(span)
+    return tracer_provider, spans
+
+
+def _span_names(requests):
+    return [
+        span.name
+        for request in requests
+        for resource_spans in request.resource_spans
+        for scope_spans in resource_spans.scope_spans
+        for span in scope_spans.spans
+    ]
+
+
+@pytest.mark.parametrize("file_format", ["json", "protobuf"])
+def test_spans_round_trip(tmp_path, file_format):
+    exporter = FileSpanExporter(tmp_path, file_format=file_format)
+    tracer_provider, spans = _write_spans(exporter, ["first", "second"])
+
+    # The file being written is not visible to readers
+    assert complete_span_files(tmp_path) == []
+    assert len(list(tmp_path.glob(f"*{PART_SUFFIX}"))) == 1
+
+    tracer_provider.shutdown()
+    (path,) = complete_span_files(tmp_path)
+    requests = list(read_span_file(path))
+
+    assert _span_names(requests) == ["first", "second"]
+    span = requests[0].resource_spans[0].scope_spans[0].spans[0]
+    assert span.trace_id == spans[0].get_span_context().trace_id.to_bytes(16, "big")
+    assert span.attributes[0].key == "http.route"
+    assert span.attributes[0].value.string_value == "/first"
+
+
+def test_json_records_use_hex_ids(tmp_path):
+    exporter = FileSpanExporter(tmp_path, file_format="json")
+    tracer_provider, spans = _write_spans(exporter, ["only"])
+    tracer_provider.shutdown()
+
+    (path,) = complete_span_files(tmp_path)
+    record = json.loads(gzip.open(path).readline())
+    span = record["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert span["traceId"] == format(spans[0].get_span_context().trace_id, "032x")
+    assert span["spanId"] == format(spans[0].get_span_context().span_id, "016x")
+
+
+def test_files_are_rotated_and_pruned(tmp_path):
+    exporter = FileSpanExporter(tmp_path, max_bytes=1, max_files=3)
+    tracer_provider, _ = _write_spans(exporter, [f"span-{i}" for i in range(5)])
+    tracer_provider.shutdown()
+
+    paths = complete_span_files(tmp_path)
+    assert len(paths) == 3
+    assert [_span_names(read_span_file(path)) for path in paths] == [["span-2"], ["span-3"], ["span-4"]]
+
+
+def test_export_after_shutdown_fails(tmp_path):
+    exporter = FileSpanExporter(tmp_path)
+    tracer_provider, _ = _write_spans(exporter, ["before"])
+    tracer_provider.shutdown()
+
+    assert exporter.export([]).name == "FAILURE"
+    assert len(complete_span_files(tmp_path)) == 1
+
+
+def test_unsupported_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        FileSpanExporter(tmp_path, file_format="xml")
+
+
+def test_upload_sends_files_oldest_first(tmp_path):
+    exporter = FileSpanExporter(tmp_path, max_bytes=1)
+    tracer_provider, _ = _write_spans(exporter, ["a", "b"])
+    _write_spans(FileSpanExporter(tmp_path, file_format="protobuf"), ["c"])[0].shutdown()
+    tracer_provider.shutdown()
+
+    sent = []
+    assert upload_span_files(tmp_path, send=sent.append) == 3
+    assert _span_names(sent) == ["a", "b", "c"]
+    assert complete_span_files(tmp_path) == []
+
+
+def test_failed_upload_keeps_file(tmp_path):
+    exporter = FileSpanExporter(tmp_path)
+    _write_spans(exporter, ["kept"])[0].shutdown()
+
+    def send(request):
+        raise ConnectionError("collector unreachable")
+
+    with pytest.raises(ConnectionError):
+        upload_span_files(tmp_path, send=send)
+    assert len(complete_span_files(tmp_path)) == 1
+
+
+@pytest.fixture
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", ""])
+    process.wait()
+    return process.pid
+
+
+def _crashed_writer_file(directory, file_format, pid):
+    """Copy of a ".part" file as a process killed mid-write leaves it: no gzip trailer, last record cut short."""
+    with tempfile.TemporaryDirectory() as scratch:
+        exporter = FileSpanExporter(scratch, file_format=file_format)
+        tracer_provider, _ = _write_spans(exporter, ["first", "second"])
+        exporter._file.write(b'{"resourceSpans":[' if file_format == "json" else b"\x64" + b"\x0a" * 10)
+        exporter._file.flush()
+        name = exporter._path.name.replace(f"-{os.getpid()}-", f"-{pid}-")
+        (Path(directory) / name).write_bytes(exporter._path.read_bytes())
+        tracer_provider.shutdown()
+    return Path(directory) / name
+
+
+@pytest.mark.parametrize("file_format", ["json", "protobuf"])
+def test_orphaned_part_file_is_finalized_and_uploaded(tmp_path, dead_pid, file_format):
+    orphan = _crashed_writer_file(tmp_path, file_format, dead_pid)
+    assert orphan.name.endswith(PART_SUFFIX)
+
+    sent = []
+    assert upload_span_files(tmp_path, send=sent.append) == 1
+    assert _span_names(sent) == ["first", "second"]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_orphaned_part_files_are_finalized_and_pruned_on_open(tmp_path, dead_pid):
+    orphans = [_crashed_writer_file(tmp_path, "json", dead_pid) for _ in range(2)]
+    # Our pid, but written by an earlier process, pids repeat across container restarts
+    orphans.append(_crashed_writer_file(tmp_path, "json", os.getpid()))
+    running_provider, _ = _write_spans(FileSpanExporter(tmp_path), ["running"])
+
+    exporter = FileSpanExporter(tmp_path, max_files=2)
+    _write_spans(exporter, ["new"])[0].shutdown()
+
+    # The newest orphan and the new file are kept, the file still being written is left alone
+    paths = complete_span_files(tmp_path)
+    assert paths[0].name == orphans[-1].name[: -len(PART_SUFFIX)]
+    assert _span_names(read_span_file(paths[1])) == ["new"]
+    assert len(list(tmp_path.glob(f"*{PART_SUFFIX}"))) == 1
+    running_provider.shutdown()
@@ -0,0 +1,119 @@
+"""
+This test verifies that exporters built by CaptureFlow are rebuilt in forked worker processes
+(e.g. `gunicorn --preload`), instead of reusing channels inherited from the parent, and that fork() waits for
+queued spans only up to CF_FORK_FLUSH_TIMEOUT_MILLIS.
+
+Forking tests run in fresh interpreters, fork handlers of the providers other tests configure would run otherwise.
+"""
+
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from captureflow.exporters import MonitoredBatchSpanProcessor
+
+REBUILD_SCRIPT = textwrap.dedent("""
+    import os
+
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    from captureflow.exporters import ForkSafeSpanExporter
+
+    built_exporters = []
+
+    def exporter_factory():
+        built_exporters.append(InMemorySpanExporter())
+        return built_exporters[-1]
+
+    exporter = ForkSafeSpanExporter(exporter_factory)
+    assert exporter._exporter is built_exporters[0]
+
+    pid = os.fork()
+    if pid == 0:
+        rebuilt = len(built_exporters) == 2 and exporter._exporter is built_exporters[1]
+        os._exit(0 if rebuilt else 1)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+
+    # Parent keeps its original exporter
+    assert exporter._exporter is built_exporters[0]
+    """)
+
+BOUNDED_FORK_SCRIPT = textwrap.dedent("""
+    import os
+    import time
+
+    from opentelemetry.trace import get_tracer
+
+    from captureflow.distro import CaptureFlowDistro
+
+    CaptureFlowDistro()._configure()
+    with get_tracer(__name__).start_as_current_span("queued"):
+        pass
+
+    start = time.monotonic()
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0)
+    elapsed = time.monotonic() - start
+    os.waitpid(pid, 0)
+    print(elapsed)
+    os._exit(0)  # Skip the exit-time flush, only fork() is measured
+    """)
+
+
+def _run(script: str, **env) -> str:
+    process = subprocess.Popen(
+        [sys.executable, "-c", script],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        env={**os.environ, "CF_METRICS": "false", **env},
+    )
+    try:
+        stdout, stderr = process.communicate(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        _, stderr = process.communicate()
+        pytest.fail(f"forking interpreter did not exit within 60s:\n{stderr}")
+    assert process.returncode == 0, stderr
+    return stdout
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="fork() is not available")
+def test_exporter_is_rebuilt_in_forked_child():
+    _run(REBUILD_SCRIPT)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="fork() is not available")
+def test_fork_is_bounded_when_collector_is_down():
+    stdout = _run(
+        BOUNDED_FORK_SCRIPT,
+        # Nothing listens there, every export attempt is refused and retried
+        CF_OTLP_ENDPOINT="http://127.0.0.1:9",
+        CF_FORK_FLUSH_TIMEOUT_MILLIS="300",
+    )
+    assert float(stdout) < 3
+
+
+def test_fork_flush_is_skipped_when_queue_is_empty(monkeypatch):
+    processor = MonitoredBatchSpanProcessor(InMemorySpanExporter(), max_queue_size=512, fork_flush_timeout_millis=50)
+    flushes = []
+    monkeypatch.setattr(processor, "force_flush", lambda timeout_millis: flushes.append(timeout_millis))
+
+    processor._flush_before_fork()
+    assert flushes == []
+
+    monkeypatch.setattr(processor, "queue_size", lambda: 1)
+    processor._flush_before_fork()
+    assert flushes == [50]
+    processor.shutdown()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
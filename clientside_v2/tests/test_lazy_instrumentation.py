@@ -0,0 +1,46 @@
+"""
+This test verifies that libraries are instrumented when they are first imported, not when the distro starts:
+    configuring CaptureFlowDistro imports none of the instrumented libraries
+    importing one of them afterwards installs its instrumentation
+"""
+
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+SCRIPT = textwrap.dedent("""
+    import sys
+
+    from captureflow.distro import CaptureFlowDistro
+    from captureflow.instrumentation import INSTRUMENTATIONS
+
+    CaptureFlowDistro()._configure()
+    eager = [name for name, _ in INSTRUMENTATIONS if name in sys.modules]
+    assert not eager, eager
+    assert "sqlparse" not in sys.modules
+
+    import httpx
+
+    assert hasattr(httpx.Client._init_transport, "_captureflow_original")
+    print("ok")
+    """)
+
+
+def test_libraries_are_instrumented_on_first_import(tmp_path):
+    # A fresh interpreter, the test process has all of these libraries imported already.
+    # Nothing is exported over the network, so the child exits as soon as the script is done
+    env = {**os.environ, "CF_METRICS": "false", "CF_TRACES_EXPORTER": "file", "CF_FILE_EXPORT_DIR": str(tmp_path)}
+    process = subprocess.Popen(
+        [sys.executable, "-c", SCRIPT], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env
+    )
+    try:
+        stdout, stderr = process.communicate(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        _, stderr = process.communicate()
+        pytest.fail(f"instrumented interpreter did not exit within 60s:\n{stderr}")
+    assert process.returncode == 0, stderr
+    assert stdout.strip() == "ok"
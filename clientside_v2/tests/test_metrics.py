@@ -0,0 +1,121 @@
+"""
+This test verifies that latency histograms are recorded whether or not spans are sampled:
+    DB, outbound HTTP and inbound request durations are recorded with an ALWAYS_OFF sampler
+    attributes are limited to low-cardinality values
+    an unreachable metrics collector doesn't hold up interpreter exit
+"""
+
+import asyncio
+import os
+import sqlite3
+import subprocess
+import sys
+import textwrap
+import time
+
+import httpx
+import pytest
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.sampling import ALWAYS_OFF
+
+import captureflow.metrics
+from captureflow.asgi import BodyCaptureMiddleware
+from captureflow.dbapi import DBAPITracer
+from captureflow.httpx_transport import InstrumentedTransport
+from captureflow.metrics import LatencyHistograms
+
+
+@pytest.fixture
+def metric_reader(monkeypatch):
+    metric_reader = InMemoryMetricReader()
+    meter = MeterProvider(metric_readers=[metric_reader]).get_meter(__name__)
+    monkeypatch.setattr(captureflow.metrics, "latency_histograms", LatencyHistograms(meter))
+    return metric_reader
+
+
+@pytest.fixture
+def unsampled_tracer():
+    return TracerProvider(sampler=ALWAYS_OFF).get_tracer(__name__)
+
+
+def histogram_points(metric_reader, name):
+    for resource_metrics in metric_reader.get_metrics_data().resource_metrics:
+        for scope_metrics in resource_metrics.scope_metrics:
+            for metric in scope_metrics.metrics:
+                if metric.name == name:
+                    return {frozenset(point.attributes.items()): point.count for point in metric.data.data_points}
+    return {}
+
+
+def test_db_duration_without_sampled_spans(metric_reader, unsampled_tracer):
+    dbapi_tracer = DBAPITracer(unsampled_tracer, "sqlite", "sqlite3")
+    # A plain connection, sqlite3.connect() may already return traced ones
+    cursor = sqlite3.Connection(":memory:").cursor()
+    for _ in range(3):
+        dbapi_tracer.execute(cursor, "SELECT 1", (), cursor.execute, ("SELECT 1",), {})
+
+    points = histogram_points(metric_reader, "captureflow.db.duration")
+    assert points == {frozenset({"db.system": "sqlite", "db.operation": "SELECT"}.items()): 3}
+
+
+def test_client_duration_without_sampled_spans(metric_reader, unsampled_tracer):
+    transport = InstrumentedTransport(httpx.MockTransport(lambda request: httpx.Response(204)), unsampled_tracer)
+    with httpx.Client(transport=transport) as client:
+        client.get("http://example.com/users/1")
+        client.get("http://example.com/users/2")
+
+    points = histogram_points(metric_reader, "captureflow.http.client.duration")
+    attributes = {"http.request.method": "GET", "server.address": "example.com", "http.response.status_code": 204}
+    assert points == {frozenset(attributes.items()): 2}
+
+
+def test_server_duration_without_span(metric_reader):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/users/1", "headers": []}
+    asyncio.run(BodyCaptureMiddleware(app)(scope, receive, send))
+
+    # No matched route, the raw path is never used as an attribute
+    points = histogram_points(metric_reader, "captureflow.http.server.duration")
+    assert points == {frozenset({"http.request.method": "GET", "http.response.status_code": 200}.items()): 1}
+
+
+EXIT_SCRIPT = textwrap.dedent("""
+    import captureflow.metrics
+    from captureflow.distro import CaptureFlowDistro
+
+    CaptureFlowDistro()._configure()
+    captureflow.metrics.record_server_duration(1.0, "GET", "/", 200)
+    """)
+
+
+def test_exit_is_bounded_without_a_collector(tmp_path):
+    env = {
+        **os.environ,
+        "CF_METRICS": "true",
+        # Nothing listens there, every export attempt is refused and retried
+        "CF_OTLP_METRICS_ENDPOINT": "http://127.0.0.1:9",
+        "CF_METRICS_SHUTDOWN_TIMEOUT_MILLIS": "500",
+        "CF_TRACES_EXPORTER": "file",
+        "CF_FILE_EXPORT_DIR": str(tmp_path),
+    }
+    start = time.monotonic()
+    process = subprocess.Popen([sys.executable, "-c", EXIT_SCRIPT], stderr=subprocess.PIPE, text=True, env=env)
+    try:
+        _, stderr = process.communicate(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        _, stderr = process.communicate()
+        pytest.fail(f"instrumented interpreter did not exit within 30s:\n{stderr}")
+    assert process.returncode == 0, stderr
+    assert time.monotonic() - start < 15
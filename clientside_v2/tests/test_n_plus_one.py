@@ -0,0 +1,79 @@
+"""
+This test verifies that repeated queries under one parent span are reported on the local root span:
+    'captureflow.n_plus_one' in root_span.attributes, with the repeated fingerprint / URL, count and code location
+"""
+
+import json
+
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.trace import SpanKind
+
+from captureflow.span_processor import FrameInfoSpanProcessor, NPlusOneSpanProcessor
+
+
+def run_query(tracer, fingerprint):
+    with tracer.start_as_current_span("SQLAlchemy: SELECT", attributes={"db.statement.fingerprint": fingerprint}):
+        pass
+
+
+def get_root(span_exporter):
+    return next(span for span in span_exporter.get_finished_spans() if span.parent is None)
+
+
+def test_repeated_query_is_reported(make_tracer, span_exporter):
+    tracer = make_tracer(
+        FrameInfoSpanProcessor(), NPlusOneSpanProcessor(threshold=3), SimpleSpanProcessor(span_exporter)
+    )
+
+    with tracer.start_as_current_span("HTTP GET /cars"):
+        run_query(tracer, "SELECT * FROM cars")
+        for _ in range(5):
+            run_query(tracer, "SELECT * FROM owners WHERE car_id = ?")
+        for _ in range(4):
+            with tracer.start_as_current_span(
+                "HTTP GET", kind=SpanKind.CLIENT, attributes={"http.request.url": "http://inventory/stock"}
+            ):
+                pass
+
+    findings = json.loads(get_root(span_exporter).attributes["captureflow.n_plus_one"])
+    assert len(findings) == 2
+
+    sql_finding, http_finding = findings
+    assert sql_finding["kind"] == "sql"
+    assert sql_finding["key"] == "SELECT * FROM owners WHERE car_id = ?"
+    assert sql_finding["count"] == 5
+    assert sql_finding["code.function"] == "run_query"
+    assert sql_finding["code.filepath"].endswith("test_n_plus_one.py")
+    assert http_finding["kind"] == "http"
+    assert http_finding["key"] == "http://inventory/stock"
+    assert http_finding["count"] == 4
+
+
+def test_repeats_under_different_parents_are_not_reported(make_tracer, span_exporter):
+    tracer = make_tracer(
+        FrameInfoSpanProcessor(), NPlusOneSpanProcessor(threshold=3), SimpleSpanProcessor(span_exporter)
+    )
+
+    with tracer.start_as_current_span("HTTP GET /cars"):
+        for _ in range(5):
+            with tracer.start_as_current_span("load_owner"):
+                run_query(tracer, "SELECT * FROM owners WHERE car_id = ?")
+
+    assert "captureflow.n_plus_one" not in get_root(span_exporter).attributes
+
+
+def test_tracked_state_is_bounded(make_tracer):
+    processor = NPlusOneSpanProcessor(threshold=3, max_traces=2, max_keys_per_trace=4)
+    tracer = make_tracer(processor)
+
+    roots = [tracer.start_span(f"request {i}") for i in range(5)]
+    assert len(processor._traces) == 2
+
+    with tracer.start_as_current_span("request"):
+        for i in range(10):
+            run_query(tracer, f"SELECT * FROM table_{i}")
+        assert all(len(trace_repeats.counts) <= 4 for trace_repeats in processor._traces.values())
+
+    for root in roots:
+        root.end()
+    assert len(processor._traces) == 0
@@ -0,0 +1,61 @@
+"""
+This test verifies in-process SQL aggregation:
+    executions are summed per fingerprint and exported as one summary span per fingerprint
+    the number of fingerprints held between flushes is bounded
+"""
+
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from captureflow.query_stats import OVERFLOW_FINGERPRINT, QueryStatsAggregator
+
+
+def make_aggregator(max_fingerprints=1000):
+    span_exporter = InMemorySpanExporter()
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(SimpleSpanProcessor(span_exporter))
+    aggregator = QueryStatsAggregator(interval=3600, max_fingerprints=max_fingerprints)
+    aggregator.tracer = tracer_provider.get_tracer(__name__)
+    return aggregator, span_exporter
+
+
+def test_summary_per_fingerprint():
+    aggregator, span_exporter = make_aggregator()
+    for duration_ms in (1.0, 5.0, 3.0):
+        aggregator.record("SELECT * FROM users WHERE id = ?", "sqlite", "SELECT", duration_ms, rows=1)
+    aggregator.record("UPDATE users SET name = ?", "sqlite", "UPDATE", 2.0, rows=-1)
+
+    aggregator.flush()
+
+    spans = {span.attributes["db.statement.fingerprint"]: span for span in span_exporter.get_finished_spans()}
+    assert len(spans) == 2
+
+    select_summary = spans["SELECT * FROM users WHERE id = ?"]
+    assert select_summary.name == "SQL summary: SELECT"
+    assert select_summary.parent is None
+    assert select_summary.attributes["db.system"] == "sqlite"
+    assert select_summary.attributes["db.query.count"] == 3
+    assert select_summary.attributes["db.query.duration_total_ms"] == 9.0
+    assert select_summary.attributes["db.query.duration_max_ms"] == 5.0
+    assert select_summary.attributes["db.query.rows"] == 3
+    assert spans["UPDATE users SET name = ?"].attributes["db.query.rows"] == 0
+
+    # Counters start over after every flush
+    span_exporter.clear()
+    aggregator.flush()
+    assert span_exporter.get_finished_spans() == ()
+
+
+def test_fingerprints_are_bounded():
+    aggregator, span_exporter = make_aggregator(max_fingerprints=2)
+    for i in range(10):
+        aggregator.record(f"SELECT * FROM table_{i}", "sqlite", "SELECT", 1.0, rows=0)
+
+    aggregator.flush()
+
+    counts = {
+        span.attributes["db.statement.fingerprint"]: span.attributes["db.query.count"]
+        for span in span_exporter.get_finished_spans()
+    }
+    assert counts == {"SELECT * FROM table_0": 1, "SELECT * FROM table_1": 1, OVERFLOW_FINGERPRINT: 8}
@@ -0,0 +1,199 @@
+"""
+This test verifies that RecentTracesSpanProcessor keeps the last completed traces within its count and memory
+bounds, and that the debug endpoints serve them as JSON with latency summaries.
+"""
+
+import json
+import time
+import urllib.request
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from opentelemetry.context import Context
+from opentelemetry.trace import Status, StatusCode, set_span_in_context
+
+import captureflow.span_processor
+from captureflow.debug_server import (
+    DebugTracesApp,
+    handle_request,
+    latency_summary,
+    start_debug_server,
+)
+from captureflow.span_processor import RecentTracesSpanProcessor
+
+
+def test_only_completed_traces_are_kept(make_tracer):
+    recent_traces = RecentTracesSpanProcessor()
+    tracer = make_tracer(recent_traces)
+
+    with tracer.start_as_current_span("root"):
+        with tracer.start_as_current_span("child"):
+            pass
+        assert recent_traces.traces() == []
+
+    (spans,) = recent_traces.traces()
+    assert [span.name for span in spans] == ["child", "root"]
+
+
+def test_oldest_traces_are_evicted(make_tracer):
+    recent_traces = RecentTracesSpanProcessor(max_traces=3)
+    tracer = make_tracer(recent_traces)
+
+    for i in range(5):
+        with tracer.start_as_current_span(f"trace-{i}"):
+            pass
+
+    assert [spans[0].name for spans in recent_traces.traces()] == ["trace-4", "trace-3", "trace-2"]
+
+
+def test_memory_bound_evicts_traces(make_tracer):
+    recent_traces = RecentTracesSpanProcessor(max_bytes=4096)
+    tracer = make_tracer(recent_traces)
+
+    for i in range(10):
+        with tracer.start_as_current_span(f"trace-{i}", attributes={"payload": "x" * 1000}):
+            pass
+
+    traces = recent_traces.traces()
+    assert 0 < len(traces) < 10
+    assert traces[0][0].name == "trace-9"
+
+
+def test_memory_pressure_evicts_completed_traces_before_pending_ones(make_tracer):
+    recent_traces = RecentTracesSpanProcessor(max_bytes=4096)
+    tracer = make_tracer(recent_traces)
+
+    with tracer.start_as_current_span("in progress"):
+        with tracer.start_as_current_span("early child", attributes={"payload": "x" * 1000}):
+            pass
+        for i in range(10):
+            with tracer.start_as_current_span(f"trace-{i}", context=Context(), attributes={"payload": "x" * 1000}):
+                pass
+
+    # The long request kept its early child while newer, completed traces made room
+    names = [[span.name for span in spans] for spans in recent_traces.traces()]
+    assert names[0] == ["early child", "in progress"]
+    assert len(names) < 11
+
+
+def test_pending_traces_alone_are_bounded(make_tracer):
+    recent_traces = RecentTracesSpanProcessor(max_bytes=4096)
+    tracer = make_tracer(recent_traces)
+
+    roots = [tracer.start_span(f"in progress {i}") for i in range(10)]
+    for root in roots:
+        tracer.start_span("child", context=set_span_in_context(root), attributes={"payload": "x" * 1000}).end()
+
+    assert 0 < len(recent_traces._pending) < 10
+    assert recent_traces._size <= 4096
+    # The newest trace in progress is still there once its root ends
+    roots[-1].end()
+    assert [span.name for span in recent_traces.traces()[0]] == ["child", "in progress 9"]
+
+
+def test_stale_pending_traces_are_dropped(make_tracer, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(captureflow.span_processor.time, "monotonic", lambda: now[0])
+    recent_traces = RecentTracesSpanProcessor(max_pending_seconds=60)
+    tracer = make_tracer(recent_traces)
+
+    abandoned_root = tracer.start_span("abandoned")
+    tracer.start_span("child", context=set_span_in_context(abandoned_root)).end()
+    now[0] += 61
+    with tracer.start_as_current_span("later"):
+        pass
+
+    # The child was dropped with its stale trace, the root ending late starts over
+    abandoned_root.end()
+    assert [span.name for span in recent_traces.get_trace(abandoned_root.get_span_context().trace_id)] == ["abandoned"]
+
+
+def test_children_ending_after_their_root_join_the_trace(make_tracer):
+    recent_traces = RecentTracesSpanProcessor()
+    tracer = make_tracer(recent_traces)
+
+    root = tracer.start_span("root")
+    child = tracer.start_span("background", context=set_span_in_context(root))
+    root.end()
+    child.end()
+
+    (spans,) = recent_traces.traces()
+    assert [span.name for span in spans] == ["root", "background"]
+    assert recent_traces.get_trace(root.get_span_context().trace_id) == spans
+
+
+def test_latency_summary_per_root_name(make_tracer):
+    recent_traces = RecentTracesSpanProcessor()
+    tracer = make_tracer(recent_traces)
+
+    for delay in (0.0, 0.0, 0.02):
+        with tracer.start_as_current_span("GET /slow"):
+            time.sleep(delay)
+    with tracer.start_as_current_span("GET /failing") as span:
+        span.set_status(Status(StatusCode.ERROR))
+
+    slow, failing = latency_summary(recent_traces.traces())
+    assert slow["name"] == "GET /slow"
+    assert slow["count"] == 3
+    assert slow["errors"] == 0
+    assert slow["p99_ms"] == slow["max_ms"] >= 20
+    assert slow["p50_ms"] < 20
+    assert (failing["name"], failing["count"], failing["errors"]) == ("GET /failing", 1, 1)
+
+
+def test_handle_request_filters_and_looks_up_traces(make_tracer):
+    recent_traces = RecentTracesSpanProcessor()
+    tracer = make_tracer(recent_traces)
+
+    for name in ("GET /a", "GET /b", "GET /a"):
+        with tracer.start_as_current_span(name) as span:
+            pass
+    trace_id = format(span.get_span_context().trace_id, "032x")
+
+    status, document = handle_request(recent_traces, "/traces", "name=GET+/a&limit=1")
+    assert status == 200
+    assert [trace["name"] for trace in document["traces"]] == ["GET /a"]
+    assert {entry["name"] for entry in document["summary"]} == {"GET /a", "GET /b"}
+
+    status, document = handle_request(recent_traces, f"/traces/{trace_id}", "")
+    assert status == 200
+    assert document["trace_id"] == trace_id
+    assert document["spans"][0]["parent_span_id"] is None
+
+    assert handle_request(recent_traces, "/traces/" + "0" * 32, "")[0] == 404
+    assert handle_request(recent_traces, "/traces/not-hex", "")[0] == 400
+    assert handle_request(recent_traces, "/traces", "limit=many")[0] == 400
+
+
+def test_standalone_server(make_tracer):
+    recent_traces = RecentTracesSpanProcessor()
+    tracer = make_tracer(recent_traces)
+    with tracer.start_as_current_span("GET /served"):
+        pass
+
+    server = start_debug_server(recent_traces, host="127.0.0.1", port=0)
+    try:
+        host, port = server.server_address
+        with urllib.request.urlopen(f"http://{host}:{port}/summary", timeout=5) as response:
+            document = json.load(response)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert [entry["name"] for entry in document["summary"]] == ["GET /served"]
+
+
+def test_asgi_route(make_tracer):
+    recent_traces = RecentTracesSpanProcessor()
+    tracer = make_tracer(recent_traces)
+    with tracer.start_as_current_span("GET /mounted"):
+        pass
+
+    app = FastAPI()
+    app.mount("/_captureflow", DebugTracesApp(recent_traces))
+    client = TestClient(app)
+
+    response = client.get("/_captureflow/traces")
+    assert response.status_code == 200
+    assert [trace["name"] for trace in response.json()["traces"]] == ["GET /mounted"]
+    assert client.post("/_captureflow/traces").status_code == 405
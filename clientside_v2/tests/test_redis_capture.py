@@ -0,0 +1,27 @@
+"""
+This test verifies the bounded reprs recorded for Redis arguments and replies:
+    collections keep at most max_items elements and report how many were left out
+    the text is cut to max_bytes and ends with a truncation marker
+"""
+
+from captureflow.body_capture import truncation_marker
+from captureflow.redis_capture import capped_repr
+
+
+def test_small_values_are_plain_reprs():
+    assert capped_repr(True) == "True"
+    assert capped_repr(b"value") == "b'value'"
+    assert capped_repr(("key", "value")) == "('key', 'value')"
+
+
+def test_long_list_keeps_first_items():
+    assert capped_repr(list(range(10)), max_items=3) == "[0, 1, 2]...[7 more items]"
+
+
+def test_long_dict_keeps_first_items():
+    assert capped_repr({b"a": b"1", b"b": b"2", b"c": b"3"}, max_items=2) == "{b'a': b'1', b'b': b'2'}...[1 more items]"
+
+
+def test_huge_value_is_cut_before_repr():
+    text = capped_repr(b"x" * 1_000_000, max_bytes=10)
+    assert text == "b'xxxxxxxx" + truncation_marker(3)
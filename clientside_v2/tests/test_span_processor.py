@@ -13,7 +13,9 @@ from opentelemetry.sdk.trace.export import SimpleSpanProcessor
 from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
 from opentelemetry.trace import get_tracer, get_tracer_provider, set_tracer_provider
 
+import captureflow
 from captureflow.distro import CaptureFlowDistro
+from captureflow.span_processor import _get_code_info, _get_file_info
 
 
 @pytest.fixture(scope="module")
@@ -97,5 +99,32 @@ def test_span_processor_in_different_function(setup_tracer_and_exporter):
     assert isinstance(span.attributes["code.lineno"], int)
 
 
+def test_span_processor_caches_code_classification(setup_tracer_and_exporter):
+    tracer_provider, span_exporter = setup_tracer_and_exporter
+    tracer = get_tracer(__name__)
+
+    def start_span():
+        with tracer.start_as_current_span("cached_span"):
+            pass
+
+    start_span()
+    misses_before = _get_file_info.cache_info().misses
+    start_span()
+
+    # Second walk over the same frames is served from the per-file cache
+    assert _get_file_info.cache_info().misses == misses_before
+    spans = span_exporter.get_finished_spans()
+    assert [span.attributes["code.function"] for span in spans] == ["start_span", "start_span"]
+
+
+def test_code_info_distinguishes_identical_code_in_different_files():
+    source = "def handler():\n    pass\n"
+    user_code = compile(source, "/srv/app/handlers.py", "exec").co_consts[0]
+    library_code = compile(source, captureflow.__file__, "exec").co_consts[0]
+
+    assert _get_code_info(user_code)[:2] == (True, "/srv/app/handlers.py")
+    assert _get_code_info(library_code)[0] is False
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
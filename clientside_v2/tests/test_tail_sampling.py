@@ -0,0 +1,74 @@
+"""
+This test verifies that TailSamplingSpanProcessor keeps whole traces that errored or were slow,
+drops the rest according to the base rate and never buffers more than the configured number of spans.
+"""
+
+import time
+
+import pytest
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.trace import Status, StatusCode, set_span_in_context
+
+from captureflow.span_processor import TailSamplingSpanProcessor
+
+
+def test_fast_successful_traces_are_dropped(make_tracer, span_exporter):
+    tail_sampler = TailSamplingSpanProcessor(
+        SimpleSpanProcessor(span_exporter), sampling_rate=0.0, latency_threshold_ms=10_000
+    )
+    tracer = make_tracer(tail_sampler)
+
+    with tracer.start_as_current_span("root"):
+        with tracer.start_as_current_span("child"):
+            pass
+
+    assert span_exporter.get_finished_spans() == ()
+
+
+def test_errored_traces_are_kept_entirely(make_tracer, span_exporter):
+    tail_sampler = TailSamplingSpanProcessor(
+        SimpleSpanProcessor(span_exporter), sampling_rate=0.0, latency_threshold_ms=10_000
+    )
+    tracer = make_tracer(tail_sampler)
+
+    with tracer.start_as_current_span("root"):
+        with tracer.start_as_current_span("failing_child") as child:
+            child.set_status(Status(StatusCode.ERROR))
+        with tracer.start_as_current_span("other_child"):
+            pass
+
+    assert {span.name for span in span_exporter.get_finished_spans()} == {"root", "failing_child", "other_child"}
+
+
+def test_slow_traces_are_kept(make_tracer, span_exporter):
+    tail_sampler = TailSamplingSpanProcessor(
+        SimpleSpanProcessor(span_exporter), sampling_rate=0.0, latency_threshold_ms=20
+    )
+    tracer = make_tracer(tail_sampler)
+
+    with tracer.start_as_current_span("root"):
+        time.sleep(0.03)
+
+    assert [span.name for span in span_exporter.get_finished_spans()] == ["root"]
+
+
+def test_buffer_is_bounded(make_tracer, span_exporter):
+    tail_sampler = TailSamplingSpanProcessor(
+        SimpleSpanProcessor(span_exporter), sampling_rate=1.0, max_buffered_spans=5
+    )
+    tracer = make_tracer(tail_sampler)
+
+    # Roots that never end keep their children buffered until the trace is evicted
+    for i in range(3):
+        root_context = set_span_in_context(tracer.start_span(f"root_{i}"))
+        for child in ("a", "b", "c"):
+            with tracer.start_as_current_span(f"child_{i}_{child}", context=root_context):
+                pass
+
+    assert tail_sampler._buffered_spans <= 5
+    assert tail_sampler.dropped_traces == 2
+    assert span_exporter.get_finished_spans() == ()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,85 @@
+"""
+This test verifies that hooks skip every serialization step for spans that are not recording:
+parameters, reprs, headers and bodies are never formatted when the sampler dropped the span.
+"""
+
+import io
+import sqlite3
+
+import httpx
+import pytest
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.sampling import ALWAYS_OFF
+
+import captureflow.dbapi
+import captureflow.httpx_transport
+import captureflow.redis_capture
+from captureflow.body_capture import BodyBuffer
+from captureflow.dbapi import DBAPITracer
+from captureflow.httpx_transport import InstrumentedTransport
+from captureflow.wsgi import TeeInput
+
+
+def fail(*args, **kwargs):
+    raise AssertionError("serialized for a span that is not recording")
+
+
+@pytest.fixture
+def unsampled_tracer():
+    return TracerProvider(sampler=ALWAYS_OFF).get_tracer(__name__)
+
+
+def test_db_parameters_are_not_formatted(monkeypatch, unsampled_tracer):
+    monkeypatch.setattr(captureflow.dbapi, "format_parameters", fail)
+    dbapi_tracer = DBAPITracer(unsampled_tracer, "sqlite", "sqlite3")
+    cursor = sqlite3.Connection(":memory:").cursor()
+
+    result, result_capture = dbapi_tracer.execute(cursor, "SELECT ?", (1,), cursor.execute, ("SELECT ?", (1,)), {})
+
+    assert result.fetchall() == [(1,)]
+
+
+def test_redis_reprs_are_not_built(monkeypatch):
+    monkeypatch.setattr(captureflow.redis_capture, "capped_repr", fail)
+
+    captureflow.redis_capture._record_command(trace.INVALID_SPAN, ("GET", "key"), b"value", 0.1)
+
+    class Pipeline:
+        command_stack = [(("SET", "a", 1), {}), (("GET", "a"), {})]
+
+    commands = captureflow.redis_capture._snapshot_pipeline(trace.INVALID_SPAN, Pipeline())
+    captureflow.redis_capture._record_pipeline(trace.INVALID_SPAN, Pipeline(), commands, [True, b"1"], 0.1)
+    assert len(commands) == 2
+
+
+def test_httpx_bodies_are_not_captured(monkeypatch, unsampled_tracer):
+    monkeypatch.setattr(captureflow.httpx_transport, "capture_body", fail)
+    monkeypatch.setattr(captureflow.httpx_transport, "is_capturable_content_type", fail)
+
+    def handler(request):
+        return httpx.Response(200, json={"id": 1})
+
+    transport = InstrumentedTransport(httpx.MockTransport(handler), unsampled_tracer)
+    with httpx.Client(transport=transport) as client:
+        assert client.post("http://example.com/users", json={"name": "a"}).json() == {"id": 1}
+
+
+def test_wsgi_input_is_not_copied_outside_recording_spans():
+    buffer = BodyBuffer()
+    stream = TeeInput(io.BytesIO(b"line 1\nline 2\n"), buffer)
+
+    assert stream.readline() == b"line 1\n"
+    assert list(stream) == [b"line 2\n"]
+    assert buffer.total_bytes == 0
+
+
+def test_wsgi_input_is_copied_inside_recording_spans():
+    tracer = TracerProvider().get_tracer(__name__)
+    buffer = BodyBuffer()
+    stream = TeeInput(io.BytesIO(b'{"name": "a"}'), buffer)
+
+    with tracer.start_as_current_span("request"):
+        assert stream.read() == b'{"name": "a"}'
+
+    assert buffer.capture("application/json") == '{"name": "a"}'
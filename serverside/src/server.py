@@ -1,8 +1,9 @@
+import hashlib
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
-from fastapi import FastAPI, Query
-from pydantic import BaseModel, Field, parse_obj_as, validator
+from fastapi import FastAPI, Query, Request, Response
+from pydantic import BaseModel, ConfigDict, Field, parse_obj_as, validator
 from src.utils.exception_patcher import ExceptionPatcher
 from src.utils.integrations.redis_integration import get_redis_connection
 from src.utils.test_creator import TestCoverageCreator
@@ -26,6 +27,9 @@ class ExceptionInfo(BaseModel):
     value: str
     traceback: List[str]
 
+    # Clients may attach a "locals" snapshot of the failing frame, keep it as-is when present
+    model_config = ConfigDict(extra="allow")
+
 
 class BaseExecutionTraceItem(BaseModel):
     id: str
@@ -81,6 +85,19 @@ class TraceData(BaseModel):
         return items
 
 
+class TracingConfig(BaseModel):
+    sampling_rate: float = Field(1.0, ge=0.0, le=1.0)
+    verbosity: Literal["full", "io", "off"] = "full"
+    endpoint_sampling_rates: Dict[str, float] = Field(default_factory=dict)
+    endpoint_verbosity: Dict[str, Literal["full", "io", "off"]] = Field(default_factory=dict)
+    module_filters: List[str] = Field(default_factory=list)
+
+
+def tracing_config_key(repo_url: str) -> str:
+    # Not "{repo_url}:..." on purpose, that namespace is scanned for trace logs
+    return f"config:{repo_url}"
+
+
 # Store new trace
 @app.post("/api/v1/traces")
 async def store_trace_log(trace_data: TraceData, repo_url: str = Query(..., alias="repository-url")):
@@ -108,3 +125,21 @@ async def generate_test_coverage(repo_url: str = Query(..., alias="repository-ur
     test_creator = TestCoverageCreator(redis_client=redis, repo_url=repo_url)
     test_creator.run()
     return {"message": "Test coverage creation process initiated successfully"}
+
+
+# Tracing config polled by clients, ETag lets unchanged configs be answered with 304
+@app.get("/api/v1/config")
+async def get_tracing_config(request: Request, repo_url: str = Query(..., alias="repository-url")):
+    stored_config = redis.get(tracing_config_key(repo_url))
+    config_json = stored_config.decode("utf-8") if stored_config else TracingConfig().json()
+    etag = f'"{hashlib.sha1(config_json.encode("utf-8")).hexdigest()}"'
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=config_json, media_type="application/json", headers={"ETag": etag})
+
+
+@app.put("/api/v1/config")
+async def update_tracing_config(config: TracingConfig, repo_url: str = Query(..., alias="repository-url")):
+    redis.set(tracing_config_key(repo_url), config.json())
+    return {"message": "Tracing config updated successfully"}
@@ -36,6 +36,7 @@ class CallGraph:
                         "type": event["exception_info"]["type"],
                         "value": event["exception_info"]["value"],
                         "traceback": event["exception_info"]["traceback"],
+                        "locals": event["exception_info"].get("locals", {}),
                     }
 
                     continue
@@ -93,3 +93,24 @@ def test_store_trace_log_with_exception(client, mock_redis, sample_trace_with_ex
 
     # Compare normalized data
     assert actual_data == expected_data, "Normalized data passed to Redis does not match expected data"
+
+
+def test_tracing_config_roundtrip(client, mock_redis):
+    repo_url = "https://github.com/NickKuts/capture_flow"
+    config = {"sampling_rate": 0.1, "endpoint_sampling_rates": {"checkout": 1.0}, "verbosity": "io"}
+
+    response = client.put("/api/v1/config", params={"repository-url": repo_url}, json=config)
+    assert response.status_code == 200
+
+    key_passed_to_redis, config_json = mock_redis.set.call_args[0]
+    assert key_passed_to_redis == f"config:{repo_url}"
+
+    mock_redis.get.return_value = config_json.encode("utf-8")
+    response = client.get("/api/v1/config", params={"repository-url": repo_url})
+    assert response.status_code == 200
+    assert response.json()["endpoint_sampling_rates"] == {"checkout": 1.0}
+
+    # Unchanged config is answered with 304
+    etag = response.headers["ETag"]
+    response = client.get("/api/v1/config", params={"repository-url": repo_url}, headers={"If-None-Match": etag})
+    assert response.status_code == 304